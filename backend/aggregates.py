@@ -0,0 +1,222 @@
+# backend/aggregates.py
+
+import numpy as np
+import pandas as pd
+
+VENDOR_COL  = "Customer Name"
+PRODUCT_COL = "product"
+
+# Campos de /grouped que se mantienen preagregados (si existen en el CSV)
+GROUP_FIELDS = ["Category", "Sub-Category", "region", "Segment", "Ship Mode", "State"]
+
+# Columnas de filtro (month, cliente, producto) con revisión por valor
+FILTER_COLS = ["month", VENDOR_COL, PRODUCT_COL]
+
+# Medidas sumables: las medias se derivan como suma / conteo
+MEASURES = ["sales", "quantity", "profit", "discount", "discount_n", "n", "ratio", "ratio_n"]
+
+
+def order_measures(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convierte líneas de pedido (normalizadas y tipadas, con las columnas
+    derivadas year_month y day de la ingesta) en medidas sumables con
+    claves de mes ("YYYY-MM") y día. Las claves nulas se agrupan como "".
+    Las claves salen como texto aunque el dataset las guarde como category:
+    los cubos son pequeños y así se alinean entre lotes con categorías distintas.
+    """
+    sales = df["Sales" if "Sales" in df.columns else "quantity"].astype(float)
+    ratio = (df["profit"] / sales).replace([np.inf, -np.inf], np.nan)
+    if "Discount" in df.columns:
+        discount = df["Discount"].astype(float)
+    else:
+        discount = pd.Series(np.nan, index=df.index)
+    rows = pd.DataFrame({
+        "month":      df["year_month"].astype(str),
+        "day":        df["day"],
+        "sales":      sales,
+        "quantity":   df["quantity"].astype(float),
+        "profit":     df["profit"].astype(float),
+        "discount":   discount.fillna(0.0),
+        "discount_n": discount.notna().astype(int),
+        "n":          1,
+        "ratio":      ratio.fillna(0.0),
+        "ratio_n":    ratio.notna().astype(int),
+    }, index=df.index)
+    for col in [VENDOR_COL, PRODUCT_COL, "region"] + GROUP_FIELDS:
+        if col in df.columns and col not in rows.columns:
+            rows[col] = df[col].astype(object).fillna("")
+    return rows
+
+
+def summarize_groups(sums: pd.DataFrame) -> pd.DataFrame:
+    """Formato de /grouped a partir de medidas ya sumadas por grupo."""
+    n = sums["discount_n"].where(sums["discount_n"] > 0)
+    return pd.DataFrame({
+        "group":          sums.index,
+        "total_sales":    sums["sales"].values,
+        "total_quantity": sums["quantity"].values,
+        "avg_discount":   (sums["discount"] / n).fillna(0.0).values,
+        "total_profit":   sums["profit"].values,
+    }).sort_values("total_sales", ascending=False)
+
+
+def level_mask(index: pd.MultiIndex, name: str, value) -> np.ndarray:
+    """
+    Filas de `index` con `value` en el nivel `name`. El valor se resuelve a
+    su código del nivel una vez y se comparan códigos enteros, no textos.
+    """
+    k = index.names.index(name)
+    code = index.levels[k].get_indexer([value])[0]
+    if code < 0:
+        return np.zeros(len(index), dtype=bool)
+    return index.codes[k] == code
+
+
+class MonthlyCube:
+    """
+    Sumas de `values` por `keys`, particionadas por mes. Añadir filas sólo
+    toca las particiones de los meses afectados.
+    """
+
+    def __init__(self, keys: list, values: list):
+        self.keys = keys
+        self.values = values
+        self.parts = {}
+
+    def add(self, rows: pd.DataFrame) -> list:
+        grouped = rows.groupby(["month"] + self.keys)[self.values].sum()
+        touched = []
+        for month, delta in grouped.groupby(level="month", sort=False):
+            delta = delta.droplevel("month")
+            part = self.parts.get(month)
+            # Se sustituye la partición entera: un lector nunca ve una a medias
+            self.parts[month] = delta if part is None else part.add(delta, fill_value=0)
+            touched.append(month)
+        return touched
+
+    def select(self, months: list | None = None) -> pd.DataFrame:
+        if months is None:
+            parts = list(self.parts.values())
+        else:
+            parts = [self.parts[m] for m in months if m in self.parts]
+        if not parts:
+            index = pd.MultiIndex.from_arrays([[]] * len(self.keys), names=self.keys)
+            return pd.DataFrame(columns=self.values, index=index, dtype=float)
+        return pd.concat(parts)
+
+
+class OrderAggregates:
+    """
+    Agregados de KPIs, agrupaciones y tendencia, mergeables: `add` suma un
+    lote de pedidos nuevos y registra qué series (region, product) y qué
+    valores de filtro cambiaron en cada revisión. Las cachés derivadas se
+    indexan por esas revisiones (series_added, changed_since, filter_key)
+    en lugar de por la versión del dataset: un lote sólo invalida lo que
+    toca.
+    """
+
+    def __init__(self, group_fields: list):
+        self.base   = MonthlyCube([VENDOR_COL, PRODUCT_COL], MEASURES)
+        self.groups = {
+            f: MonthlyCube([VENDOR_COL, PRODUCT_COL, f], MEASURES) for f in group_fields
+        }
+        self.trend  = MonthlyCube(["day", VENDOR_COL], ["sales"])
+        self.revision = 0
+        self.series_revision = {}
+        self.series_added = 0       # revisión en que apareció la última serie nueva
+        self.value_revision = {}    # (columna de FILTER_COLS, valor) -> revisión
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "OrderAggregates":
+        agg = cls([f for f in GROUP_FIELDS if f in df.columns])
+        agg.add(df)
+        return agg
+
+    def add(self, df: pd.DataFrame) -> set:
+        """Incorpora líneas de pedido; devuelve las series (region, product) tocadas."""
+        rows = order_measures(df)
+        self.base.add(rows)
+        for cube in self.groups.values():
+            cube.add(rows)
+        dated = rows[rows["day"].notna()].astype({"day": int})
+        self.trend.add(dated)
+
+        self.revision += 1
+        changed = set(zip(rows["region"], rows[PRODUCT_COL]))
+        if not changed <= self.series_revision.keys():
+            self.series_added = self.revision
+        for key in changed:
+            self.series_revision[key] = self.revision
+        for col in FILTER_COLS:
+            if col in rows.columns:
+                for value in rows[col].unique():
+                    self.value_revision[(col, value)] = self.revision
+        return changed
+
+    def changed_since(self, revision: int) -> set:
+        """Series modificadas después de `revision` (invalidación selectiva)."""
+        return {k for k, r in self.series_revision.items() if r > revision}
+
+    def filter_key(self, month: str | None, filters: dict) -> tuple:
+        """
+        Revisión de las filas que pasan los filtros de mes y de `filters`
+        (col -> valor): la última de cada valor filtrado. Una fila nueva que
+        pasa todos los filtros cambia todas, y si ninguna lo hace el
+        resultado filtrado no ha cambiado. Sin filtros, la revisión global.
+        """
+        active = [("month", month)] if month else []
+        active += sorted(filters.items())
+        if not active:
+            return (self.revision,)
+        return tuple(self.value_revision.get(item, 0) for item in active)
+
+    # ---------------------------------------------------
+    # Consultas
+    # ---------------------------------------------------
+    def _filtered(self, cube, month=None, vendor=None, product=None) -> pd.DataFrame:
+        frame = cube.select(None if month is None else [month])
+        if vendor is not None:
+            frame = frame[level_mask(frame.index, VENDOR_COL, vendor)]
+        if product is not None:
+            frame = frame[level_mask(frame.index, PRODUCT_COL, product)]
+        return frame
+
+    def kpis(self, month=None, vendor=None, product=None) -> dict:
+        t = self._filtered(self.base, month, vendor, product)[MEASURES].sum()
+        total_sales, count = float(t["sales"]), int(t["n"])
+        return {
+            "total_sales":    total_sales,
+            "avg_profit_pct": float(t["ratio"] / t["ratio_n"]) if total_sales and t["ratio_n"] else 0.0,
+            "sale_count":     count,
+            "avg_sales":      total_sales / count if count else 0.0,
+        }
+
+    def supports_group(self, field: str) -> bool:
+        return field in self.groups or field in (VENDOR_COL, PRODUCT_COL)
+
+    def grouped(self, field, month=None, vendor=None, product=None) -> pd.DataFrame:
+        cube = self.groups.get(field, self.base)
+        frame = self._filtered(cube, month, vendor, product)
+        return summarize_groups(frame.groupby(level=field).sum())
+
+    def daily_trend(self, month: str, vendor=None) -> pd.DataFrame:
+        """Ventas día × cliente de un mes (filas 1..días del mes)."""
+        frame = self.trend.select([month])
+        if vendor is not None:
+            frame = frame[level_mask(frame.index, VENDOR_COL, vendor)]
+        days = pd.Period(month, "M").days_in_month
+        return (
+            frame["sales"].unstack(VENDOR_COL, fill_value=0)
+                 .reindex(range(1, days + 1), fill_value=0)
+        )
+
+    def monthly_trend(self, year: int, vendor=None) -> pd.DataFrame:
+        """Ventas mes × cliente de un año (filas "YYYY-MM")."""
+        months = [f"{year}-{m:02d}" for m in range(1, 13)]
+        by_month = {}
+        for m in months:
+            frame = self.trend.select([m])
+            if vendor is not None:
+                frame = frame[level_mask(frame.index, VENDOR_COL, vendor)]
+            by_month[m] = frame["sales"].groupby(level=VENDOR_COL).sum()
+        return pd.DataFrame(by_month).T.reindex(months).fillna(0)
@@ -0,0 +1,84 @@
+# backend/api_common.py
+
+import re
+from pathlib import Path
+
+import pandas as pd
+from fastapi import Header, HTTPException, Request
+from fastapi.responses import JSONResponse, Response
+
+from dataset_store import Dataset
+from tenants import DEFAULT_TENANT, TENANT_HEADER, Tenant, TenantRegistry
+
+# -------------------------------------------------------
+# Configuración general (común a todos los perfiles)
+# -------------------------------------------------------
+BASE_DIR      = Path(__file__).parent
+PROJECT_DIR   = BASE_DIR.parent
+MODELS_DIR    = BASE_DIR / "models"
+TRAIN_CSV     = PROJECT_DIR / "stores_sales_forecasting.csv"
+TENANTS_DIR   = BASE_DIR / "tenants"
+FRONTEND_DIR  = PROJECT_DIR / "frontend"
+
+# Los metadatos van versionados por ETag: el navegador revalida siempre
+METADATA_CACHE_CONTROL = "public, no-cache"
+
+# Entity-tags de If-None-Match: "*" o [W/]"opaco" (el opaco puede llevar comas)
+_ETAG_RE = re.compile(r'\*|(?:W/)?"[^"]*"')
+
+# Datos y modelos por tenant (cabecera X-Tenant); sin cabecera se usa el
+# tenant por defecto con el CSV y models/ del proyecto. Cada tenant tiene
+# sus versiones de modelos con puntero atómico; cada worker recarga solo.
+tenants = TenantRegistry(TENANTS_DIR, Tenant(DEFAULT_TENANT, TRAIN_CSV, MODELS_DIR))
+
+
+# -------------------------------------------------------
+# Auxiliar: tenant, dataset en memoria (versionado) y filtros
+# -------------------------------------------------------
+def current_tenant(x_tenant: str | None = Header(None, alias=TENANT_HEADER)) -> Tenant:
+    try:
+        return tenants.get(x_tenant)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+
+def require_dataset(tenant: Tenant) -> Dataset:
+    ds = tenant.dataset()
+    if ds is None:
+        raise HTTPException(400, "No hay CSV disponible.")
+    return ds
+
+
+def month_key(month: str | None) -> str | None:
+    """'YYYY-MM' normalizado o None si no hay filtro de mes."""
+    if not month or month.lower() in ("null", "none"):
+        return None
+    try:
+        return str(pd.Period(month, "M"))
+    except Exception:
+        raise HTTPException(400, f"Formato de month inválido: {month}")
+
+
+def filter_value(value: str) -> str | None:
+    return None if value == "Todos" else value
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Si If-None-Match incluye `etag` o "*". Compara en modo débil (RFC 9110
+    §13.1.2): W/"x" y "x" son la misma versión, así que un proxy que
+    debilita el ETag al recomprimir sigue obteniendo 304.
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    ours = etag.removeprefix("W/")
+    return any(t == "*" or t.removeprefix("W/") == ours for t in _ETAG_RE.findall(header))
+
+
+def cached_json(request: Request, payload, etag: str) -> Response:
+    """Responde 304 si el cliente ya tiene esta versión (If-None-Match)."""
+    headers = {"ETag": etag, "Cache-Control": METADATA_CACHE_CONTROL}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(payload, headers=headers)
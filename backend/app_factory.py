@@ -0,0 +1,50 @@
+# backend/app_factory.py
+
+import importlib
+import os
+
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+
+# Grupos de rutas y el módulo que los define. Cada módulo importa sólo lo
+# que usan sus rutas; lo pesado (entrenamiento, backtest) dentro de ellas.
+ROUTE_GROUPS = {
+    "dashboard": "routes_dashboard",   # frontend, metadatos, KPIs, tendencia, ingesta
+    "models":    "routes_models",      # entrenamiento, predicción, pronósticos, inventario
+}
+
+# Perfiles de worker: grupos de rutas que monta cada uno. Con perfiles
+# separados cada rol escala por su cuenta y sólo carga su parte.
+PROFILES = {
+    "full":      ["dashboard", "models"],
+    "dashboard": ["dashboard"],
+    "predict":   ["models"],
+}
+PROFILE_ENV = "APP_PROFILE"
+
+
+def create_app(profile: str | None = None) -> FastAPI:
+    """
+    Aplicación con las rutas del perfil `profile` (por defecto la variable
+    de entorno APP_PROFILE, o "full"). Sirve también como factoría de
+    uvicorn: `uvicorn app_factory:create_app --factory`.
+    """
+    profile = profile or os.environ.get(PROFILE_ENV, "full")
+    if profile not in PROFILES:
+        raise ValueError(f"Perfil desconocido '{profile}'. Válidos: {list(PROFILES)}")
+
+    app = FastAPI(title="Sales Forecasting API", version="1.0")
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    for group in PROFILES[profile]:
+        importlib.import_module(ROUTE_GROUPS[group]).register(app)
+
+    @app.get("/health")
+    def health():
+        return {"status": "ok", "profile": profile, "groups": PROFILES[profile]}
+
+    return app
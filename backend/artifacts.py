@@ -0,0 +1,135 @@
+# backend/artifacts.py
+
+import json
+from pathlib import Path
+
+import numpy as np
+
+from fast_inference import CompiledEncoder, CompiledForecaster
+
+FORMAT_VERSION = 1
+
+# Layout del artefacto compacto (un directorio):
+#   manifest.json               formato y bloques del encoder
+#   quantity.ubj / profit.ubj   boosters en formato nativo UBJSON
+#   quantity_quantiles.ubj /    boosters multi-cuantil (opcionales; alphas
+#   profit_quantiles.ubj        en manifest["quantiles"])
+#   <enc>/values.npy            valor escalado del one-hot por feature
+#   <enc>/keys_<i>.npy          categorías ordenadas del bloque i
+#   <enc>/cols_<i>.npy          índice de feature de cada categoría
+#   <enc>/numeric_scale.npy     escala de las features de demanda (opcional)
+
+
+def _save_encoder(encoder: CompiledEncoder, path: Path):
+    path.mkdir(parents=True, exist_ok=True)
+    np.save(path / "values.npy", encoder.values)
+    for i, (keys, cols) in enumerate(zip(encoder.keys, encoder.cols)):
+        np.save(path / f"keys_{i}.npy", keys)
+        np.save(path / f"cols_{i}.npy", cols)
+    if encoder.n_numeric:
+        np.save(path / "numeric_scale.npy", encoder.numeric_scale)
+
+
+def _load_encoder(path: Path, n_blocks: int, n_numeric: int = 0) -> CompiledEncoder:
+    def load(name):
+        # mmap: N workers comparten una única copia en la page cache
+        return np.load(path / name, mmap_mode="r")
+
+    return CompiledEncoder(
+        [load(f"keys_{i}.npy") for i in range(n_blocks)],
+        [load(f"cols_{i}.npy") for i in range(n_blocks)],
+        load("values.npy"),
+        load("numeric_scale.npy") if n_numeric else None,
+    )
+
+
+def save_compact(fast: CompiledForecaster, out_dir) -> Path:
+    """Guarda un CompiledForecaster en el layout compacto (sin pickle)."""
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    fast.booster_q.save_model(str(out / "quantity.ubj"))
+    fast.booster_p.save_model(str(out / "profit.ubj"))
+    _save_encoder(fast.encoder, out / "enc_quantity")
+    if fast.profit_encoder is not None:
+        _save_encoder(fast.profit_encoder, out / "enc_profit")
+    if fast.quantile_boosters is not None:
+        fast.quantile_boosters[0].save_model(str(out / "quantity_quantiles.ubj"))
+        fast.quantile_boosters[1].save_model(str(out / "profit_quantiles.ubj"))
+    manifest = {
+        "format":         FORMAT_VERSION,
+        "n_blocks":       len(fast.encoder.keys),
+        "n_features":     fast.encoder.n_features,
+        "n_numeric":      fast.encoder.n_numeric,
+        "shared_encoder": fast.profit_encoder is None,
+        "quantiles":      fast.quantiles if fast.quantile_boosters is not None else None,
+    }
+    (out / "manifest.json").write_text(json.dumps(manifest, indent=2))
+    return out
+
+
+class MappedForecaster(CompiledForecaster):
+    """
+    CompiledForecaster cargado de forma perezosa desde el layout compacto:
+    abrirlo sólo lee el manifest; los arrays del encoder se mapean y los
+    boosters se cargan la primera vez que se usan.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.manifest = json.loads((self.path / "manifest.json").read_text())
+        if self.manifest["format"] != FORMAT_VERSION:
+            raise ValueError(f"Formato de artefacto no soportado: {self.manifest['format']}")
+        self._encoder = self._profit_encoder = None
+        self._booster_q = self._booster_p = None
+        self._quantile_boosters = None
+
+    def _booster(self, name: str):
+        # XGBoost se importa con el primer booster que se usa
+        import xgboost as xgb
+        bst = xgb.Booster()
+        bst.load_model(str(self.path / f"{name}.ubj"))
+        return bst
+
+    @property
+    def encoder(self) -> CompiledEncoder:
+        if self._encoder is None:
+            self._encoder = _load_encoder(self.path / "enc_quantity", self.manifest["n_blocks"],
+                                          self.manifest.get("n_numeric", 0))
+        return self._encoder
+
+    @property
+    def profit_encoder(self) -> CompiledEncoder | None:
+        if self.manifest["shared_encoder"]:
+            return None
+        if self._profit_encoder is None:
+            self._profit_encoder = _load_encoder(self.path / "enc_profit", self.manifest["n_blocks"],
+                                                 self.manifest.get("n_numeric", 0))
+        return self._profit_encoder
+
+    @property
+    def booster_q(self):
+        if self._booster_q is None:
+            self._booster_q = self._booster("quantity")
+        return self._booster_q
+
+    @property
+    def booster_p(self):
+        if self._booster_p is None:
+            self._booster_p = self._booster("profit")
+        return self._booster_p
+
+    @property
+    def quantiles(self) -> list | None:
+        return self.manifest.get("quantiles")
+
+    @property
+    def quantile_boosters(self) -> tuple | None:
+        if self.quantiles is None:
+            return None
+        if self._quantile_boosters is None:
+            self._quantile_boosters = (self._booster("quantity_quantiles"), self._booster("profit_quantiles"))
+        return self._quantile_boosters
+
+
+def load_compact(path) -> MappedForecaster:
+    return MappedForecaster(path)
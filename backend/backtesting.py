@@ -0,0 +1,266 @@
+# backend/backtesting.py
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from features import month_numbers, order_line_rate
+from ml_utils import build_xgb_pipeline
+from train_xgb import (DEFAULT_PARAMS, STATE_FILE, _load_training_frame, _model_frame, fill_month_grid,
+                       monthly_cells, monthly_training_table, scan_orders)
+
+TARGETS = ["quantity", "profit"]
+BACKTEST_DIR = "backtest"
+TABLES = ("folds", "regions", "products", "series")
+
+
+def rolling_origin_folds(dates: pd.Series, n_folds: int = 4, horizon_months: int = 3,
+                         min_train_months: int = 12) -> pd.DataFrame:
+    """
+    Folds de origen móvil sobre el historial: los últimos `n_folds` bloques
+    de `horizon_months` meses son los tramos de test y cada fold entrena con
+    todo lo anterior (ventana expansiva). Se descartan los folds con menos
+    de `min_train_months` meses de entrenamiento.
+    """
+    months = pd.period_range(dates.min(), dates.max(), freq="M")
+    rows = []
+    for k in range(n_folds):
+        start = len(months) - horizon_months * (n_folds - k)
+        if start < min_train_months:
+            continue
+        rows.append({
+            "fold":       k,
+            "test_start": months[start].start_time,
+            "test_end":   months[start + horizon_months - 1].end_time.normalize(),
+        })
+    if not rows:
+        raise ValueError("No hay historial suficiente para ningún fold")
+    return pd.DataFrame(rows)
+
+
+# -------------------------------------------------------
+# Workers: la matriz preprocesada se mapea una vez por proceso
+# -------------------------------------------------------
+_DATA = {}
+
+
+def _init_worker(cache_path: str, nthread: int):
+    _DATA.update(joblib.load(cache_path, mmap_mode="r"))
+    _DATA["nthread"] = nthread
+
+
+def _run_fold(task: tuple) -> tuple:
+    """
+    Entrena con las filas [0, train_end) y predice [train_end, test_end);
+    con un grid mensual aparte (`X_grid`, modelo por línea) predice además
+    sus filas [grid_start, grid_end).
+    """
+    fold, train_end, test_end, grid_start, grid_end, params = task
+    X = _DATA["X"]
+    preds, grid_preds = {}, {}
+    for target in TARGETS:
+        model = xgb.XGBRegressor(**{**params, "n_jobs": _DATA["nthread"]})
+        model.fit(X[:train_end], _DATA[f"y_{target}"][:train_end])
+        preds[target] = model.predict(X[train_end:test_end])
+        if "X_grid" in _DATA:
+            grid_preds[target] = model.predict(_DATA["X_grid"][grid_start:grid_end])
+    return fold, preds, grid_preds
+
+
+# -------------------------------------------------------
+# Tablas de error (sumas agrupadas, sin bucles por grupo)
+# -------------------------------------------------------
+def error_table(frame: pd.DataFrame, by: list) -> pd.DataFrame:
+    """MAE, RMSE, sesgo, WAPE y R² por grupo a partir de actual/predicted."""
+    err = frame["predicted"] - frame["actual"]
+    parts = pd.DataFrame({
+        "n":    1,
+        "err":  err,
+        "abs":  err.abs(),
+        "sq":   err ** 2,
+        "y":    frame["actual"],
+        "y2":   frame["actual"] ** 2,
+        "yabs": frame["actual"].abs(),
+    })
+    sums = parts.groupby([frame[c] for c in by], sort=True).sum()
+    ss_tot = sums["y2"] - sums["y"] ** 2 / sums["n"]
+    table = pd.DataFrame({
+        "n":    sums["n"],
+        "mae":  sums["abs"] / sums["n"],
+        "rmse": np.sqrt(sums["sq"] / sums["n"]),
+        "bias": sums["err"] / sums["n"],
+        "wape": sums["abs"] / sums["yabs"].where(sums["yabs"] > 0),
+        "r2":   1 - sums["sq"] / ss_tot.where(ss_tot > 0),
+    })
+    return table.reset_index()
+
+
+def backtest_and_save(data_path: str, out_dir: str, model_params: dict = None,
+                      n_folds: int = 4, horizon_months: int = 3,
+                      min_train_months: int = 12, n_workers: int = None,
+                      lag_features: bool = None, monthly: bool = None) -> dict:
+    """
+    Backtest de origen móvil de los pipelines de quantity y profit. El
+    preproceso se ajusta una vez sobre todo el historial (sólo aporta el
+    vocabulario de categorías) y los folds reutilizan esa matriz, ordenada
+    por fecha para que cada ventana sea un prefijo contiguo. Los folds se
+    entrenan en paralelo (procesos spawn; /train_xgb lo lanza como trabajo
+    en segundo plano) y las tablas por fold, región y producto se
+    guardan en `<out_dir>/backtest/`, junto con `series`: el error de la
+    demanda mensual de cada (region, product) en los meses de test, que
+    usa inventory.py como error fuera de muestra. Se mide como el plan
+    calcula la demanda: sobre el grid serie × mes de test (monthly_cells +
+    fill_month_grid, meses sin pedidos incluidos) y, con el modelo por
+    línea, con su predicción por línea × order_line_rate de los meses de
+    entrenamiento del fold. Con features de demanda
+    cada mes de test ve los reales hasta el mes anterior (error a un
+    paso). Con la
+    tabla mensual los errores son por celda (serie, mes), incluidos los
+    meses sin pedidos. Si la versión se entrenó por bloques (`chunk_rows`)
+    el CSV tampoco se carga aquí: la tabla mensual sale de scan_orders, y
+    el backtest por línea de pedido, que necesita todas las filas en
+    memoria, se rechaza con ValueError.
+    """
+    out = Path(out_dir)
+    state = joblib.load(out / STATE_FILE) if (out / STATE_FILE).exists() else {}
+    if model_params is None:
+        model_params = state.get("params", DEFAULT_PARAMS)
+    if lag_features is None:
+        lag_features = state.get("lag_features", False)
+    if monthly is None:
+        monthly = state.get("monthly", False)
+
+    chunk_rows = state.get("chunk_rows")
+    if chunk_rows:
+        if not monthly:
+            raise ValueError("El backtest por línea de pedido carga el CSV entero: con chunk_rows "
+                             "entrena con monthly=true")
+        df = fill_month_grid(scan_orders(data_path, chunk_rows)["cells"])
+    else:
+        df = _load_training_frame(Path(data_path).read_bytes())
+        df = df[df["date"].notna()]
+        if monthly:
+            df = monthly_training_table(df)
+    df = df.sort_values("date", kind="stable").reset_index(drop=True)
+    folds = rolling_origin_folds(df["date"], n_folds, horizon_months, min_train_months)
+    # Con la tabla mensual las filas ya son el grid; por línea se construye aparte
+    grid = df if monthly else (fill_month_grid(monthly_cells(df)).sort_values("date", kind="stable")
+                                                               .reset_index(drop=True))
+    test_start = folds["test_start"].to_numpy()
+    test_stop = (folds["test_end"] + pd.Timedelta(days=1)).to_numpy()
+    dates = df["date"].to_numpy()
+    folds["train_rows"] = np.searchsorted(dates, test_start, side="left")
+    folds["test_rows"] = np.searchsorted(dates, test_stop, side="left") - folds["train_rows"]
+    grid_dates = grid["date"].to_numpy()
+    grid_start = np.searchsorted(grid_dates, test_start, side="left")
+    grid_end = np.searchsorted(grid_dates, test_stop, side="left")
+
+    prep = build_xgb_pipeline(model_params, lag_features)[:-1]
+    arrays = {"X": np.asarray(prep.fit_transform(_model_frame(df, lag_features)), dtype=np.float32)}
+    if not monthly:
+        arrays["X_grid"] = np.asarray(prep.transform(_model_frame(grid, lag_features)), dtype=np.float32)
+    for target in TARGETS:
+        arrays[f"y_{target}"] = df[target].to_numpy(dtype=np.float32)
+
+    tasks = [(int(f.fold), int(f.train_rows), int(f.train_rows + f.test_rows),
+              int(grid_start[k]), int(grid_end[k]), model_params)
+             for k, f in enumerate(folds.itertuples())]
+    n_workers = n_workers or max(1, min(len(tasks), (os.cpu_count() or 2) // 2))
+    nthread = max(1, (os.cpu_count() or 1) // n_workers)
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = str(Path(tmp) / "matrix.joblib")
+        joblib.dump(arrays, cache_path)
+        if n_workers == 1:
+            _init_worker(cache_path, nthread)
+            results = [_run_fold(t) for t in tasks]
+        else:
+            # spawn: el proceso padre ya entrenó con XGBoost (OpenMP) y puede tener hilos
+            with ProcessPoolExecutor(n_workers, mp_context=mp.get_context("spawn"),
+                                     initializer=_init_worker, initargs=(cache_path, nthread)) as pool:
+                results = list(pool.map(_run_fold, tasks))
+
+    # Predicciones de test en formato largo: fila × target (y celda del grid × target)
+    parts, cell_parts = [], []
+    by_fold = folds.set_index("fold")
+    for k, (fold, preds, grid_preds) in enumerate(results):
+        f = by_fold.loc[fold]
+        test = df.iloc[f["train_rows"]:f["train_rows"] + f["test_rows"]]
+        test_grid = grid.iloc[grid_start[k]:grid_end[k]]
+        if not monthly:
+            # Demanda mensual como en el plan: predicción por línea × líneas/mes hasta el fold
+            codes, series = pd.MultiIndex.from_arrays([test_grid["region"], test_grid["product"]]).factorize()
+            train_last = f["test_start"].year * 12 + f["test_start"].month - 2
+            rate = order_line_rate(df.iloc[:f["train_rows"]], series.get_level_values(0),
+                                   series.get_level_values(1), train_last)[codes]
+        for target in TARGETS:
+            parts.append(pd.DataFrame({
+                "fold":      fold,
+                "target":    target,
+                "region":    test["region"].to_numpy(),
+                "product":   test["product"].to_numpy(),
+                "actual":    test[target].to_numpy(dtype=float),
+                "predicted": preds[target].astype(float),
+            }))
+            cell_parts.append(pd.DataFrame({
+                "fold":      fold,
+                "target":    target,
+                "region":    test_grid["region"].to_numpy(),
+                "product":   test_grid["product"].to_numpy(),
+                "actual":    test_grid[target].to_numpy(dtype=float),
+                "predicted": (preds[target] if monthly else grid_preds[target] * rate).astype(float),
+            }))
+    long = pd.concat(parts, ignore_index=True)
+    cells = pd.concat(cell_parts, ignore_index=True)
+
+    tables = {
+        "folds":    folds.merge(error_table(long, ["fold", "target"]), on="fold"),
+        "regions":  error_table(long, ["target", "region"]),
+        "products": error_table(long, ["target", "product"]),
+        "series":   error_table(cells, ["target", "region", "product"]),
+    }
+    path = out / BACKTEST_DIR
+    path.mkdir(parents=True, exist_ok=True)
+    for name, table in tables.items():
+        table.to_csv(path / f"{name}.csv", index=False)
+    overall = error_table(long, ["target"]).set_index("target")
+    summary = {
+        "n_folds":        len(folds),
+        "horizon_months": horizon_months,
+        "params":         {k: v for k, v in model_params.items() if not isinstance(v, np.ndarray)},
+        "metrics":        json.loads(overall.to_json(orient="index")),
+    }
+    (path / "summary.json").write_text(json.dumps(summary, indent=2, default=str))
+    return summary
+
+
+def load_backtest(model_dir) -> dict | None:
+    """Tablas guardadas por backtest_and_save, o None si la versión no tiene."""
+    path = Path(model_dir) / BACKTEST_DIR
+    if not (path / "summary.json").exists():
+        return None
+    result = {"summary": json.loads((path / "summary.json").read_text())}
+    for name in TABLES:
+        result[name] = pd.read_csv(path / f"{name}.csv")
+    return result
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser("Backtest de origen móvil")
+    p.add_argument("-i", "--input", required=True, help="CSV de entrenamiento")
+    p.add_argument("-o", "--output", required=True, help="Directorio de modelos")
+    p.add_argument("-k", "--folds", type=int, default=4)
+    p.add_argument("--horizon", type=int, default=3, help="Meses de test por fold")
+    p.add_argument("--workers", type=int, default=None)
+    args = p.parse_args()
+    result = backtest_and_save(args.input, args.output, n_folds=args.folds,
+                               horizon_months=args.horizon, n_workers=args.workers)
+    print(f"✅ Backtest guardado: {result['metrics']}")
@@ -0,0 +1,89 @@
+# backend/bench_artifacts.py
+"""
+Benchmark de carga de modelos por worker: pickles de sklearn (joblib)
+frente al artefacto compacto (UBJSON + arrays con mmap).
+
+    python bench_artifacts.py --models models --workers 4
+
+Cada worker es un proceso nuevo que importa las dependencias, carga el
+artefacto, hace una predicción (fuerza la carga perezosa) y reporta el
+tiempo y la memoria residente (total, anónima y respaldada por fichero:
+la parte "file" es la que se comparte entre workers vía page cache).
+"""
+
+import argparse
+import multiprocessing as mp
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+
+def _rss() -> dict:
+    """RSS en MB desde /proc (Linux); fuera de Linux sólo el pico."""
+    try:
+        fields = {}
+        for line in Path("/proc/self/status").read_text().splitlines():
+            key, _, value = line.partition(":")
+            if key in ("VmRSS", "RssAnon", "RssFile"):
+                fields[key] = int(value.split()[0]) / 1024
+        return {"rss": fields["VmRSS"], "anon": fields.get("RssAnon"), "file": fields.get("RssFile")}
+    except (OSError, KeyError):
+        import resource
+        return {"rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, "anon": None, "file": None}
+
+
+def _worker(kind: str, models: str, queue):
+    import joblib
+    import pandas as pd
+    from artifacts import load_compact
+
+    base = _rss()
+    row = pd.DataFrame([{"date": pd.Timestamp("2017-01-01"), "region": "West", "product": "x"}])
+    t0 = time.perf_counter()
+    if kind == "pickle":
+        pipe_q = joblib.load(Path(models) / "pipeline_quantity.pkl")
+        pipe_p = joblib.load(Path(models) / "pipeline_profit.pkl")
+        load_s = time.perf_counter() - t0
+        pipe_q.predict(row)
+        pipe_p.predict(row)
+    else:
+        fast = load_compact(Path(models) / "compact")
+        load_s = time.perf_counter() - t0
+        fast.predict_frame(row)
+    first_s = time.perf_counter() - t0
+    after = _rss()
+    queue.put({
+        "kind": kind, "load_ms": load_s * 1000, "first_predict_ms": first_s * 1000,
+        "rss_mb": after["rss"], "delta_mb": after["rss"] - base["rss"],
+        "anon_mb": after["anon"], "file_mb": after["file"],
+    })
+
+
+def run(models: str, workers: int) -> list:
+    ctx = mp.get_context("spawn")
+    results = []
+    for kind in ("pickle", "compact"):
+        if kind == "compact" and not (Path(models) / "compact" / "manifest.json").exists():
+            print("⚠️ No hay artefacto compacto; entrena primero con train_and_save.")
+            continue
+        queue = ctx.Queue()
+        procs = [ctx.Process(target=_worker, args=(kind, models, queue)) for _ in range(workers)]
+        for p in procs:
+            p.start()
+        results.extend(queue.get() for _ in procs)
+        for p in procs:
+            p.join()
+    return results
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser("Benchmark de artefactos de modelo")
+    p.add_argument("--models", default=str(Path(__file__).parent / "models"))
+    p.add_argument("--workers", type=int, default=4)
+    args = p.parse_args()
+
+    import pandas as pd
+    table = pd.DataFrame(run(args.models, args.workers))
+    print(table.groupby("kind").mean(numeric_only=True).round(2).to_string())
@@ -0,0 +1,186 @@
+# backend/dashboard.py
+
+import calendar
+import gzip
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from urllib.parse import urlencode
+
+from dataset_store import file_stamp, get_dataset
+
+# Agrupación que pinta el dashboard al cargar
+DEFAULT_GROUP_FIELD = "Category"
+
+# Entradas que `/` incrusta en el HTML para el primer pintado
+BOOT_KEYS = ["kpis", f"grouped?field={DEFAULT_GROUP_FIELD}"]
+
+
+# -------------------------------------------------------
+# Respuestas de /kpis, /grouped y /sales_trend a partir de los agregados
+# -------------------------------------------------------
+def grouped_payload(grouped) -> dict:
+    return {"data": [
+        {
+          "group":           row["group"],
+          "total_sales":     float(row["total_sales"]),
+          "total_quantity":  int(row["total_quantity"]),
+          "avg_discount":    float(row["avg_discount"]),
+          "total_profit":    float(row["total_profit"])
+        }
+        for _, row in grouped.iterrows()
+    ]}
+
+
+def trend_payload(agg, year: int, month=None, vendor=None) -> dict:
+    """Ventas diarias de `month` (si es de `year`) o mes a mes de `year`, por cliente."""
+    if month:
+        pivot = agg.daily_trend(month, vendor) if month.startswith(f"{year}-") else None
+        days = calendar.monthrange(int(month[:4]), int(month[5:]))[1]
+        labels = [f"{month}-{d:02d}" for d in range(1, days + 1)]
+    else:
+        pivot = agg.monthly_trend(year, vendor)
+        labels = pivot.index.tolist()
+    columns = [] if pivot is None else pivot.columns
+    return {"labels": labels, "datasets": [
+        {"vendor": c, "values": pivot[c].tolist()}
+        for c in columns
+    ]}
+
+
+def snapshot_key(endpoint: str, **params) -> str:
+    """Clave de una respuesta: endpoint + parámetros no nulos en orden fijo."""
+    query = urlencode(sorted((k, v) for k, v in params.items() if v is not None))
+    return f"{endpoint}?{query}" if query else endpoint
+
+
+def dashboard_entries(ds) -> dict:
+    """
+    Estado por defecto del dashboard (sin filtros de cliente / producto):
+    KPIs y agrupación por DEFAULT_GROUP_FIELD, globales y de cada mes, y
+    tendencia mensual de cada año y diaria de cada mes.
+    """
+    agg = ds.aggregates
+    months = sorted(agg.base.parts)
+    years = sorted({int(m[:4]) for m in months})
+    entries = {}
+    for month in [None] + months:
+        entries[snapshot_key("kpis", month=month)] = agg.kpis(month)
+        if agg.supports_group(DEFAULT_GROUP_FIELD):
+            entries[snapshot_key("grouped", field=DEFAULT_GROUP_FIELD, month=month)] = \
+                grouped_payload(agg.grouped(DEFAULT_GROUP_FIELD, month))
+    for year in years:
+        entries[snapshot_key("sales_trend", year=year)] = trend_payload(agg, year)
+    for month in months:
+        entries[snapshot_key("sales_trend", year=int(month[:4]), month=month)] = \
+            trend_payload(agg, int(month[:4]), month)
+    return entries
+
+
+# -------------------------------------------------------
+# Snapshots comprimidos por versión del dataset
+# -------------------------------------------------------
+class DashboardSnapshot:
+    """
+    Respuestas precalculadas de un CSV, válidas mientras el fichero no
+    cambie (`stamp`, mtime y tamaño). Cada entrada se guarda como JSON
+    gzip listo para enviar; `boot` es el fragmento HTML con BOOT_KEYS.
+    """
+
+    def __init__(self, stamp: tuple, version: str, entries: dict, source_stamp: tuple | None = None):
+        self.stamp = tuple(stamp)
+        self.version = version
+        self.source_stamp = source_stamp
+        self.entries = {
+            key: gzip.compress(json.dumps(payload).encode(), compresslevel=6)
+            for key, payload in entries.items()
+        }
+        boot = json.dumps({k: entries[k] for k in BOOT_KEYS if k in entries})
+        # "<" escapado: el JSON no puede cerrar la etiqueta <script>
+        self.boot = ('<script id="dashboard-snapshot" type="application/json">'
+                     + boot.replace("<", "\\u003c") + "</script>")
+
+    def body(self, key: str) -> bytes | None:
+        return self.entries.get(key)
+
+    def etag(self, key: str) -> str:
+        return f'"{self.version}-snap-{hashlib.sha1(key.encode()).hexdigest()[:12]}"'
+
+
+def snapshot_file(path: Path) -> Path:
+    """Fichero del snapshot del dashboard, junto al CSV."""
+    return path.with_name(f".{path.name}.dashboard.json.gz")
+
+
+_lock = threading.Lock()
+_snapshots: dict = {}   # ruta -> DashboardSnapshot (puede estar desfasado)
+
+
+def _read(path: Path) -> DashboardSnapshot | None:
+    target = snapshot_file(path)
+    try:
+        source = file_stamp(target)
+        with gzip.open(target, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return DashboardSnapshot(data["stamp"], data["version"], data["entries"], source)
+
+
+def current_snapshot(path) -> DashboardSnapshot | None:
+    """
+    Snapshot del CSV de `path` si está al día con el fichero. Sólo hace
+    stat; el snapshot en disco (escrito por cualquier worker) se relee
+    únicamente cuando ha cambiado.
+    """
+    path = Path(path)
+    try:
+        stamp = file_stamp(path)
+    except OSError:
+        return None
+    snap = _snapshots.get(str(path))
+    if snap is None or snap.stamp != stamp:
+        try:
+            source = file_stamp(snapshot_file(path))
+        except OSError:
+            return None
+        if snap is None or snap.source_stamp != source:
+            snap = _read(path)
+            if snap is None:
+                return None
+            _snapshots[str(path)] = snap
+    return snap if snap.stamp == stamp else None
+
+
+def build_snapshot(path) -> DashboardSnapshot | None:
+    """
+    Precalcula y guarda el snapshot del CSV de `path` (tarea de fondo tras
+    la ingesta o el entrenamiento). No hace nada si ya está al día; si el
+    CSV cambia mientras se calcula se descarta, lo rehará la siguiente.
+    """
+    path = Path(path)
+    with _lock:
+        snap = current_snapshot(path)
+        if snap is not None or not path.exists():
+            return snap
+        stamp = file_stamp(path)
+        ds = get_dataset(path)
+        if ds.aggregates is None or file_stamp(path) != stamp:
+            return None
+        entries = dashboard_entries(ds)
+        target = snapshot_file(path)
+        tmp = target.with_name(target.name + f".tmp{os.getpid()}")
+        try:
+            with gzip.open(tmp, "wt", encoding="utf-8") as f:
+                json.dump({"stamp": list(stamp), "version": ds.version, "entries": entries}, f)
+            os.replace(tmp, target)
+            source = file_stamp(target)
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar el snapshot del dashboard de {path.name}: {e}")
+            tmp.unlink(missing_ok=True)
+            source = None
+        snap = DashboardSnapshot(stamp, ds.version, entries, source)
+        _snapshots[str(path)] = snap
+        return snap
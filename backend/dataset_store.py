@@ -0,0 +1,342 @@
+# backend/dataset_store.py
+
+import hashlib
+import io
+import json
+import os
+import shutil
+import threading
+import uuid
+from bisect import bisect_left
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from schema import DATE_PARTS, read_orders, typed_orders
+from aggregates import VENDOR_COL, OrderAggregates
+from indexes import RowIndex
+from features import LagFeatures
+from lru import MemoryBudget
+
+# Columnas con índice invertido valor → filas
+INDEXED_COLS = [VENDOR_COL, "product"]
+
+# Presupuesto de memoria compartido por los datasets y modelos de todos los
+# tenants; los más fríos se liberan y se recargan de su snapshot columnar
+memory_budget = MemoryBudget(int(os.environ.get("MEMORY_BUDGET_MB", 2048)) << 20)
+
+
+def _categorize(df: pd.DataFrame) -> pd.DataFrame:
+    """Columnas de texto → category: un diccionario por columna y códigos enteros por fila."""
+    cols = list(df.select_dtypes(include="object").columns)
+    return df.astype({c: "category" for c in cols}) if cols else df
+
+
+class Dataset:
+    """
+    Snapshot en memoria de un CSV ya normalizado y tipado (schema.py): las
+    fechas llegan parseadas y con sus columnas derivadas, y `rejected`
+    guarda las filas que no cumplían el esquema.
+    Se construye una vez por versión (hash del contenido) junto con los
+    diccionarios de valores distintos de cada columna categórica, un
+    índice ordenado para búsquedas por prefijo y los agregados de
+    KPIs / agrupaciones / tendencia. Las columnas de texto se guardan como
+    `category`: los filtros por igualdad comparan códigos enteros, y
+    `index` (RowIndex) resuelve filtros de mes / cliente / producto.
+    Al recargarlo de un snapshot no hay `hasher`: la versión viene del
+    snapshot y el hash se recalcula del CSV sólo si se añaden pedidos.
+    """
+
+    def __init__(self, df: pd.DataFrame, hasher, path: Path | None = None,
+                 rejected: pd.DataFrame | None = None, version: str | None = None):
+        self.df = _categorize(df)
+        self.path = path
+        self.rejected = rejected
+        self._hasher = hasher
+        self.version = version or hasher.hexdigest()[:16]
+        # Identidad de esta instancia: las revisiones de `aggregates` son relativas a ella
+        self.lineage = uuid.uuid4().hex
+        # Campos del CSV; las partes de fecha derivadas por la ingesta no lo son
+        self.fields = sorted(c for c in df.columns if c not in DATE_PARTS)
+        self.categories = {}
+        self._codes = {}
+        self._search_index = {}
+        for col in self.df.select_dtypes(include="category").columns:
+            self._set_categories(col)
+        self._build_index()
+        try:
+            self.aggregates = OrderAggregates.from_frame(df)
+            self.aggregates_error = None
+        except (KeyError, ValueError) as e:
+            self.aggregates = None
+            self.aggregates_error = f"No se pudieron agregar los pedidos: {e}"
+        self._lag_features = None
+        self._measure()
+
+    def _measure(self):
+        """Tamaño estimado en memoria (tabla, índices y agregados) para el presupuesto."""
+        size = int(self.df.memory_usage(deep=True).sum())
+        size += self.index.by_month.nbytes + sum(o.nbytes + f.nbytes for o, f in self.index.postings.values())
+        if self.aggregates is not None:
+            cubes = [self.aggregates.base, self.aggregates.trend, *self.aggregates.groups.values()]
+            # Valores y códigos del índice por partición; los niveles (textos)
+            # son compartidos y se cuentan una vez por cubo
+            for cube in cubes:
+                parts = list(cube.parts.values())
+                size += sum(int(p.memory_usage(index=False).sum()) + sum(c.nbytes for c in p.index.codes)
+                            for p in parts)
+                if parts:
+                    size += sum(level.memory_usage(deep=True) for level in parts[0].index.levels)
+        if self._lag_features is not None:
+            size += self._lag_features.Y.nbytes + self._lag_features.features.nbytes
+        self.nbytes = size
+
+    def _build_index(self):
+        self.index = RowIndex(self.df, [c for c in INDEXED_COLS if c in self.categories])
+
+    def _set_categories(self, col: str):
+        cats = self.df[col].cat.categories
+        self._codes[col] = dict(zip(cats, range(len(cats))))
+        values = sorted(cats.astype(str))
+        self.categories[col] = values
+        pairs = sorted((v.lower(), v) for v in values)
+        self._search_index[col] = ([k for k, _ in pairs], [v for _, v in pairs])
+
+    def append(self, delta: pd.DataFrame, appended: bytes) -> set:
+        """
+        Añade pedidos ya normalizados y tipados (mismas columnas que `df`) y actualiza
+        diccionarios, índices y agregados sin recalcular. `appended` son los bytes
+        escritos al final del CSV, así la versión coincide con la de una
+        recarga completa. Devuelve las series (region, product) tocadas.
+        """
+        start = len(self.df)
+        delta.index = pd.RangeIndex(start, start + len(delta))
+        base, grown = self.df, []
+        for col in self.categories:
+            new = pd.Index(delta[col].dropna().unique()).difference(base[col].cat.categories)
+            if len(new):
+                # Los códigos existentes no cambian: las categorías nuevas van al final
+                base = base.assign(**{col: base[col].cat.add_categories(new)})
+                grown.append(col)
+            delta[col] = pd.Categorical(delta[col], categories=base[col].cat.categories)
+        self.df = pd.concat([base, delta])
+        for col in grown:
+            self._set_categories(col)
+        self.index.append(self.df.iloc[start:], start)
+        changed = self.aggregates.add(delta) if self.aggregates is not None else set()
+        if self._lag_features is not None:
+            try:
+                self._lag_features.add(delta)
+            except ValueError:
+                self._lag_features = None  # se reconstruye en el próximo uso
+        if self._hasher is None:
+            # Recargado de snapshot: el hash parte del CSV previo a estos bytes
+            data = self.path.read_bytes()
+            self._hasher = hashlib.sha1(data[:len(data) - len(appended)])
+        self._hasher.update(appended)
+        self.version = self._hasher.hexdigest()[:16]
+        self._measure()
+        return changed
+
+    @property
+    def lag_features(self) -> LagFeatures:
+        """Series mensuales y features de demanda; se construyen al primer uso."""
+        if self._lag_features is None:
+            self._lag_features = LagFeatures.from_frame(self.df)
+            self._measure()
+        return self._lag_features
+
+    def code_of(self, col: str, value) -> int:
+        """Código entero de `value` en la columna categórica `col` (-1 si no existe)."""
+        return self._codes[col].get(value, -1)
+
+    def select(self, month: str | None = None, filters: dict | None = None) -> np.ndarray:
+        """
+        Posiciones de las filas del mes `month` ("YYYY-MM") con col == valor
+        para cada par de `filters` (columnas de INDEXED_COLS).
+        """
+        codes = {col: self.code_of(col, value) for col, value in (filters or {}).items()}
+        return self.index.select(month, codes)
+
+    def etag(self, name: str) -> str:
+        """ETag fuerte para un recurso derivado de esta versión."""
+        return f'"{self.version}-{name}"'
+
+    def search(self, col: str, prefix: str, limit: int = 20) -> list:
+        """Valores de `col` que empiezan por `prefix` (sin distinguir mayúsculas)."""
+        keys, values = self._search_index[col]
+        p = prefix.lower()
+        start = bisect_left(keys, p)
+        # Los keys están ordenados: en cuanto uno deja de coincidir, paramos
+        out = []
+        for i in range(start, len(keys)):
+            if len(out) >= limit or not keys[i].startswith(p):
+                break
+            out.append(values[i])
+        return out
+
+
+def build_dataset(data: bytes, path: Path | None = None) -> Dataset:
+    """Parsea, normaliza y tipa el CSV en bruto; la versión es el hash del contenido."""
+    df, rejected = read_orders(data)
+    return Dataset(df, hashlib.sha1(data), path, rejected)
+
+
+# -------------------------------------------------------
+# Snapshot columnar: un .npy por columna junto al CSV
+# -------------------------------------------------------
+# Layout: <dir>/.<csv>.columns/{meta.json, c<i>.npy, rejected.csv}
+#   meta.json: stamp del CSV, versión y tipo de cada columna; las
+#   categóricas se guardan como códigos + lista de categorías.
+def snapshot_dir(path: Path) -> Path:
+    return path.parent / f".{path.name}.columns"
+
+
+def save_snapshot(ds: Dataset, stamp: tuple) -> bool:
+    """
+    Escribe el snapshot en un directorio temporal y lo sustituye de una vez.
+    Es sólo una caché: si no se puede escribir se avisa y se sigue.
+    """
+    final = snapshot_dir(ds.path)
+    tmp = final.with_name(f"{final.name}.{os.getpid()}.{uuid.uuid4().hex[:6]}")
+    try:
+        _write_snapshot(ds, stamp, tmp, final)
+    except OSError as e:
+        shutil.rmtree(tmp, ignore_errors=True)
+        print(f"⚠️ No se pudo guardar el snapshot de {ds.path.name}: {e}")
+        return False
+    return True
+
+
+def _write_snapshot(ds: Dataset, stamp: tuple, tmp: Path, final: Path):
+    tmp.mkdir()
+    columns = []
+    for i, col in enumerate(ds.df.columns):
+        values = ds.df[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            np.save(tmp / f"c{i}.npy", values.cat.codes.to_numpy())
+            columns.append({"name": col, "categories": values.cat.categories.astype(str).tolist()})
+        else:
+            np.save(tmp / f"c{i}.npy", values.to_numpy())
+            columns.append({"name": col})
+    if ds.rejected is not None:
+        ds.rejected.to_csv(tmp / "rejected.csv", index=False)
+    (tmp / "meta.json").write_text(json.dumps({"stamp": list(stamp), "version": ds.version,
+                                               "columns": columns}))
+    old = final.with_name(f"{tmp.name}.old")
+    if final.exists():
+        final.rename(old)
+    tmp.rename(final)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def load_snapshot(path: Path, stamp: tuple) -> Dataset | None:
+    """Dataset del snapshot de `path` si corresponde a este estado del CSV."""
+    folder = snapshot_dir(path)
+    try:
+        meta = json.loads((folder / "meta.json").read_text())
+        if tuple(meta["stamp"]) != tuple(stamp):
+            return None
+        data = {}
+        for i, col in enumerate(meta["columns"]):
+            values = np.load(folder / f"c{i}.npy")
+            if "categories" in col:
+                values = pd.Categorical.from_codes(values, col["categories"])
+            data[col["name"]] = values
+        rejected = pd.read_csv(folder / "rejected.csv") if (folder / "rejected.csv").exists() else None
+    except (FileNotFoundError, KeyError, ValueError):
+        return None  # snapshot ausente, a medio escribir o de otro formato
+    return Dataset(pd.DataFrame(data), None, path, rejected, meta["version"])
+
+
+# -------------------------------------------------------
+# Caché por ruta: se invalida cuando cambia mtime o tamaño.
+# Las entradas cuentan contra memory_budget; al expulsarse se guarda el
+# snapshot si hubo ingesta incremental desde el último.
+# -------------------------------------------------------
+_lock = threading.RLock()
+_datasets: dict = {}   # ruta -> (stamp, Dataset, snapshot al día)
+
+
+def file_stamp(path: Path) -> tuple:
+    st = path.stat()
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _release(key: str):
+    with _lock:
+        cached = _datasets.pop(key, None)
+        if cached and not cached[2]:
+            save_snapshot(cached[1], cached[0])
+
+
+def _track(key: str, ds: Dataset):
+    memory_budget.touch(("dataset", key), ds.nbytes, lambda: _release(key))
+
+
+def _load(path: Path) -> Dataset:
+    cached = _datasets.get(str(path))
+    stamp = file_stamp(path)
+    if cached and cached[0] == stamp:
+        return cached[1]
+    ds = load_snapshot(path, stamp)
+    if ds is None:
+        ds = build_dataset(path.read_bytes(), path)
+        save_snapshot(ds, stamp)
+    _datasets[str(path)] = (stamp, ds, True)
+    return ds
+
+
+def get_dataset(path: Path) -> Dataset:
+    """
+    Devuelve el Dataset de `path`, reconstruyéndolo sólo si el fichero
+    cambió en disco (p. ej. tras /upload_csv en otro worker). Si se
+    expulsó de memoria se recarga de su snapshot sin volver a parsear.
+    """
+    path = Path(path)
+    cached = _datasets.get(str(path))
+    if cached and cached[0] == file_stamp(path):
+        ds = cached[1]
+    else:
+        with _lock:
+            ds = _load(path)
+    _track(str(path), ds)
+    return ds
+
+
+def append_rows(path: Path, data: bytes) -> tuple:
+    """
+    Ingesta incremental: añade al CSV de `path` las filas del CSV `data`
+    (mismo esquema de columnas) y actualiza el Dataset en memoria. Las
+    filas que no cumplen el esquema se escriben igual (una recarga las
+    vuelve a rechazar) pero no entran en el Dataset.
+    Devuelve (dataset, series (region, product) modificadas, rechazos).
+    """
+    path = Path(path)
+    with _lock:
+        ds = _load(path)
+        raw = pd.read_csv(io.BytesIO(data), encoding="latin1")
+        header = pd.read_csv(path, nrows=0, encoding="latin1").columns
+        missing = [c for c in header if c not in raw.columns]
+        if missing:
+            raise ValueError(f"Faltan columnas en los pedidos nuevos: {missing}")
+        raw = raw[list(header)]
+        # Mismas columnas normalizadas que el dataset (el esquema coincide)
+        source = [c for c in ds.df.columns if c not in DATE_PARTS]
+        delta, rejected = typed_orders(raw.set_axis(source, axis=1))
+
+        # Mismo fin de línea que el fichero existente
+        with open(path, "rb") as f:
+            f.seek(max(file_stamp(path)[1] - 2, 0))
+            tail = f.read()
+        eol = "\r\n" if tail.endswith(b"\r\n") else "\n"
+        text = raw.to_csv(index=False, header=False, lineterminator=eol)
+        appended = (b"" if tail.endswith(b"\n") else eol.encode()) + text.encode("latin1")
+        with open(path, "ab") as f:
+            f.write(appended)
+
+        changed = ds.append(delta, appended)
+        _datasets[str(path)] = (file_stamp(path), ds, False)
+    _track(str(path), ds)
+    return ds, changed, rejected
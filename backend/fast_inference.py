@@ -0,0 +1,207 @@
+# backend/fast_inference.py
+
+import numpy as np
+import pandas as pd
+
+from features import FEATURE_COLS
+from ml_utils import extract_date_features, uses_lag_features
+
+# Tolerancia de la verificación de paridad contra Pipeline.predict
+PARITY_ATOL = 1e-4
+
+
+class CompiledEncoder:
+    """
+    Equivalente "plegado" de preproc → scale: cada (year, month, year_month,
+    region, product) se mapea directamente a su índice de feature y el valor
+    del one-hot ya viene dividido por la escala del StandardScaler.
+
+    Por bloque guarda las categorías ordenadas (`keys`) y el índice de
+    feature de cada una (`cols`): la búsqueda es un `searchsorted`, así que
+    los arrays pueden venir de disco con mmap sin construir estructuras.
+    Si el pipeline usa features de demanda, son las últimas columnas y se
+    dividen por `numeric_scale` (float64, igual que StandardScaler, para
+    que los valores que caen justo en un umbral de split no cambien de rama).
+    """
+
+    def __init__(self, keys: list, cols: list, values: np.ndarray, numeric_scale: np.ndarray | None = None):
+        self.keys = keys
+        self.cols = cols
+        self.values = values
+        self.n_features = len(values)
+        self.numeric_scale = numeric_scale
+        self.n_numeric = 0 if numeric_scale is None else len(numeric_scale)
+
+    @classmethod
+    def from_pipeline(cls, pipe) -> "CompiledEncoder":
+        pre = pipe.named_steps["preproc"]
+        scale = pipe.named_steps["scale"].scale_
+        date_ohe = pre.named_transformers_["date"].named_steps["ohe"]
+        # Mismo orden de salida que el ColumnTransformer
+        blocks = list(date_ohe.categories_) + [
+            pre.named_transformers_[name].named_steps["ohe"].categories_[0]
+            for name in ("region", "product")
+        ]
+        keys, cols, offset = [], [], 0
+        for cats in blocks:
+            cats = np.asarray(cats)
+            if cats.dtype == object:
+                cats = cats.astype(str)
+            order = np.argsort(cats, kind="stable")
+            keys.append(cats[order])
+            cols.append((order + offset).astype(np.int32))
+            offset += len(cats)
+        n_numeric = len(FEATURE_COLS) if uses_lag_features(pipe) else 0
+        scale = np.ones(offset + n_numeric) if scale is None else np.asarray(scale, dtype=np.float64)
+        numeric_scale = scale[offset:] if n_numeric else None
+        return cls(keys, cols, (1.0 / scale).astype(np.float32), numeric_scale)
+
+    def same_as(self, other: "CompiledEncoder") -> bool:
+        return (
+            self.n_features == other.n_features
+            and self.n_numeric == other.n_numeric
+            and (not self.n_numeric or np.array_equal(self.numeric_scale, other.numeric_scale))
+            and np.array_equal(self.values, other.values)
+            and all(np.array_equal(a, b) for a, b in zip(self.keys, other.keys))
+            and all(np.array_equal(a, b) for a, b in zip(self.cols, other.cols))
+        )
+
+    def _columns(self, block: int, q) -> np.ndarray:
+        """Índice de feature de cada valor de `q`, o -1 si no se vio al entrenar."""
+        keys, q = self.keys[block], np.asarray(q)
+        if len(keys) == 0:
+            return np.full(len(q), -1)
+        if keys.dtype.kind == "U":
+            q = q.astype(str)
+        pos = np.minimum(np.searchsorted(keys, q), len(keys) - 1)
+        return np.where(keys[pos] == q, self.cols[block][pos], -1)
+
+    def _fill_numeric(self, X: np.ndarray, numeric):
+        # Sin features (p. ej. /predict de una fila) van como missing
+        if self.n_numeric:
+            X[:, -self.n_numeric:] = (
+                np.nan if numeric is None else np.asarray(numeric, dtype=np.float64) / self.numeric_scale
+            )
+
+    def encode(self, year, month, region, product, numeric=None) -> np.ndarray:
+        """
+        Matriz densa (n, n_features) para arrays de year/month/region/product
+        y, si el modelo las usa, las features de demanda (n, n_numeric).
+        """
+        year, month = np.asarray(year), np.asarray(month)
+        year_month = np.char.add(np.char.add(year.astype(str), "_"), month.astype(str))
+        X = np.zeros((len(year), self.n_features), dtype=np.float32)
+        rows = np.arange(len(year))
+        for block, q in enumerate((year, month, year_month, region, product)):
+            col = self._columns(block, q)
+            hit = col >= 0  # categorías no vistas → todo ceros (handle_unknown="ignore")
+            X[rows[hit], col[hit]] = self.values[col[hit]]
+        self._fill_numeric(X, numeric)
+        return X
+
+
+class CompiledForecaster:
+    """
+    Predicción de quantity y profit con `inplace_predict` sobre los boosters.
+    Opcionalmente lleva boosters multi-cuantil (`reg:quantileerror` con
+    varios alphas): una sola llamada devuelve todos los cuantiles.
+    """
+
+    def __init__(self, encoder: CompiledEncoder, booster_q, booster_p,
+                 profit_encoder: CompiledEncoder | None = None,
+                 quantile_boosters: tuple | None = None, quantiles: list | None = None):
+        self.encoder = encoder
+        self.profit_encoder = profit_encoder  # None: comparte la codificación
+        self.booster_q = booster_q
+        self.booster_p = booster_p
+        self.quantile_boosters = quantile_boosters  # (quantity, profit) o None
+        self.quantiles = quantiles
+
+    @classmethod
+    def from_pipelines(cls, pipe_q, pipe_p, quantile_pipes: tuple | None = None) -> "CompiledForecaster":
+        encoder = CompiledEncoder.from_pipeline(pipe_q)
+        profit_encoder = CompiledEncoder.from_pipeline(pipe_p)
+        quantile_boosters = quantiles = None
+        if quantile_pipes is not None:
+            # Se ajustan sobre la misma X que los de media: deben compartir codificación
+            for pipe in quantile_pipes:
+                if not CompiledEncoder.from_pipeline(pipe).same_as(encoder):
+                    raise ValueError("Los pipelines de cuantiles no comparten la codificación")
+            quantile_boosters = tuple(p.named_steps["model"].get_booster() for p in quantile_pipes)
+            quantiles = quantile_alphas(quantile_pipes[0])
+        # Ambos pipelines se ajustan sobre la misma X: normalmente coinciden
+        return cls(
+            encoder,
+            pipe_q.named_steps["model"].get_booster(),
+            pipe_p.named_steps["model"].get_booster(),
+            None if profit_encoder.same_as(encoder) else profit_encoder,
+            quantile_boosters,
+            quantiles,
+        )
+
+    def predict(self, year, month, region, product, numeric=None) -> tuple:
+        X = self.encoder.encode(year, month, region, product, numeric)
+        Xp = X if self.profit_encoder is None else self.profit_encoder.encode(year, month, region, product, numeric)
+        return self.booster_q.inplace_predict(X), self.booster_p.inplace_predict(Xp)
+
+    def predict_with_quantiles(self, year, month, region, product, numeric=None) -> tuple:
+        """
+        (q, p, q_quantiles, p_quantiles) codificando una sola vez; los
+        cuantiles son matrices (n, len(quantiles)), o None sin boosters.
+        """
+        X = self.encoder.encode(year, month, region, product, numeric)
+        Xp = X if self.profit_encoder is None else self.profit_encoder.encode(year, month, region, product, numeric)
+        q, p = self.booster_q.inplace_predict(X), self.booster_p.inplace_predict(Xp)
+        if self.quantile_boosters is None:
+            return q, p, None, None
+        bq, bp = self.quantile_boosters
+        return q, p, _as_matrix(bq.inplace_predict(X)), _as_matrix(bp.inplace_predict(X))
+
+    def predict_frame(self, df: pd.DataFrame) -> tuple:
+        """Misma entrada que Pipeline.predict: columnas date, region, product (+ features)."""
+        parts = extract_date_features(df)
+        numeric = df[FEATURE_COLS].to_numpy(dtype=np.float64) if self.encoder.n_numeric else None
+        return self.predict_with_quantiles(parts["year"].to_numpy(), parts["month"].to_numpy(),
+                                           df["region"].to_numpy(), df["product"].to_numpy(), numeric)
+
+
+def quantile_alphas(pipe) -> list:
+    """Alphas del modelo multi-cuantil de un pipeline, en el orden de salida."""
+    return [float(a) for a in np.atleast_1d(pipe.named_steps["model"].get_params()["quantile_alpha"])]
+
+
+def quantile_label(alpha: float) -> str:
+    """0.1 → "p10", 0.5 → "p50"."""
+    return f"p{round(alpha * 100):02d}"
+
+
+def _as_matrix(pred: np.ndarray) -> np.ndarray:
+    # Con un único alpha XGBoost devuelve un vector
+    return pred.reshape(len(pred), -1)
+
+
+def _check_parity(name: str, expected: np.ndarray, got: np.ndarray):
+    if not got.size:
+        return
+    diff = float(np.max(np.abs(expected - got)))
+    if diff > PARITY_ATOL * max(1.0, float(np.max(np.abs(expected)))):
+        raise ValueError(f"Paridad rota en {name}: diferencia máxima {diff:.6g}")
+
+
+def compile_pipelines(pipe_q, pipe_p, X_check: pd.DataFrame,
+                      quantile_pipes: tuple | None = None) -> CompiledForecaster:
+    """
+    Compila los pipelines (y los de cuantiles, si los hay) y verifica
+    paridad numérica con Pipeline.predict sobre `X_check`; lanza ValueError
+    si las predicciones divergen.
+    """
+    fast = CompiledForecaster.from_pipelines(pipe_q, pipe_p, quantile_pipes)
+    X_check = X_check[X_check["date"].notna()]
+    q, p, qq, pq = fast.predict_frame(X_check)
+    _check_parity("quantity", pipe_q.predict(X_check), q)
+    _check_parity("profit", pipe_p.predict(X_check), p)
+    if quantile_pipes is not None:
+        for name, pipe, got in (("quantity (cuantiles)", quantile_pipes[0], qq),
+                                ("profit (cuantiles)", quantile_pipes[1], pq)):
+            _check_parity(name, _as_matrix(pipe.predict(X_check)), got)
+    return fast
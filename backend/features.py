@@ -0,0 +1,195 @@
+# backend/features.py
+
+import numpy as np
+import pandas as pd
+
+# Features de demanda reciente por serie (region, product) y mes
+LAGS = (1, 2, 3, 6, 12)
+WINDOWS = (3, 6)
+FEATURE_COLS = (
+    [f"lag_{k}" for k in LAGS]
+    + [f"roll_mean_{w}" for w in WINDOWS]
+    + [f"roll_std_{w}" for w in WINDOWS]
+    + ["trend_3"]
+)
+# Meses de historia que necesita la feature más larga
+TAIL_MONTHS = max(max(LAGS), max(WINDOWS), 6)
+
+
+def month_numbers(df: pd.DataFrame) -> pd.Series:
+    """
+    año * 12 + mes - 1 de cada fila (NaN sin fecha); usa las columnas
+    year / month que deriva la ingesta (schema.py) si existen.
+    """
+    if "year" in df.columns and "month" in df.columns:
+        return df["year"].astype(np.int64) * 12 + df["month"] - 1
+    return df["date"].dt.year * 12 + df["date"].dt.month - 1
+
+
+def order_line_rate(df: pd.DataFrame, regions, products, last: int | None = None) -> np.ndarray:
+    """
+    Líneas de pedido por mes de `df` de cada serie (regions[i], products[i]),
+    desde su primer pedido hasta el mes `last` (año * 12 + mes - 1; por
+    defecto el último de `df`). Las series sin pedidos valen 0. Convierte
+    el pronóstico por línea de pedido en demanda mensual.
+    """
+    keys = pd.MultiIndex.from_arrays([np.asarray(regions).astype(str), np.asarray(products).astype(str)])
+    df = df[df["date"].notna()]
+    series = keys.get_indexer(pd.MultiIndex.from_arrays([df["region"].astype(str), df["product"].astype(str)]))
+    month = month_numbers(df).to_numpy(dtype=np.int64)
+    if last is None:
+        last = int(month.max()) if len(month) else 0
+    ok = (series >= 0) & (month <= last)
+    lines = np.bincount(series[ok], minlength=len(keys))
+    first = np.full(len(keys), last, dtype=np.int64)
+    np.minimum.at(first, series[ok], month[ok])
+    return lines / (last - first + 1)
+
+
+def window_features(Y: np.ndarray) -> np.ndarray:
+    """
+    Features de ventana para la matriz Y (series × meses) de cantidades
+    mensuales. Devuelve (series × (meses + 1) × features): la columna m usa
+    sólo Y[:, :m], así que la última es la del mes siguiente al histórico.
+    Todas las series se calculan a la vez con desplazamientos y sumas
+    acumuladas sobre el eje de meses; lo que no tiene historia es NaN.
+    """
+    S, M = Y.shape
+    out = np.full((S, M + 1, len(FEATURE_COLS)), np.nan, dtype=np.float32)
+    C = np.zeros((S, M + 1))
+    C2 = np.zeros((S, M + 1))
+    np.cumsum(Y, axis=1, out=C[:, 1:])
+    np.cumsum(Y ** 2, axis=1, out=C2[:, 1:])
+
+    j = 0
+    for k in LAGS:
+        if k <= M:
+            out[:, k:, j] = Y[:, :M + 1 - k]
+        j += 1
+
+    def window_sum(A, w, lo):
+        # Suma de los w meses anteriores a cada columna m >= lo
+        return A[:, lo:] - A[:, lo - w:M + 1 - w]
+
+    means = {}
+    for w in WINDOWS:
+        if w <= M:
+            means[w] = window_sum(C, w, w) / w
+            out[:, w:, j] = means[w]
+        j += 1
+    for w in WINDOWS:
+        if w <= M:
+            var = (window_sum(C2, w, w) - w * means[w] ** 2) / max(w - 1, 1)
+            out[:, w:, j] = np.sqrt(np.clip(var, 0, None))
+        j += 1
+    # Tendencia: media de los 3 últimos meses menos la de los 3 anteriores
+    if M >= 6:
+        out[:, 6:, j] = (window_sum(C, 3, 6) - (C[:, 3:M - 2] - C[:, :M - 5])) / 3
+    return out
+
+
+class LagFeatures:
+    """
+    Series mensuales de quantity por (region, product) en una matriz densa
+    (series × meses contiguos) y sus features de ventana. La misma
+    estructura da las features de entrenamiento (cada pedido ve los meses
+    anteriores al suyo) y las de servicio hasta el mes siguiente al último
+    observado; más allá dependen de la demanda pronosticada
+    (forecasting.predict_ahead las calcula con `tail`).
+    """
+
+    def __init__(self, keys: pd.MultiIndex, start: int, Y: np.ndarray):
+        self.keys = keys
+        self.start = start  # año * 12 + mes - 1 de la primera columna
+        self.Y = Y
+        self.features = window_features(Y)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "LagFeatures":
+        ok = (df["date"].notna() & df["region"].notna() & df["product"].notna()).to_numpy()
+        codes, keys = pd.MultiIndex.from_arrays(
+            [df["region"][ok].astype(str), df["product"][ok].astype(str)]
+        ).factorize(sort=True)
+        month = month_numbers(df[ok]).to_numpy(dtype=np.int64)
+        start = int(month.min()) if len(month) else 0
+        n_months = int(month.max()) - start + 1 if len(month) else 0
+        Y = np.zeros((len(keys), n_months))
+        np.add.at(Y, (codes, month - start), df["quantity"][ok].to_numpy(dtype=float))
+        return cls(keys, start, Y)
+
+    def add(self, delta: pd.DataFrame):
+        """
+        Suma pedidos nuevos y recalcula sólo las columnas afectadas, a
+        partir de una cola de TAIL_MONTHS meses anteriores de cada serie.
+        Lanza ValueError si hay pedidos anteriores al primer mes.
+        """
+        ok = (delta["date"].notna() & delta["region"].notna() & delta["product"].notna()).to_numpy()
+        if not ok.any():
+            return
+        pairs = pd.MultiIndex.from_arrays([delta["region"][ok].astype(str), delta["product"][ok].astype(str)])
+        month = month_numbers(delta[ok]).to_numpy(dtype=np.int64) - self.start
+        if month.min() < 0:
+            raise ValueError("Pedidos anteriores al histórico: hay que reconstruir")
+        new_keys = pairs.unique().difference(self.keys)
+        if len(new_keys):
+            self.keys = self.keys.append(new_keys)
+        grow_s = len(self.keys) - self.Y.shape[0]
+        grow_m = max(int(month.max()) + 1 - self.Y.shape[1], 0)
+        if grow_s or grow_m:
+            self.Y = np.pad(self.Y, ((0, grow_s), (0, grow_m)))
+            self.features = np.pad(self.features, ((0, grow_s), (0, grow_m), (0, 0)),
+                                   constant_values=np.nan)
+        np.add.at(self.Y, (self.keys.get_indexer(pairs), month), delta["quantity"][ok].to_numpy(dtype=float))
+
+        first = int(month.min())
+        lo = max(first - TAIL_MONTHS, 0)
+        self.features[:, first:] = window_features(self.Y[:, lo:])[:, first - lo:]
+        if grow_s:
+            # Series nuevas: sus meses previos son ceros, como en una reconstrucción
+            self.features[-grow_s:] = window_features(self.Y[-grow_s:])
+
+    @property
+    def last_month(self) -> int:
+        """año * 12 + mes - 1 del último mes del histórico."""
+        return self.start + self.Y.shape[1] - 1
+
+    def series_index(self, regions, products) -> np.ndarray:
+        """Fila de cada (región, producto) en Y, o -1 si la serie no existe."""
+        return self.keys.get_indexer(pd.MultiIndex.from_arrays(
+            [np.asarray(regions).astype(str), np.asarray(products).astype(str)]
+        ))
+
+    def lookup(self, regions, products, years, months) -> np.ndarray:
+        """
+        Features (n × len(FEATURE_COLS)) para cada fila (región, producto,
+        año, mes). Fuera de [inicio, último mes + 1] son NaN.
+        """
+        s = self.series_index(regions, products)
+        m = np.asarray(years) * 12 + np.asarray(months) - 1 - self.start
+        last = self.features.shape[1] - 1
+        out = self.features[np.clip(s, 0, None), np.clip(m, 0, last)]
+        out[(s < 0) | (m < 0) | (m > last)] = np.nan
+        return out
+
+    def tail(self, s: np.ndarray, n_months: int = TAIL_MONTHS) -> np.ndarray:
+        """Últimos `n_months` meses de las series `s` (ceros para s = -1)."""
+        n_months = min(n_months, self.Y.shape[1])
+        out = self.Y[np.clip(s, 0, None), self.Y.shape[1] - n_months:].copy()
+        out[s < 0] = 0
+        return out
+
+
+def frame_features(df: pd.DataFrame, history=None) -> pd.DataFrame:
+    """
+    Features de entrenamiento de cada fila de `df` (mismo índice), con las
+    series mensuales de `history` (por defecto, el propio `df`): un
+    DataFrame de pedidos o un LagFeatures ya construido.
+    """
+    if isinstance(history, LagFeatures):
+        store = history
+    else:
+        store = LagFeatures.from_frame(df if history is None else history)
+    month = month_numbers(df).fillna(0).to_numpy(dtype=np.int64)
+    values = store.lookup(df["region"], df["product"], month // 12, month % 12 + 1)
+    values[df["date"].isna().to_numpy()] = np.nan
+    return pd.DataFrame(values, columns=FEATURE_COLS, index=df.index)
@@ -0,0 +1,254 @@
+# backend/forecasting.py
+
+import numpy as np
+import pandas as pd
+
+from fast_inference import quantile_alphas
+from features import FEATURE_COLS, window_features
+from ml_utils import uses_lag_features
+
+# Frecuencias de /forecast → frecuencia de pandas Period
+PERIOD_FREQS = {"week": "W", "month": "M", "quarter": "Q", "year": "Y"}
+
+# Filas (serie, mes) que se codifican/predicen por bloque
+CHUNK_ROWS = 8192
+
+
+def period_bounds(date: pd.Timestamp, period: str) -> tuple:
+    """Inicio y fin del periodo de /predict que contiene `date` ("day" = su mes)."""
+    if period == "day":
+        p = pd.Period(date, "M")
+    elif period == "quarter":
+        p = pd.Period(date, "Q")
+    elif period == "semester":
+        first = 1 if date.month <= 6 else 7
+        start = pd.Timestamp(date.year, first, 1)
+        return start, start + pd.DateOffset(months=6) - pd.Timedelta(days=1)
+    elif period == "year":
+        p = pd.Period(date, "Y")
+    else:
+        raise ValueError(f"Período desconocido '{period}'")
+    return p.start_time.normalize(), p.end_time.normalize()
+
+
+def build_periods(start, end, freq: str, custom: list | None = None) -> pd.DataFrame:
+    """
+    Tabla de periodos [label, start, end] (fechas inclusivas). `freq` es
+    week/month/quarter/year sobre [start, end] o "custom" con `custom` =
+    [{"start", "end", "label"?}, ...].
+    """
+    if freq == "custom":
+        frame = pd.DataFrame(custom or [])
+        if frame.empty or not {"start", "end"} <= set(frame.columns):
+            raise ValueError("Los periodos 'custom' necesitan 'start' y 'end'")
+        frame["start"] = pd.to_datetime(frame["start"])
+        frame["end"] = pd.to_datetime(frame["end"])
+        if "label" not in frame.columns:
+            frame["label"] = frame["start"].dt.strftime("%Y-%m-%d") + "/" + frame["end"].dt.strftime("%Y-%m-%d")
+    else:
+        if freq not in PERIOD_FREQS:
+            raise ValueError(f"Frecuencia desconocida '{freq}'")
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        prng = pd.period_range(start, end, freq=PERIOD_FREQS[freq])
+        frame = pd.DataFrame({
+            "label": prng.astype(str),
+            "start": np.maximum(prng.start_time.normalize().values, start.to_datetime64()),
+            "end":   np.minimum(prng.end_time.normalize().values, end.to_datetime64()),
+        })
+    if (frame["end"] < frame["start"]).any():
+        raise ValueError("Hay periodos con 'end' anterior a 'start'")
+    return frame[["label", "start", "end"]].reset_index(drop=True)
+
+
+def month_weights(periods: pd.DataFrame) -> tuple:
+    """
+    Meses que cubren los periodos y matriz W (periodos × meses) con la
+    fracción de cada mes incluida en cada periodo: 1 para meses completos,
+    días_cubiertos / días_del_mes en los parciales.
+    """
+    months = pd.period_range(periods["start"].min(), periods["end"].max(), freq="M")
+    s = periods["start"].values.astype("datetime64[D]")[:, None]
+    e = periods["end"].values.astype("datetime64[D]")[:, None]
+    ms = months.start_time.values.astype("datetime64[D]")[None, :]
+    me = months.end_time.values.astype("datetime64[D]")[None, :]
+    overlap = (np.minimum(e, me) - np.maximum(s, ms)).astype(int) + 1
+    W = np.clip(overlap, 0, None) / months.days_in_month.values[None, :]
+    return months, W
+
+
+def quantile_spread(deviation: np.ndarray, W: np.ndarray) -> np.ndarray:
+    """
+    Desviaciones de los cuantiles mensuales respecto al pronóstico puntual
+    (series × meses × cuantiles) → suma por periodo de sus cuadrados, por
+    separado las positivas y las negativas (series × periodos × cuantiles
+    × 2). Es aditiva: la de un agregado es la suma de las de sus miembros.
+    """
+    W2 = W ** 2
+    return np.stack([
+        np.einsum("nmk,pm->npk", np.clip(deviation, 0, None) ** 2, W2),
+        np.einsum("nmk,pm->npk", np.clip(deviation, None, 0) ** 2, W2),
+    ], axis=-1)
+
+
+def combine_quantiles(point: np.ndarray, spread: np.ndarray) -> np.ndarray:
+    """
+    Cuantiles de una suma de demandas independientes a partir de su
+    pronóstico puntual sumado y su quantile_spread sumado: punto + √Σd₊²
+    − √Σd₋². Exacto para normales independientes y, con un solo mes y
+    una serie, devuelve los cuantiles del modelo. Sumar los cuantiles
+    directamente supondría demanda perfectamente correlada.
+    """
+    return point[..., None] + np.sqrt(spread[..., 0]) - np.sqrt(spread[..., 1])
+
+
+def model_quantiles(models) -> list | None:
+    """Alphas de los modelos de cuantiles de la versión, o None si no tiene."""
+    if models.fast is not None:
+        return models.fast.quantiles if models.fast.quantile_boosters is not None else None
+    pipes = models.quantile_pipelines()
+    return quantile_alphas(pipes[0]) if pipes is not None else None
+
+
+def model_uses_lags(models) -> bool:
+    """Si los modelos de la versión necesitan las features de demanda."""
+    if models.fast is not None:
+        return models.fast.encoder.n_numeric > 0
+    pipe_q, _ = models.pipelines()
+    return pipe_q is not None and uses_lag_features(pipe_q)
+
+
+def predict_rows(models, years, months, regions, products, numeric=None) -> dict:
+    """
+    Predicción por filas con la ruta compilada (o los pipelines), por
+    bloques. `numeric` son las features de demanda de cada fila si el
+    modelo las usa. Devuelve quantity y profit y, si la versión tiene
+    modelos de cuantiles, quantity_quantiles / profit_quantiles (filas ×
+    cuantiles) calculados en la misma pasada.
+    """
+    n = len(years)
+    alphas = model_quantiles(models)
+    out = {"quantity": np.empty(n), "profit": np.empty(n)}
+    if alphas is not None:
+        out["quantity_quantiles"] = np.empty((n, len(alphas)))
+        out["profit_quantiles"] = np.empty((n, len(alphas)))
+    for lo in range(0, n, CHUNK_ROWS):
+        sl = slice(lo, lo + CHUNK_ROWS)
+        num = None if numeric is None else numeric[sl]
+        if models.fast is not None:
+            q, p, qq, pq = models.fast.predict_with_quantiles(years[sl], months[sl], regions[sl], products[sl], num)
+        else:
+            pipe_q, pipe_p = models.pipelines()
+            df = pd.DataFrame({
+                "date":    pd.to_datetime(pd.DataFrame({"year": years[sl], "month": months[sl], "day": 1})),
+                "region":  regions[sl],
+                "product": products[sl],
+            })
+            if num is not None:
+                df[FEATURE_COLS] = num
+            q, p = pipe_q.predict(df), pipe_p.predict(df)
+            if alphas is not None:
+                pipe_qq, pipe_pq = models.quantile_pipelines()
+                qq, pq = pipe_qq.predict(df), pipe_pq.predict(df)
+        out["quantity"][sl], out["profit"][sl] = q, p
+        if alphas is not None:
+            out["quantity_quantiles"][sl] = np.reshape(qq, (len(q), -1))
+            out["profit_quantiles"][sl] = np.reshape(pq, (len(p), -1))
+    return out
+
+
+def predict_ahead(models, lags, regions, products, months: pd.PeriodIndex) -> dict:
+    """
+    predict_rows del grid (serie, mes) (mes como eje más rápido) para un
+    modelo con features de demanda. Hasta el mes siguiente al histórico
+    las features salen de la demanda real (`lags`, un LagFeatures); los
+    meses posteriores se pronostican en orden y la quantity de cada uno
+    se añade a la cola de la serie como demanda de ese mes, así las
+    features de h > 1 usan lo pronosticado en h - 1. Sólo los modelos
+    mensuales predicen la demanda del mes: con los de línea de pedido
+    lanza ValueError si se pide más allá del mes siguiente al histórico.
+    """
+    regions, products = np.asarray(regions, dtype=object), np.asarray(products, dtype=object)
+    n, M = len(regions), len(months)
+    month_no = (months.year.values * 12 + months.month.values - 1).astype(np.int64)
+    ahead = month_no > lags.last_month + 1
+    if ahead.any() and not models.monthly:
+        raise ValueError("El modelo usa features de demanda por línea de pedido: sólo pronostica "
+                         "hasta el mes siguiente al histórico. Entrena con monthly=true para "
+                         "horizontes más largos.")
+    out = None
+
+    def store(result: dict, cols: np.ndarray):
+        # Copia las filas (serie, cols) de un bloque al grid completo
+        nonlocal out
+        if out is None:
+            out = {k: np.empty((n, M) + v.shape[1:]) for k, v in result.items()}
+        for k, v in result.items():
+            out[k][:, cols] = v.reshape((n, len(cols)) + v.shape[1:])
+
+    known = np.flatnonzero(~ahead)
+    if len(known):
+        years, month_nos = np.tile(months.year.values[known], n), np.tile(months.month.values[known], n)
+        row_regions, row_products = np.repeat(regions, len(known)), np.repeat(products, len(known))
+        numeric = lags.lookup(row_regions, row_products, years, month_nos)
+        store(predict_rows(models, years, month_nos, row_regions, row_products, numeric), known)
+    if ahead.any():
+        s = lags.series_index(regions, products)
+        Y = lags.tail(s)
+        for m in range(lags.last_month + 1, int(month_no.max()) + 1):
+            numeric = window_features(Y)[:, -1]
+            numeric[s < 0] = np.nan  # series sin historia, como en lookup
+            year, month = np.full(n, m // 12), np.full(n, m % 12 + 1)
+            result = predict_rows(models, year, month, regions, products, numeric)
+            Y = np.concatenate([Y[:, 1:], np.clip(result["quantity"], 0, None)[:, None]], axis=1)
+            cols = np.flatnonzero(month_no == m)
+            if len(cols):
+                store(result, cols)
+    return {k: v.reshape((n * M,) + v.shape[2:]) for k, v in out.items()}
+
+
+def forecast_series(models, regions, products, periods: pd.DataFrame, ds=None) -> dict:
+    """
+    Pronóstico de las series (regions[i], products[i]) para cada periodo:
+    el grid (serie, mes) se expande de una vez, se predice en bloque y se
+    reparte a periodos con W. Devuelve arrays (series × periodos) de
+    quantity y profit y las claves de cada serie; con modelos de cuantiles
+    añade `quantiles` (alphas), arrays (series × periodos × cuantiles) y
+    `<target>_spread` para agregarlos: los cuantiles de un periodo o de
+    varias series salen de combine_quantiles con los meses independientes,
+    no de sumar cuantiles. Si el modelo usa features de demanda se toman
+    de `ds.lag_features` (predict_ahead).
+    """
+    months, W = month_weights(periods)
+    regions, products = np.asarray(regions, dtype=object), np.asarray(products, dtype=object)
+    n, M = len(regions), len(months)
+    # Mes como eje más rápido: fila = serie * M + mes
+    month_idx = np.tile(np.arange(M), n)
+    years, month_nos = months.year.values[month_idx], months.month.values[month_idx]
+    row_regions, row_products = np.repeat(regions, M), np.repeat(products, M)
+    if model_uses_lags(models):
+        if ds is None:
+            raise ValueError("El modelo usa features de demanda y no se pasó el dataset")
+        rows = predict_ahead(models, ds.lag_features, regions, products, months)
+    else:
+        rows = predict_rows(models, years, month_nos, row_regions, row_products)
+    out = {
+        "regions":  regions,
+        "products": products,
+        "quantity": rows["quantity"].reshape(n, M) @ W.T,
+        "profit":   rows["profit"].reshape(n, M) @ W.T,
+    }
+    if "quantity_quantiles" in rows:
+        out["quantiles"] = model_quantiles(models)
+        for target in ("quantity", "profit"):
+            deviation = rows[f"{target}_quantiles"].reshape(n, M, -1) - rows[target].reshape(n, M, 1)
+            out[f"{target}_spread"] = quantile_spread(deviation, W)
+            out[f"{target}_quantiles"] = combine_quantiles(out[target], out[f"{target}_spread"])
+    return out
+
+
+def forecast_grid(models, regions: list, products: list, periods: pd.DataFrame, ds=None) -> dict:
+    """forecast_series sobre todas las combinaciones región × producto."""
+    regions, products = np.asarray(regions, dtype=object), np.asarray(products, dtype=object)
+    return forecast_series(
+        models, np.repeat(regions, len(products)), np.tile(products, len(regions)), periods, ds
+    )
@@ -0,0 +1,181 @@
+# backend/hierarchy.py
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from features import order_line_rate
+from forecasting import combine_quantiles, forecast_series, model_uses_lags
+from lru import LRUCache
+
+# Niveles de agregación: columnas que identifican cada nodo.
+# El nivel inferior (region, product) es el que pronostican los modelos.
+LEVELS = {
+    "total":               [],
+    "region":              ["region"],
+    "category":            ["Category"],
+    "sub_category":        ["Sub-Category"],
+    "product":             ["product"],
+    "region_category":     ["region", "Category"],
+    "region_sub_category": ["region", "Sub-Category"],
+    "region_product":      ["region", "product"],
+}
+
+class Hierarchy:
+    """
+    Series inferiores (region, product) observadas en el histórico con su
+    Sub-Category y Category, y matrices de suma dispersas por nivel.
+    """
+
+    def __init__(self, bottom: pd.DataFrame):
+        self.bottom = bottom.reset_index(drop=True)
+        self._summing = {}
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "Hierarchy":
+        cols = [c for c in ("Category", "Sub-Category") if c in df.columns]
+        df = df[["region", "product"] + cols].astype(object)
+        bottom = (
+            df.dropna(subset=["region", "product"])
+              .groupby(["region", "product"], sort=True)[cols].first()
+              .reset_index()
+        )
+        for c in ("Category", "Sub-Category"):
+            if c not in bottom.columns:
+                bottom[c] = ""
+        return cls(bottom.fillna(""))
+
+    def summing_matrix(self, level: str) -> tuple:
+        """
+        (claves de los nodos, S dispersa nodos × series inferiores). Las
+        claves son un DataFrame con las columnas del nivel; el total es un
+        único nodo {"level": "total"}.
+        """
+        if level not in self._summing:
+            cols = LEVELS[level]
+            n = len(self.bottom)
+            if cols:
+                codes, keys = pd.MultiIndex.from_frame(self.bottom[cols]).factorize()
+                # factorize pierde los nombres de los niveles
+                keys = keys.to_frame(index=False, name=cols)
+            else:
+                codes, keys = np.zeros(n, dtype=np.int64), pd.DataFrame({"level": ["total"]})
+            S = sparse.csr_matrix((np.ones(n), (codes, np.arange(n))), shape=(len(keys), n))
+            self._summing[level] = (keys, S)
+        return self._summing[level]
+
+    def rollup(self, bottom_values: np.ndarray, level: str) -> tuple:
+        """Suma vectorizada (S @ valores) de series inferiores × periodos al nivel."""
+        keys, S = self.summing_matrix(level)
+        return keys, np.asarray(S @ bottom_values)
+
+
+# -------------------------------------------------------
+# Cachés: jerarquía por conjunto de series y pronósticos por versión de
+# modelo, al día con las revisiones de los agregados del dataset
+# -------------------------------------------------------
+_hierarchies = LRUCache(16)
+_forecasts = LRUCache(16)
+
+# Arrays del pronóstico con una fila por serie inferior
+SERIES_ARRAYS = ("quantity", "profit", "quantity_quantiles", "profit_quantiles",
+                 "quantity_spread", "profit_spread")
+
+
+def _series_key(ds) -> tuple:
+    """Clave del conjunto de series del dataset: sólo cambia si aparece una serie nueva."""
+    if ds.aggregates is None:
+        return (ds.version,)
+    return (ds.lineage, ds.aggregates.series_added)
+
+
+def get_hierarchy(ds) -> Hierarchy:
+    """Jerarquía del dataset, reconstruida sólo cuando aparecen series nuevas."""
+    return _hierarchies.get_or_build(_series_key(ds), lambda: Hierarchy.from_frame(ds.df))
+
+
+def _bottom_forecast(models, ds, hierarchy: Hierarchy, periods: pd.DataFrame, state: dict | None) -> dict:
+    """
+    Pronóstico de las series inferiores al día con la revisión actual de
+    los agregados, a partir del de una revisión anterior (`state`). Sin
+    features de demanda no depende de los pedidos y se reutiliza; con
+    ellas sólo se repronostican las series cambiadas desde entonces, salvo
+    que el histórico haya ganado meses (cambian las features de todas).
+    """
+    b = hierarchy.bottom
+    revision = ds.aggregates.revision if ds.aggregates is not None else 0
+    last_month = ds.lag_features.last_month if model_uses_lags(models) else None
+    if state is None or state["last_month"] != last_month:
+        bottom = forecast_series(models, b["region"].values, b["product"].values, periods, ds)
+        return {"revision": revision, "last_month": last_month, "bottom": bottom, "levels": {}}
+    if last_month is None:
+        return {**state, "revision": revision}
+    changed = list(ds.aggregates.changed_since(state["revision"]))
+    rows = pd.MultiIndex.from_arrays([b["region"].astype(str), b["product"].astype(str)]).get_indexer(
+        pd.MultiIndex.from_tuples(changed, names=["region", "product"])
+    ) if changed else np.array([], dtype=np.int64)
+    rows = rows[rows >= 0]
+    if not len(rows):
+        return {**state, "revision": revision}
+    fresh = forecast_series(models, b["region"].values[rows], b["product"].values[rows], periods, ds)
+    bottom = dict(state["bottom"])
+    for name in SERIES_ARRAYS:
+        if name in bottom:
+            bottom[name] = bottom[name].copy()
+            bottom[name][rows] = fresh[name]
+    return {"revision": revision, "last_month": last_month, "bottom": bottom, "levels": {}}
+
+
+def _line_demand(ds, hierarchy: Hierarchy, bottom: dict) -> dict:
+    """
+    Pronóstico de un modelo por línea de pedido en unidades de demanda:
+    × order_line_rate de cada serie, como el plan de inventario. Sus
+    cuantiles son de una línea, no de la demanda del periodo: no se agregan.
+    """
+    b = hierarchy.bottom
+    rate = order_line_rate(ds.df, b["region"], b["product"])[:, None]
+    return {"quantity": bottom["quantity"] * rate, "profit": bottom["profit"] * rate}
+
+
+def hierarchical_forecast(models, ds, periods: pd.DataFrame, levels: list) -> dict:
+    """
+    Pronóstico de las series inferiores (cacheado por versión de modelo,
+    conjunto de series y periodos, y actualizado sólo en las series que
+    cambian con cada ingesta) agregado a cada nivel pedido. Al sumar desde
+    el nivel inferior (bottom-up: sólo hay modelos de ese nivel, no
+    pronósticos de los agregados que reconciliar) el resultado es coherente
+    entre niveles. Con un modelo por línea de pedido las series se pasan a
+    demanda con order_line_rate y no llevan cuantiles. Cada nivel
+    es un dict con keys, quantity y profit (nodos × periodos) y, si el
+    modelo tiene cuantiles, quantity_quantiles / profit_quantiles: se suman
+    los quantile_spread de las series, no sus cuantiles.
+    """
+    hierarchy = get_hierarchy(ds)
+    period_key = tuple(map(tuple, periods[["label", "start", "end"]].astype(str).values))
+    holder = _forecasts.get_or_build((models.version, _series_key(ds), period_key), dict)
+    entry = holder.get("state")
+    if entry is None or entry["revision"] != (ds.aggregates.revision if ds.aggregates is not None else 0):
+        entry = _bottom_forecast(models, ds, hierarchy, periods, entry)
+        if not models.monthly:
+            # Las líneas por mes cambian con cada ingesta: se reescala y se vuelve a agregar
+            entry = {**entry, "demand": _line_demand(ds, hierarchy, entry["bottom"]), "levels": {}}
+        # Se sustituye el estado entero: un lector concurrente nunca ve uno a medias
+        holder["state"] = entry
+    bottom = entry.get("demand", entry["bottom"])
+    out = {}
+    for level in levels:
+        if level not in entry["levels"]:
+            keys, _ = hierarchy.summing_matrix(level)
+            rolled = {"keys": keys, "quantiles": bottom.get("quantiles")}
+            for name in ("quantity", "profit", "quantity_spread", "profit_spread"):
+                if name in bottom:
+                    values = bottom[name]
+                    # (series × periodos × cuantiles × 2) se suma como matriz 2D
+                    _, summed = hierarchy.rollup(values.reshape(len(values), -1), level)
+                    rolled[name] = summed.reshape((len(keys),) + values.shape[1:])
+            for target in ("quantity", "profit"):
+                if f"{target}_spread" in rolled:
+                    rolled[f"{target}_quantiles"] = combine_quantiles(rolled[target], rolled[f"{target}_spread"])
+            entry["levels"][level] = rolled
+        out[level] = entry["levels"][level]
+    return out
@@ -0,0 +1,93 @@
+# backend/indexes.py
+
+import numpy as np
+import pandas as pd
+
+from features import month_numbers
+
+
+def _month_labels(keys: np.ndarray) -> np.ndarray:
+    return np.array([f"{k // 12:04d}-{k % 12 + 1:02d}" for k in keys])
+
+
+class RowIndex:
+    """
+    Índices secundarios de un DataFrame de pedidos:
+      - orden de filas por mes con el offset donde empieza cada mes, así un
+        filtro de mes (o un rango de meses) es un slice contiguo;
+      - índices invertidos código → posiciones (ascendentes) de las columnas
+        categóricas indicadas, como arrays planos tipo CSR.
+    Las combinaciones se resuelven intersecando posiciones, empezando por
+    la lista más corta: el coste depende de las filas que coinciden.
+    """
+
+    def __init__(self, df: pd.DataFrame, cols: list):
+        # La ingesta garantiza fecha en todas las filas (schema.REQUIRED_COLUMNS)
+        month = month_numbers(df).to_numpy(dtype=np.int64)
+        self.by_month = np.argsort(month, kind="stable")
+        self.month_keys, starts = np.unique(month[self.by_month], return_index=True)
+        self.months = _month_labels(self.month_keys)
+        # months[i] ocupa by_month[month_offsets[i]:month_offsets[i + 1]]
+        self.month_offsets = np.append(starts, len(month))
+        self.postings = {}
+        for col in cols:
+            codes = df[col].cat.codes.to_numpy()
+            order = np.argsort(codes, kind="stable")
+            offsets = np.searchsorted(codes[order], np.arange(len(df[col].cat.categories) + 1))
+            self.postings[col] = (order, offsets)
+
+    def append(self, delta: pd.DataFrame, start: int):
+        """
+        Añade las filas de `delta` (posiciones start, start + 1, ...) sin
+        reordenar las existentes: como son posteriores a todas, cada una va
+        al final del tramo de su mes / código y basta un merge lineal. Los
+        códigos existentes no cambian; las categorías nuevas van al final.
+        """
+        month = month_numbers(delta).to_numpy(dtype=np.int64)
+        order = np.argsort(month, kind="stable")
+        month = month[order]
+        # Fin del tramo de cada mes (o hueco donde iría un mes nuevo)
+        at = self.month_offsets[np.searchsorted(self.month_keys, month, side="right")]
+        self.by_month = np.insert(self.by_month, at, start + order)
+        keys = np.union1d(self.month_keys, month)
+        counts = np.zeros(len(keys), dtype=np.int64)
+        counts[np.searchsorted(keys, self.month_keys)] = np.diff(self.month_offsets)
+        np.add.at(counts, np.searchsorted(keys, month), 1)
+        self.month_keys, self.months = keys, _month_labels(keys)
+        self.month_offsets = np.append(0, np.cumsum(counts))
+        for col, (rows, offsets) in self.postings.items():
+            codes = delta[col].cat.codes.to_numpy()
+            n_codes = len(delta[col].cat.categories)
+            new = np.argsort(codes, kind="stable")
+            codes = codes[new]
+            # offsets[k] = filas con código < k; las categorías nuevas no tienen filas previas
+            offsets = np.append(offsets, np.full(n_codes + 1 - len(offsets), len(rows)))
+            rows = np.insert(rows, offsets[codes + 1], start + new)
+            self.postings[col] = (rows, offsets + np.searchsorted(codes, np.arange(n_codes + 1)))
+
+    def month_rows(self, first: str, last: str | None = None) -> np.ndarray:
+        """Posiciones de los meses [first, last] ("YYYY-MM"), como slice del orden por mes."""
+        lo = np.searchsorted(self.months, first, side="left")
+        hi = np.searchsorted(self.months, last or first, side="right")
+        return self.by_month[self.month_offsets[lo]:self.month_offsets[hi]] if hi > lo else self.by_month[:0]
+
+    def code_rows(self, col: str, code: int) -> np.ndarray:
+        order, offsets = self.postings[col]
+        if code < 0:
+            return order[:0]
+        return order[offsets[code]:offsets[code + 1]]
+
+    def select(self, month: str | None = None, codes: dict | None = None) -> np.ndarray:
+        """Posiciones ascendentes de las filas del mes `month` con col == código."""
+        lists = [self.code_rows(col, code) for col, code in (codes or {}).items()]
+        if month is not None:
+            lists.append(np.sort(self.month_rows(month)))
+        if not lists:
+            return np.arange(len(self.by_month))
+        lists.sort(key=len)
+        rows = lists[0]
+        for other in lists[1:]:
+            if not len(rows):
+                break
+            rows = np.intersect1d(rows, other, assume_unique=True)
+        return rows
@@ -0,0 +1,133 @@
+# backend/inventory.py
+
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from backtesting import load_backtest
+from fast_inference import quantile_label
+from forecasting import build_periods, forecast_series
+from hierarchy import get_hierarchy
+from lru import LRUCache
+from features import order_line_rate
+
+DAYS_PER_MONTH = 365.25 / 12
+
+_errors = LRUCache(8)
+
+
+def _series_index(bottom: pd.DataFrame, regions, products) -> np.ndarray:
+    """Fila de `bottom` de cada (región, producto), o -1."""
+    return pd.MultiIndex.from_arrays([bottom["region"].astype(str), bottom["product"].astype(str)]).get_indexer(
+        pd.MultiIndex.from_arrays([np.asarray(regions).astype(str), np.asarray(products).astype(str)])
+    )
+
+
+def forecast_error_std(models, bottom: pd.DataFrame) -> np.ndarray:
+    """
+    Desviación típica del error mensual fuera de muestra por serie: RMSE
+    de la demanda mensual en los meses de test del backtest de origen
+    móvil guardado con la versión (tabla `series` de backtesting.py). Las
+    series sin celdas de test usan el RMSE conjunto. Lanza ValueError si
+    la versión no tiene backtest.
+    """
+    def build():
+        stored = load_backtest(models.path)
+        if stored is None or "series" not in stored:
+            raise ValueError("El plan de inventario necesita el error fuera de muestra del modelo: "
+                             "entrena con backtest=true.")
+        table = stored["series"]
+        table = table[table["target"] == "quantity"]
+        pooled = float(np.sqrt((table["n"] * table["rmse"] ** 2).sum() / table["n"].sum()))
+        return table, pooled
+
+    table, pooled = _errors.get_or_build(models.version, build)
+    idx = _series_index(table, bottom["region"], bottom["product"])
+    return np.where(idx >= 0, table["rmse"].to_numpy()[idx], pooled)
+
+
+def unit_costs(ds, products: np.ndarray) -> np.ndarray:
+    """Coste unitario por producto: (Sales − Profit) / Quantity del histórico."""
+    df = ds.df
+    if "Sales" not in df.columns:
+        return np.full(len(products), np.nan)
+    sums = (
+        pd.DataFrame({"product": df["product"], "cost": df["Sales"] - df["profit"], "qty": df["quantity"]})
+          .groupby("product", observed=True)[["cost", "qty"]].sum()
+    )
+    sums.index = sums.index.astype(object)
+    cost = (sums["cost"] / sums["qty"].where(sums["qty"] > 0)).clip(lower=0)
+    return cost.reindex(products).to_numpy()
+
+
+def reorder_policy(mean_monthly: np.ndarray, sigma_monthly: np.ndarray, holding: np.ndarray,
+                   service_level: float, lead_time_days: float, ordering_cost: float) -> dict:
+    """
+    Punto de pedido, stock de seguridad y EOQ para todo el catálogo en una
+    sola pasada NumPy:
+      SS  = z · σ_mensual · √(L / días_mes)
+      ROP = demanda diaria · L + SS
+      EOQ = √(2 · D_anual · S / H)
+    """
+    z = NormalDist().inv_cdf(service_level)
+    mean_monthly = np.clip(mean_monthly, 0, None)
+    lead_demand = mean_monthly / DAYS_PER_MONTH * lead_time_days
+    safety = z * sigma_monthly * np.sqrt(lead_time_days / DAYS_PER_MONTH)
+    annual = mean_monthly * 12
+    with np.errstate(divide="ignore", invalid="ignore"):
+        eoq = np.where((holding > 0) & (annual > 0), np.sqrt(2 * annual * ordering_cost / holding), 0.0)
+    eoq[np.isnan(holding)] = np.nan
+    return {
+        "lead_time_demand": lead_demand,
+        "safety_stock":     safety,
+        "reorder_point":    lead_demand + safety,
+        "annual_demand":    annual,
+        "eoq":              eoq,
+    }
+
+
+def inventory_plan(models, ds, service_level: float = 0.95, lead_time_days: float = 14,
+                   ordering_cost: float = 50.0, holding_rate: float = 0.25,
+                   holding_cost: float | None = None, horizon_months: int = 12,
+                   start=None) -> pd.DataFrame:
+    """
+    Plan de reposición por (region, product): demanda media mensual de los
+    próximos `horizon_months` (desde el mes siguiente al último pedido, o
+    `start`), error fuera de muestra del pronóstico y políticas de
+    reposición. Con un modelo mensual (train_xgb monthly=True) el
+    pronóstico ya es la demanda del mes; el de línea de pedido predice la
+    cantidad de una línea y se multiplica por features.order_line_rate.
+    `holding_cost` es coste por unidad y año; si no se da se usa
+    `holding_rate` × coste unitario. Si el modelo mensual tiene cuantiles
+    se añade la demanda mensual media de cada uno (forecast_monthly_p10, ...).
+    """
+    bottom = get_hierarchy(ds).bottom
+    if start is None:
+        last = ds.df["date"].max()
+        start = (pd.Period(last, "M") + 1).start_time
+    start = pd.Timestamp(start)
+    end = (pd.Period(start, "M") + horizon_months - 1).end_time.normalize()
+    periods = build_periods(start, end, "month")
+    fc = forecast_series(models, bottom["region"].values, bottom["product"].values, periods, ds)
+
+    demand = fc["quantity"]
+    if not models.monthly:
+        demand = demand * order_line_rate(ds.df, bottom["region"], bottom["product"])[:, None]
+    mean_monthly = demand.mean(axis=1)
+    sigma = forecast_error_std(models, bottom)
+    cost = unit_costs(ds, bottom["product"].values)
+    holding = np.full(len(bottom), float(holding_cost)) if holding_cost is not None else holding_rate * cost
+    policy = reorder_policy(mean_monthly, sigma, holding, service_level, lead_time_days, ordering_cost)
+
+    plan = bottom[["region", "product", "Category", "Sub-Category"]].copy()
+    plan["forecast_monthly"] = mean_monthly
+    quantiles = fc.get("quantiles") if models.monthly else None
+    for k, alpha in enumerate(quantiles or []):
+        plan[f"forecast_monthly_{quantile_label(alpha)}"] = fc["quantity_quantiles"][:, :, k].mean(axis=1)
+    plan["sigma_monthly"] = sigma
+    plan["unit_cost"] = cost
+    plan["holding_cost"] = holding
+    for name, values in policy.items():
+        plan[name] = values
+    return plan
@@ -0,0 +1,71 @@
+# backend/lru.py
+
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Caché LRU thread-safe; `build` se ejecuta fuera del lock."""
+
+    def __init__(self, maxsize: int = 16):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key, build):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                return self._data[key]
+        value = build()
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class MemoryBudget:
+    """
+    Presupuesto de memoria (bytes estimados) compartido por objetos de
+    distinto tipo. Cada uso se registra con `touch(clave, tamaño, release)`;
+    si el total supera `max_bytes` se liberan los menos usados
+    recientemente llamando a su `release` (fuera del lock). El último
+    objeto tocado nunca se expulsa.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # clave -> (tamaño, release)
+        self._used = 0
+        self._lock = threading.Lock()
+
+    @property
+    def used(self) -> int:
+        return self._used
+
+    def touch(self, key, size: int, release):
+        evicted = []
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._used -= old[0]
+            self._entries[key] = (size, release)
+            self._used += size
+            while self._used > self.max_bytes and len(self._entries) > 1:
+                _, (old_size, old_release) = self._entries.popitem(last=False)
+                self._used -= old_size
+                evicted.append(old_release)
+        for old_release in evicted:
+            old_release()
+
+    def discard(self, key):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._used -= old[0]
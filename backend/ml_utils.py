@@ -1,37 +1,114 @@
 # backend/ml_utils.py
 
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+import numpy as np
 import pandas as pd
-from rapidfuzz import process, fuzz
-from nltk.corpus import wordnet as wn
-from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import FunctionTransformer, OneHotEncoder, StandardScaler
-from sklearn.compose import ColumnTransformer
-import xgboost as xgb
+
+from features import FEATURE_COLS
+
+# RapidFuzz / SciPy / NLTK y scikit-learn / XGBoost se importan al primer
+# uso: los workers que sólo sirven el dashboard o predicciones compiladas
+# no los cargan.
+if TYPE_CHECKING:
+    from sklearn.compose import ColumnTransformer
+    from sklearn.pipeline import Pipeline
 
 STANDARD_COLUMNS = ["date", "region", "product", "quantity", "profit"]
 
+# Sinónimos fijos por columna estándar; se suman a los lemas de WordNet.
+# Añadir una columna estándar es añadir una entrada aquí.
+COLUMN_SYNONYMS = {
+    "date":     ["order date", "fecha", "fecha pedido", "fecha de pedido"],
+    "region":   ["zone", "territory", "zona", "región"],
+    "product":  ["product name", "item", "article", "producto", "artículo"],
+    "quantity": ["qty", "units", "cantidad", "unidades"],
+    "profit":   ["margin", "earnings", "ganancia", "beneficio"],
+    "sales":    ["revenue", "turnover", "ventas", "importe"],
+    "discount": ["rebate", "descuento"],
+    "customer": ["customer name", "client", "cliente", "nombre cliente"],
+}
+
+# Un sinónimo empata por debajo del nombre propio; un nombre idéntico gana a todo
+SYNONYM_PENALTY = 1.0
+EXACT_BONUS = 1.0
+
+
+def _wordnet():
+    """WordNet de NLTK; descarga WordNet y Open Multilingual Wordnet si faltan."""
+    import nltk
+    from nltk.corpus import wordnet
+    for corpus in ("wordnet", "omw-1.4"):
+        try:
+            nltk.data.find(f"corpora/{corpus}")
+        except LookupError:
+            nltk.download(corpus)
+    return wordnet
+
+
+@lru_cache(maxsize=None)
+def _alias_index(standard: tuple) -> tuple:
+    """
+    (alias, columna estándar de cada alias, es sinónimo), construido una
+    vez por lista estándar: nombre propio, sinónimos fijos y lemas WordNet.
+    """
+    wn = _wordnet()
+    aliases, owners, synonym = [], [], []
+    for k, std in enumerate(standard):
+        names = {std: False}
+        for name in COLUMN_SYNONYMS.get(std, []):
+            names.setdefault(name, True)
+        for s in wn.synsets(std):
+            for lemma in s.lemma_names():
+                names.setdefault(lemma.lower().replace("_", " "), True)
+        for name, is_synonym in names.items():
+            aliases.append(name)
+            owners.append(k)
+            synonym.append(is_synonym)
+    return aliases, np.array(owners), np.array(synonym)
+
+
+@lru_cache(maxsize=256)
+def match_columns(columns: tuple, standard: tuple = tuple(STANDARD_COLUMNS), threshold: int = 80) -> dict:
+    """
+    Asignación columna → nombre estándar. Todas las parejas (alias ×
+    columna) se puntúan en una llamada vectorizada (process.cdist, con
+    hilos) y la asignación uno a uno que maximiza la puntuación total se
+    resuelve con linear_sum_assignment: dos estándar nunca se quedan la
+    misma columna. Se descartan las parejas por debajo de `threshold`.
+    Cacheado por cabecera: los uploads con las mismas columnas no repuntúan.
+    """
+    if not columns or not standard:
+        return {}
+    from rapidfuzz import fuzz, process, utils
+    from scipy.optimize import linear_sum_assignment
+    names = [str(c) for c in columns]
+    aliases, owners, synonym = _alias_index(standard)
+    scores = process.cdist(aliases, names, scorer=fuzz.token_sort_ratio,
+                           processor=utils.default_process, dtype=np.float32, workers=-1)
+    scores[synonym] -= SYNONYM_PENALTY
+    # Mejor alias de cada estándar (los alias van agrupados por estándar)
+    starts = np.flatnonzero(np.r_[True, owners[1:] != owners[:-1]])
+    best = np.maximum.reduceat(scores, starts, axis=0)
+    best += EXACT_BONUS * (np.array(standard)[:, None] == np.array(names)[None, :])
+    rows, cols = linear_sum_assignment(best, maximize=True)
+    return {
+        columns[c]: standard[r]
+        for r, c in zip(rows, cols)
+        if best[r, c] >= threshold and columns[c] != standard[r]
+    }
+
+
 def normalize_columns(df: pd.DataFrame, threshold: int = 80) -> pd.DataFrame:
     """
-    Renombra columnas a STANDARD_COLUMNS usando:
-      1) fuzzy matching (RapidFuzz)
-      2) sinonimia semántica (WordNet)
+    Renombra columnas a STANDARD_COLUMNS por similitud con su nombre, sus
+    sinónimos fijos y los de WordNet (match_columns).
     """
-    orig = list(df.columns)
-    mapping = {}
-    for std in STANDARD_COLUMNS:
-        # 1) fuzzy
-        match, score, _ = process.extractOne(std, orig, scorer=fuzz.token_sort_ratio)
-        if score >= threshold:
-            mapping[match] = std
-            continue
-        # 2) sinonimia
-        for col in orig:
-            syns = wn.synsets(col, lang='eng') or wn.synsets(col)
-            lemmas = {l.lower().replace('_',' ') for s in syns for l in s.lemma_names()}
-            if std in lemmas:
-                mapping[col] = std
-                break
-    return df.rename(columns=mapping)
+    mapping = match_columns(tuple(df.columns), tuple(STANDARD_COLUMNS), threshold)
+    # No se pisa una columna que ya tenga el nombre estándar y no se renombre
+    taken = set(df.columns) - set(mapping)
+    return df.rename(columns={k: v for k, v in mapping.items() if v not in taken})
 
 def extract_date_features(df: pd.DataFrame) -> pd.DataFrame:
     """Extrae year, month y year_month de df['date']."""
@@ -42,23 +119,36 @@ def extract_date_features(df: pd.DataFrame) -> pd.DataFrame:
         "year_month": ds.dt.year.astype(str) + "_" + ds.dt.month.astype(str),
     })
 
-def get_preprocessor() -> ColumnTransformer:
-    """ColumnTransformer para date, region, product con OHE."""
+def get_preprocessor(lag_features: bool = False) -> "ColumnTransformer":
+    """ColumnTransformer para date, region, product con OHE (+ features de demanda)."""
+    from sklearn.compose import ColumnTransformer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import FunctionTransformer, OneHotEncoder
     date_pipe = Pipeline([
         ("extract", FunctionTransformer(extract_date_features, validate=False)),
         ("ohe",     OneHotEncoder(handle_unknown="ignore", sparse_output=False))
     ])
     cat_pipe  = Pipeline([("ohe", OneHotEncoder(handle_unknown="ignore", sparse_output=False))])
-    return ColumnTransformer([
+    transformers = [
         ("date",    date_pipe, ["date"]),
         ("region",  cat_pipe,  ["region"]),
         ("product", cat_pipe,  ["product"]),
-    ], remainder="drop")
+    ]
+    if lag_features:
+        # Lags y ventanas de features.py; los NaN llegan a XGBoost como missing
+        transformers.append(("lags", "passthrough", FEATURE_COLS))
+    return ColumnTransformer(transformers, remainder="drop")
+
+def uses_lag_features(pipe: "Pipeline") -> bool:
+    return "lags" in pipe.named_steps["preproc"].named_transformers_
 
-def build_xgb_pipeline(model_params: dict) -> Pipeline:
+def build_xgb_pipeline(model_params: dict, lag_features: bool = False) -> "Pipeline":
     """Pipeline completo: preproc → scale → XGBRegressor"""
+    import xgboost as xgb
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
     return Pipeline([
-        ("preproc", get_preprocessor()),
+        ("preproc", get_preprocessor(lag_features)),
         ("scale",   StandardScaler(with_mean=False)),
         ("model",   xgb.XGBRegressor(**model_params))
     ])
\ No newline at end of file
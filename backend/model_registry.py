@@ -0,0 +1,222 @@
+# backend/model_registry.py
+
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import joblib
+
+from artifacts import load_compact
+
+PIPE_FILES = ("pipeline_quantity.pkl", "pipeline_profit.pkl")
+QUANTILE_FILES = ("pipeline_quantity_quantiles.pkl", "pipeline_profit_quantiles.pkl")
+STATE_FILE = "train_state.pkl"
+
+# Layout:
+#   <root>/versions/<id>/   artefactos de una versión (inmutable una vez publicada,
+#                           con la marca PUBLISHED_MARK; sin ella está en preparación)
+#   <root>/CURRENT          id de la versión activa; se sustituye con os.replace
+#   <root>/jobs/<id>.json   estado del entrenamiento en segundo plano de la versión <id>
+# Sin CURRENT se sirve la versión "legacy": los .pkl sueltos en <root>.
+LEGACY = "legacy"
+PUBLISHED_MARK = ".published"
+VERSION_RE = re.compile(r"[0-9]{8}T[0-9]{6}-[0-9a-f]{6}")
+
+
+class ModelSet:
+    """Modelos de una versión. El artefacto compacto se abre al crearla; los
+    pipelines sklearn sólo se deserializan si se piden."""
+
+    def __init__(self, version: str, path: Path):
+        self.version = version
+        self.path = path
+        manifest = path / "compact" / "manifest.json"
+        self.fast = load_compact(path / "compact") if manifest.exists() else None
+        self._pipes = None
+        self._quantile_pipes = None
+        # Opciones de entrenamiento (train_xgb); las versiones legacy no tienen estado
+        state = joblib.load(path / STATE_FILE) if (path / STATE_FILE).exists() else {}
+        self.monthly = bool(state.get("monthly"))
+        # Tamaño estimado en memoria: ficheros abiertos (mapeados o deserializados)
+        files = [f for f in (path / "compact").rglob("*") if f.is_file()] if self.fast is not None else []
+        self.nbytes = sum(f.stat().st_size for f in files)
+
+    def _load_files(self, names) -> tuple:
+        self.nbytes += sum((self.path / f).stat().st_size for f in names)
+        return tuple(joblib.load(self.path / f) for f in names)
+
+    def pipelines(self) -> tuple:
+        if self._pipes is None:
+            if not all((self.path / f).exists() for f in PIPE_FILES):
+                return None, None
+            self._pipes = self._load_files(PIPE_FILES)
+        return self._pipes
+
+    def quantile_pipelines(self) -> tuple | None:
+        """Pipelines multi-cuantil (quantity, profit), si la versión los tiene."""
+        if self._quantile_pipes is None:
+            if not all((self.path / f).exists() for f in QUANTILE_FILES):
+                return None
+            self._quantile_pipes = self._load_files(QUANTILE_FILES)
+        return self._quantile_pipes
+
+
+class ModelRegistry:
+    """
+    Registro de versiones de modelos con puntero "current" atómico.
+    Cada worker comprueba el puntero como mucho cada `poll_interval`
+    segundos (stat del fichero) y recarga de forma perezosa: las peticiones
+    en curso conservan su ModelSet y las nuevas ven el siguiente tras un
+    simple cambio de referencia, sin locks en la ruta de lectura. Al
+    publicar se conservan las `keep` últimas versiones y las sustituidas
+    hace menos de `grace` segundos (otros workers aún pueden servirlas).
+    """
+
+    def __init__(self, root, poll_interval: float = 1.0, keep: int = 5, grace: float = 300.0):
+        self.root = Path(root)
+        self.versions_dir = self.root / "versions"
+        self.pointer = self.root / "CURRENT"
+        self.poll_interval = poll_interval
+        self.keep = keep
+        self.grace = max(grace, 2 * poll_interval)
+        self._active = None
+        self._stamp = None
+        self._checked = float("-inf")
+        self._reload_lock = threading.Lock()
+
+    # ---------------------------------------------------
+    # Lectura (workers)
+    # ---------------------------------------------------
+    def _pointer_stamp(self):
+        try:
+            st = self.pointer.stat()
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def current_version(self) -> str | None:
+        if self.pointer.exists():
+            return self.pointer.read_text().strip()
+        if all((self.root / f).exists() for f in PIPE_FILES):
+            return LEGACY
+        return None
+
+    def path_of(self, version: str) -> Path:
+        return self.root if version == LEGACY else self.versions_dir / version
+
+    def current(self) -> ModelSet | None:
+        now = time.monotonic()
+        if now - self._checked < self.poll_interval:
+            return self._active
+        self._checked = now
+        stamp = self._pointer_stamp()
+        if stamp == self._stamp and self._active is not None:
+            return self._active
+        # Sólo un hilo recarga; el resto sigue con la versión anterior
+        # (salvo el primer arranque, en el que no hay nada que servir)
+        if not self._reload_lock.acquire(blocking=self._active is None):
+            return self._active
+        try:
+            version = self.current_version()
+            if version is None:
+                self._active = None
+            elif self._active is None or self._active.version != version:
+                self._active = ModelSet(version, self.path_of(version))
+            self._stamp = stamp
+        finally:
+            self._reload_lock.release()
+        return self._active
+
+    def refresh(self) -> ModelSet | None:
+        """Fuerza la comprobación del puntero (p. ej. tras publicar)."""
+        self._checked = float("-inf")
+        return self.current()
+
+    def unload(self):
+        """
+        Suelta la versión activa para liberar memoria; se vuelve a abrir en
+        el próximo `current`. Las peticiones en curso conservan su ModelSet.
+        """
+        with self._reload_lock:
+            self._active = None
+            self._stamp = None
+            self._checked = float("-inf")
+
+    # ---------------------------------------------------
+    # Escritura (entrenamiento)
+    # ---------------------------------------------------
+    def stage(self, copy_current: bool = False) -> tuple:
+        """
+        Crea el directorio de una versión nueva (no visible hasta `publish`).
+        Con `copy_current` parte de los artefactos de la versión activa,
+        como necesita el reentrenamiento incremental.
+        """
+        version = f"{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:6]}"
+        path = self.versions_dir / version
+        current = self.current_version()
+        if copy_current and current is not None:
+            src = self.path_of(current)
+            ignore = shutil.ignore_patterns("versions", "CURRENT", ".CURRENT*") if current == LEGACY else None
+            shutil.copytree(src, path, ignore=ignore)
+        else:
+            path.mkdir(parents=True)
+        return version, path
+
+    def discard(self, version: str):
+        shutil.rmtree(self.versions_dir / version, ignore_errors=True)
+
+    def publish(self, version: str):
+        """Apunta CURRENT a `version` de forma atómica y purga versiones viejas."""
+        (self.versions_dir / version / PUBLISHED_MARK).touch()
+        tmp = self.root / f".CURRENT.{os.getpid()}.{uuid.uuid4().hex[:6]}"
+        tmp.write_text(version)
+        os.replace(tmp, self.pointer)
+        self._prune(version)
+
+    # ---------------------------------------------------
+    # Entrenamientos en segundo plano
+    # ---------------------------------------------------
+    def write_job(self, version: str, status: dict):
+        """Guarda (de forma atómica) el estado del trabajo que entrena `version`."""
+        path = self.root / "jobs" / f"{version}.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.{uuid.uuid4().hex[:6]}")
+        tmp.write_text(json.dumps(status, default=str))
+        os.replace(tmp, path)
+
+    def job(self, version: str) -> dict | None:
+        """Estado del trabajo de `version` (lo ve cualquier worker), o None."""
+        if not VERSION_RE.fullmatch(version):
+            return None
+        try:
+            return json.loads((self.root / "jobs" / f"{version}.json").read_text())
+        except FileNotFoundError:
+            return None
+
+    def _prune(self, current: str):
+        """
+        Borra las versiones publicadas más antiguas (por orden de
+        publicación) salvo las `keep` últimas. No toca las que están en
+        preparación, en las que otro /train_xgb puede estar escribiendo, ni
+        las sustituidas hace menos de `grace` segundos: un worker que aún no
+        ha comprobado el puntero las sigue sirviendo y ModelSet abre sus
+        ficheros de forma perezosa.
+        """
+        published = []
+        for p in self.versions_dir.iterdir():
+            try:
+                published.append(((p / PUBLISHED_MARK).stat().st_mtime, p.name))
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+        published.sort()
+        now = time.time()
+        # Cada versión dejó de ser la activa al publicarse la siguiente
+        for (_, old), (replaced, _) in zip(published[:-self.keep], published[1:]):
+            if old != current and now - replaced > self.grace:
+                shutil.rmtree(self.versions_dir / old, ignore_errors=True)
@@ -0,0 +1,272 @@
+# backend/routes_dashboard.py
+
+import gzip
+import hashlib
+
+import pandas as pd
+from fastapi import APIRouter, BackgroundTasks, Depends, FastAPI, File, UploadFile, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, FileResponse, HTMLResponse, Response
+from fastapi.staticfiles import StaticFiles
+
+from api_common import (FRONTEND_DIR, METADATA_CACHE_CONTROL, cached_json, current_tenant,
+                        etag_matches, filter_value, month_key, require_dataset, tenants)
+from aggregates import MEASURES, OrderAggregates, order_measures, summarize_groups
+from dashboard import build_snapshot, current_snapshot, grouped_payload, snapshot_key, trend_payload
+from dataset_store import append_rows
+from scatter import KINDS, MAX_GRIDSIZE, MAX_POINTS, cached_scatter
+from schema import COLUMN_RENAMES, rejection_report
+from tenants import Tenant
+
+# Frontend, metadatos, KPIs / agrupaciones / tendencia e ingesta de CSV.
+# Sólo necesita el dataset en memoria: no importa modelos ni XGBoost.
+router = APIRouter()
+
+
+def register(app: FastAPI):
+    app.include_router(router)
+    # Montar frontend estático
+    app.mount("/static/css", StaticFiles(directory=FRONTEND_DIR / "css"), name="css")
+    app.mount("/static/js",  StaticFiles(directory=FRONTEND_DIR / "js"),  name="js")
+    app.mount("/static/img", StaticFiles(directory=FRONTEND_DIR / "static" / "img"), name="img")
+
+
+def _get_aggregates(tenant: Tenant) -> OrderAggregates:
+    ds = require_dataset(tenant)
+    if ds.aggregates is None:
+        raise HTTPException(500, ds.aggregates_error)
+    return ds.aggregates
+
+
+def _snapshot_response(request: Request, tenant: Tenant, key: str) -> Response | None:
+    """
+    Respuesta precalculada de `key` si el snapshot del dashboard está al
+    día: JSON ya comprimido, sin tocar el dataset. None si no está.
+    """
+    snap = current_snapshot(tenant.csv_path)
+    body = snap.body(key) if snap is not None else None
+    if body is None:
+        return None
+    etag = snap.etag(key)
+    headers = {"ETag": etag, "Cache-Control": METADATA_CACHE_CONTROL, "Vary": "Accept-Encoding"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+    else:
+        body = gzip.decompress(body)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+@router.get("/")
+def serve_index():
+    idx = FRONTEND_DIR / "src" / "index.html"
+    if not idx.exists():
+        raise HTTPException(404, "index.html no encontrado")
+    # Con snapshot al día, el estado inicial del dashboard va incrustado en el HTML
+    snap = current_snapshot(tenants.default.csv_path)
+    if snap is None:
+        return FileResponse(str(idx))
+    html = idx.read_text(encoding="utf-8")
+    return HTMLResponse(html.replace("</head>", snap.boot + "\n</head>", 1))
+
+
+# -------------------------------------------------------
+# ENDPOINT: /upload_csv
+# -------------------------------------------------------
+@router.post("/upload_csv")
+def upload_training_csv(background: BackgroundTasks, file: UploadFile = File(...),
+                        tenant: Tenant = Depends(current_tenant)):
+    path = tenant.csv_path
+    try:
+        data = file.file.read()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        # Tipado, metadatos y agregados se construyen una sola vez, en la ingesta
+        ds = tenant.dataset()
+    except ValueError as e:
+        raise HTTPException(422, str(e))
+    except Exception as e:
+        raise HTTPException(500, str(e))
+    background.add_task(build_snapshot, path)
+    return {
+        "detail":   f"CSV guardado como {path.name}",
+        "tenant":   tenant.id,
+        "rows":     len(ds.df),
+        "rejected": rejection_report(ds.rejected),
+    }
+
+
+# -------------------------------------------------------
+# ENDPOINT: /append_orders  (ingesta incremental)
+# -------------------------------------------------------
+@router.post("/append_orders")
+def append_orders(background: BackgroundTasks, file: UploadFile = File(...),
+                  tenant: Tenant = Depends(current_tenant)):
+    path = tenant.csv_path
+    if not path.exists():
+        raise HTTPException(400, "No hay CSV base. Usa /upload_csv primero.")
+    try:
+        ds, changed, rejected = append_rows(path, file.file.read())
+    except ValueError as e:
+        raise HTTPException(422, str(e))
+    background.add_task(build_snapshot, path)
+    return {
+        "detail":         f"Pedidos añadidos a {path.name}",
+        "version":        ds.version,
+        "rows":           len(ds.df),
+        "changed_series": sorted([str(r), str(p)] for r, p in changed),
+        "rejected":       rejection_report(rejected),
+    }
+
+
+# -------------------------------------------------------
+# ENDPOINTS: metadata para dropdowns
+# -------------------------------------------------------
+def _metadata_values(request: Request, tenant: Tenant, col: str) -> Response:
+    ds = require_dataset(tenant)
+    if col not in ds.categories:
+        raise HTTPException(500, f"No se encontró la columna '{col}'")
+    return cached_json(request, ds.categories[col], ds.etag(col))
+
+
+@router.get("/metadata/regions")
+def metadata_regions(request: Request, tenant: Tenant = Depends(current_tenant)):
+    return _metadata_values(request, tenant, "region")
+
+@router.get("/metadata/vendors")
+def metadata_vendors(request: Request, tenant: Tenant = Depends(current_tenant)):
+    return _metadata_values(request, tenant, "Customer Name")
+
+@router.get("/metadata/products")
+def metadata_products(request: Request, tenant: Tenant = Depends(current_tenant)):
+    return _metadata_values(request, tenant, "product")
+
+@router.get("/metadata/fields")
+def metadata_fields(request: Request, tenant: Tenant = Depends(current_tenant)):
+    ds = require_dataset(tenant)
+    return cached_json(request, ds.fields, ds.etag("fields"))
+
+@router.get("/metadata/search")
+def metadata_search(
+    prefix: str = Query(..., description="Prefijo a autocompletar"),
+    field:  str = Query("product"),
+    limit:  int = Query(20, ge=1, le=200),
+    tenant: Tenant = Depends(current_tenant)
+):
+    ds = require_dataset(tenant)
+    if field not in ds.categories:
+        raise HTTPException(400, f"'{field}' no es una columna categórica")
+    return JSONResponse(ds.search(field, prefix, limit))
+
+
+
+# -------------------------------------------------------
+# ENDPOINT: /kpis
+# -------------------------------------------------------
+@router.get("/kpis")
+def get_kpis(
+    request: Request,
+    month:   str  = Query(None),
+    vendor:  str  = Query("Todos"),
+    product: str  = Query("Todos"),
+    tenant:  Tenant = Depends(current_tenant)
+):
+    month, vendor, product = month_key(month), filter_value(vendor), filter_value(product)
+    cached = _snapshot_response(request, tenant, snapshot_key("kpis", month=month, vendor=vendor, product=product))
+    if cached is not None:
+        return cached
+    agg = _get_aggregates(tenant)
+    return agg.kpis(month, vendor, product)
+
+
+# -------------------------------------------------------
+# ENDPOINT: /grouped
+# -------------------------------------------------------
+@router.get("/grouped")
+def get_grouped_data(
+    request: Request,
+    field:   str  = Query(..., description="Campo para agrupar"),
+    month:   str  = Query(None),
+    vendor:  str  = Query("Todos"),
+    product: str  = Query("Todos"),
+    tenant:  Tenant = Depends(current_tenant)
+):
+    field = COLUMN_RENAMES.get(field, field)
+    month, vendor, product = month_key(month), filter_value(vendor), filter_value(product)
+    key = snapshot_key("grouped", field=field, month=month, vendor=vendor, product=product)
+    cached = _snapshot_response(request, tenant, key)
+    if cached is not None:
+        return cached
+    agg = _get_aggregates(tenant)
+    if agg.supports_group(field):
+        grouped = agg.grouped(field, month, vendor, product)
+    else:
+        # Campo no preagregado: se agrupa sobre las líneas de pedido que
+        # devuelven los índices de mes / cliente / producto
+        ds = require_dataset(tenant)
+        if field not in ds.df.columns:
+            raise HTTPException(400, f"'{field}' no existe")
+        filters = {"Customer Name": vendor, "product": product}
+        df = ds.df.iloc[ds.select(month, {k: v for k, v in filters.items() if v})]
+        rows = order_measures(df)
+        rows["group"] = df[field].astype(object).fillna("")
+        grouped = summarize_groups(rows.groupby("group")[MEASURES].sum())
+    return grouped_payload(grouped)
+
+
+# -------------------------------------------------------
+# ENDPOINT: /scatter  (relación entre dos medidas, tamaño acotado)
+# -------------------------------------------------------
+@router.get("/scatter")
+def scatter(
+    request:    Request,
+    x:          str  = Query("Sales"),
+    y:          str  = Query("profit"),
+    kind:       str  = Query("hexbin", description="hexbin, hist o sample"),
+    month:      str  = Query(None),
+    vendor:     str  = Query("Todos"),
+    product:    str  = Query("Todos"),
+    gridsize:   int  = Query(30, ge=5, le=MAX_GRIDSIZE),
+    max_points: int  = Query(2000, ge=10, le=MAX_POINTS),
+    stratify:   str  = Query("Category", description="Columna de estratos de la muestra"),
+    tenant:     Tenant = Depends(current_tenant)
+):
+    """
+    Celdas hexbin / rejilla con conteos o muestra estratificada de como
+    mucho `max_points` puntos: el tamaño de la respuesta no depende del
+    número de pedidos. Cacheado por revisión de los filtros y parámetros.
+    """
+    if kind not in KINDS:
+        raise HTTPException(422, f"Tipo desconocido '{kind}'. Válidos: {list(KINDS)}")
+    ds = require_dataset(tenant)
+    x, y = COLUMN_RENAMES.get(x, x), COLUMN_RENAMES.get(y, y)
+    for col in (x, y):
+        if col not in ds.df.columns or not pd.api.types.is_numeric_dtype(ds.df[col]):
+            raise HTTPException(400, f"'{col}' no es una columna numérica")
+    stratify = COLUMN_RENAMES.get(stratify, stratify) if kind == "sample" else None
+    if stratify is not None and stratify not in ds.df.columns:
+        stratify = None
+    month, vendor, product = month_key(month), filter_value(vendor), filter_value(product)
+    filters = {k: v for k, v in {"Customer Name": vendor, "product": product}.items() if v}
+    params = (x, y, kind, month, tuple(sorted(filters.items())), gridsize, max_points, stratify)
+    payload = cached_scatter(ds, month, filters, x, y, kind, gridsize, max_points, stratify)
+    return cached_json(request, payload, ds.etag("scatter-" + hashlib.sha1(repr(params).encode()).hexdigest()[:12]))
+
+
+# -------------------------------------------------------
+# ENDPOINT: /sales_trend
+# -------------------------------------------------------
+@router.get("/sales_trend")
+def sales_trend(
+    request: Request,
+    year:   int  = Query(2020),
+    month:  str  = Query(None),
+    vendor: str  = Query("Todos"),
+    tenant: Tenant = Depends(current_tenant)
+):
+    month, vendor = month_key(month), filter_value(vendor)
+    cached = _snapshot_response(request, tenant, snapshot_key("sales_trend", year=year, month=month, vendor=vendor))
+    if cached is not None:
+        return cached
+    # Ventas diarias de un mes o mes a mes de un año
+    return trend_payload(_get_aggregates(tenant), year, month, vendor)
@@ -0,0 +1,387 @@
+# backend/routes_models.py
+
+import shutil
+from datetime import datetime
+
+import pandas as pd
+from fastapi import APIRouter, BackgroundTasks, Depends, FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response
+
+from api_common import MODELS_DIR, cached_json, current_tenant, month_key, require_dataset, tenants
+from dashboard import build_snapshot
+from dataset_store import Dataset
+from fast_inference import quantile_label
+from forecasting import build_periods, combine_quantiles, forecast_grid, model_uses_lags, period_bounds
+from lru import LRUCache
+from model_registry import ModelRegistry, ModelSet
+from tenants import Tenant
+
+# Entrenamiento, predicción, pronósticos, inventario y métricas. Los
+# módulos de entrenamiento / backtest (XGBoost, scikit-learn) se importan
+# dentro de las rutas que los usan.
+router = APIRouter()
+
+
+def register(app: FastAPI):
+    app.include_router(router)
+    app.on_event("startup")(load_models)
+
+
+def load_models():
+    """Carga la versión activa de los modelos del tenant por defecto, si existe."""
+    MODELS_DIR.mkdir(exist_ok=True)
+    models = tenants.default.models()
+    if models is not None:
+        print(f"▶️ Modelos cargados (versión {models.version}).")
+    else:
+        print("⚠️ Pipelines no encontrados. Usa /upload_csv + /train_xgb.")
+
+
+def _get_models(tenant: Tenant) -> ModelSet:
+    models = tenant.models()
+    if models is None or (models.fast is None and models.pipelines()[0] is None):
+        raise HTTPException(400, "Modelos no entrenados. Usa /upload_csv + /train_xgb.")
+    return models
+
+
+def _lag_dataset(tenant: Tenant, models: ModelSet) -> Dataset | None:
+    """Dataset del que salen las features de demanda, si el modelo las usa."""
+    return require_dataset(tenant) if model_uses_lags(models) else None
+
+
+# -------------------------------------------------------
+# ENDPOINT: /train_xgb
+# -------------------------------------------------------
+@router.post("/train_xgb")
+def retrain(
+    background: BackgroundTasks,
+    mode:      str  = Query("full", description="'full', 'incremental' o 'tune'"),
+    quantiles: bool = Query(False, description="Entrenar también modelos P10/P50/P90"),
+    backtest:  bool = Query(False, description="Backtest de origen móvil de la versión nueva"),
+    lags:      bool = Query(False, description="Usar lags y medias móviles de la demanda por serie"),
+    monthly:   bool = Query(False, description="Entrenar sobre la tabla mensual (region, product, mes)"),
+    chunk_rows: int = Query(None, ge=1000, description="Entrenar fuera de memoria, por bloques de N filas"),
+    tenant:    Tenant = Depends(current_tenant)
+):
+    csv_path = tenant.csv_path
+    registry = tenant.registry
+    if not csv_path.exists():
+        raise HTTPException(400, "No hay CSV. Usa /upload_csv primero.")
+    if mode not in ("full", "incremental", "tune"):
+        raise HTTPException(422, f"Modo desconocido '{mode}'")
+    if backtest and chunk_rows and not monthly and mode == "full":
+        raise HTTPException(422, "El backtest con chunk_rows necesita monthly=true")
+    from train_xgb import DEFAULT_QUANTILES, retrain_incremental, train_and_save
+    from backtesting import BACKTEST_DIR, backtest_and_save
+    # Se entrena en una versión nueva, invisible hasta publicarla
+    version, out = registry.stage(copy_current=(mode == "incremental"))
+
+    def run() -> dict:
+        try:
+            if mode == "incremental":
+                summary = retrain_incremental(str(csv_path), str(out))
+            elif mode == "tune":
+                from tuning import tune_and_save
+                result = tune_and_save(str(csv_path), str(out), quantiles=DEFAULT_QUANTILES if quantiles else None,
+                                       lag_features=lags, monthly=monthly)
+                summary = {"mode": "tune", "params": result["params"], "score": result["score"]}
+            else:
+                train_and_save(str(csv_path), str(out), quantiles=DEFAULT_QUANTILES if quantiles else None,
+                               lag_features=lags, monthly=monthly, chunk_rows=chunk_rows)
+                summary = {"mode": "full"}
+            if backtest and summary["mode"] != "none":
+                summary["backtest"] = backtest_and_save(str(csv_path), str(out))["metrics"]
+            elif not backtest:
+                # Las tablas copiadas de la versión anterior ya no la describen
+                shutil.rmtree(out / BACKTEST_DIR, ignore_errors=True)
+        except Exception:
+            registry.discard(version)
+            raise
+        if summary["mode"] == "none":
+            registry.discard(version)
+        else:
+            registry.publish(version)
+        return summary
+
+    if mode == "tune" or backtest:
+        # Búsqueda y backtest tardan minutos: se responde ya y se consulta /train_xgb/jobs/<job>
+        registry.write_job(version, {"status": "running", "mode": mode, "started": datetime.now()})
+        background.add_task(_run_job, registry, version, run, csv_path)
+        return JSONResponse({"detail": "Entrenamiento en segundo plano.", "tenant": tenant.id,
+                             "job": version, "status": "running"}, status_code=202)
+    try:
+        summary = run()
+    except Exception as e:
+        raise HTTPException(500, str(e))
+    models = registry.refresh()
+    background.add_task(build_snapshot, csv_path)
+    return {"detail": "Retraining completado.", "tenant": tenant.id,
+            "model_version": models.version if models else None, **summary}
+
+
+def _run_job(registry: ModelRegistry, version: str, run, csv_path):
+    """Entrenamiento de /train_xgb fuera de la petición; el resultado queda en registry.job."""
+    started = registry.job(version)["started"]
+    try:
+        summary = run()
+    except Exception as e:
+        registry.write_job(version, {"status": "failed", "started": started,
+                                     "finished": datetime.now(), "detail": str(e)})
+        return
+    registry.refresh()
+    registry.write_job(version, {"status": "done", "started": started, "finished": datetime.now(),
+                                 "model_version": version if summary["mode"] != "none" else None, **summary})
+    build_snapshot(csv_path)
+
+
+@router.get("/train_xgb/jobs/{job}")
+def training_job(job: str, tenant: Tenant = Depends(current_tenant)):
+    """Estado de un entrenamiento en segundo plano: running, done (con el resumen) o failed."""
+    status = tenant.registry.job(job)
+    if status is None:
+        raise HTTPException(404, f"No existe el trabajo '{job}'")
+    return {"job": job, "tenant": tenant.id, **status}
+
+
+# -------------------------------------------------------
+# ENDPOINT: /predict  (una serie, un periodo)
+# -------------------------------------------------------
+@router.post("/predict")
+def predict_json(payload: dict, tenant: Tenant = Depends(current_tenant)):
+    # 1) Validar campos obligatorios
+    for k in ("region", "product", "date"):
+        if k not in payload:
+            raise HTTPException(422, f"Falta '{k}' en el JSON.")
+    period = payload.get("period", "day")
+    # 2) Parsear fecha base
+    try:
+        dt = datetime.strptime(payload["date"], "%Y-%m-%d")
+    except:
+        raise HTTPException(422, "Formato de 'date' inválido. Debe ser YYYY-MM-DD.")
+    # 3) Periodo que contiene la fecha ("day" = su mes completo)
+    try:
+        start, end = period_bounds(pd.Timestamp(dt), period)
+    except ValueError as e:
+        raise HTTPException(422, str(e))
+    # 4) Pronóstico vectorizado de una sola serie y un solo periodo
+    models = _get_models(tenant)
+    periods = pd.DataFrame({"label": [period], "start": [start], "end": [end]})
+    try:
+        fc = forecast_grid(models, [payload["region"]], [payload["product"]], periods, _lag_dataset(tenant, models))
+    except ValueError as e:
+        raise HTTPException(422, str(e))
+    result = {
+        "period":        period,
+        "quantity":      float(fc["quantity"][0, 0]),
+        "profit":        float(fc["profit"][0, 0]),
+        "model_version": models.version
+    }
+    if "quantiles" in fc:
+        result["quantiles"] = _quantiles_json(fc, 0, 0)
+    return result
+
+
+
+# -------------------------------------------------------
+# ENDPOINT: /forecast  (multi-serie, multi-horizonte)
+# -------------------------------------------------------
+MAX_FORECAST_ROWS = 2_000_000
+
+
+def _periods_from_payload(payload: dict) -> pd.DataFrame:
+    freq = payload.get("freq", "month")
+    try:
+        return build_periods(payload.get("start"), payload.get("end"), freq, payload.get("periods"))
+    except (ValueError, TypeError) as e:
+        raise HTTPException(422, f"Periodos inválidos: {e}")
+
+
+def _quantiles_json(values: dict, *index) -> dict:
+    """{"quantity": {"p10": ..., "p50": ...}, "profit": {...}} de `values[*index]`."""
+    return {
+        target: {
+            quantile_label(alpha): values[f"{target}_quantiles"][index][..., k].tolist()
+            for k, alpha in enumerate(values["quantiles"])
+        }
+        for target in ("quantity", "profit")
+    }
+
+
+def _periods_json(periods: pd.DataFrame) -> list:
+    return [
+        {"label": r.label, "start": r.start.strftime("%Y-%m-%d"), "end": r.end.strftime("%Y-%m-%d")}
+        for r in periods.itertuples()
+    ]
+
+
+@router.post("/forecast")
+def forecast(payload: dict, tenant: Tenant = Depends(current_tenant)):
+    """
+    {"regions": [...] | "*", "products": [...] | "*",
+     "freq": "week|month|quarter|year|custom", "start": "YYYY-MM-DD",
+     "end": "YYYY-MM-DD", "periods": [{"start", "end", "label"?}] (custom),
+     "include_series": true}
+    """
+    models = _get_models(tenant)
+    selected = {}
+    for key, col in (("regions", "region"), ("products", "product")):
+        value = payload.get(key, "*")
+        if value == "*":
+            selected[key] = require_dataset(tenant).categories.get(col, [])
+        elif isinstance(value, list) and value:
+            selected[key] = value
+        else:
+            raise HTTPException(422, f"'{key}' debe ser una lista no vacía o '*'")
+    periods = _periods_from_payload(payload)
+    n_months = len(pd.period_range(periods["start"].min(), periods["end"].max(), freq="M"))
+    if len(selected["regions"]) * len(selected["products"]) * n_months > MAX_FORECAST_ROWS:
+        raise HTTPException(422, "El grid de pronóstico es demasiado grande")
+
+    try:
+        fc = forecast_grid(models, selected["regions"], selected["products"], periods, _lag_dataset(tenant, models))
+    except ValueError as e:
+        raise HTTPException(422, str(e))
+    result = {
+        "model_version": models.version,
+        "periods":       _periods_json(periods),
+        "totals": {
+            "quantity":       fc["quantity"].sum(axis=0).tolist(),
+            "profit":         fc["profit"].sum(axis=0).tolist(),
+            "total_quantity": float(fc["quantity"].sum()),
+            "total_profit":   float(fc["profit"].sum()),
+        },
+    }
+    has_quantiles = "quantiles" in fc
+    if has_quantiles:
+        totals = {"quantiles": fc["quantiles"]}
+        for target in ("quantity", "profit"):
+            totals[f"{target}_quantiles"] = combine_quantiles(fc[target].sum(axis=0),
+                                                              fc[f"{target}_spread"].sum(axis=0))
+        result["totals"]["quantiles"] = _quantiles_json(totals)
+    if payload.get("include_series", True):
+        result["series"] = [
+            {
+                "region":         region,
+                "product":        product,
+                "quantity":       q.tolist(),
+                "profit":         p.tolist(),
+                "total_quantity": float(q.sum()),
+                "total_profit":   float(p.sum()),
+                **({"quantiles": _quantiles_json(fc, i)} if has_quantiles else {}),
+            }
+            for i, (region, product, q, p) in enumerate(zip(fc["regions"], fc["products"],
+                                                             fc["quantity"], fc["profit"]))
+        ]
+    return result
+
+
+# -------------------------------------------------------
+# ENDPOINT: /forecast/hierarchy  (rollups jerárquicos)
+# -------------------------------------------------------
+@router.post("/forecast/hierarchy")
+def forecast_hierarchy(payload: dict, tenant: Tenant = Depends(current_tenant)):
+    """
+    Pronóstico agregado desde (region, product) hacia sub-categoría,
+    categoría, región y total. {"levels": [...], "freq", "start", "end",
+    "periods"} con los mismos periodos que /forecast.
+    """
+    from hierarchy import LEVELS, hierarchical_forecast
+    models = _get_models(tenant)
+    ds = require_dataset(tenant)
+    levels = payload.get("levels") or [l for l in LEVELS if l != "region_product"]
+    unknown = [l for l in levels if l not in LEVELS]
+    if unknown:
+        raise HTTPException(422, f"Niveles desconocidos: {unknown}. Válidos: {list(LEVELS)}")
+    periods = _periods_from_payload(payload)
+    try:
+        rolled = hierarchical_forecast(models, ds, periods, levels)
+    except ValueError as e:
+        raise HTTPException(422, str(e))
+    return {
+        "model_version": models.version,
+        "periods":       _periods_json(periods),
+        "levels": {
+            level: [
+                {**key, "quantity": q.tolist(), "profit": p.tolist(),
+                 "total_quantity": float(q.sum()), "total_profit": float(p.sum()),
+                 **({"quantiles": _quantiles_json(node, i)} if node["quantiles"] else {})}
+                for i, (key, q, p) in enumerate(zip(node["keys"].to_dict("records"),
+                                                    node["quantity"], node["profit"]))
+            ]
+            for level, node in rolled.items()
+        },
+    }
+
+
+# -------------------------------------------------------
+# ENDPOINT: /inventory/plan  (reposición por región y producto)
+# -------------------------------------------------------
+@router.get("/inventory/plan")
+def inventory_plan_endpoint(
+    service_level:  float = Query(0.95, gt=0, lt=1),
+    lead_time_days: float = Query(14, gt=0),
+    ordering_cost:  float = Query(50.0, ge=0, description="Coste por pedido"),
+    holding_rate:   float = Query(0.25, ge=0, description="Coste anual de mantener / coste unitario"),
+    holding_cost:   float = Query(None, ge=0, description="Coste anual por unidad (anula holding_rate)"),
+    horizon_months: int   = Query(12, ge=1, le=36),
+    start:          str   = Query(None, description="Primer mes del horizonte (YYYY-MM)"),
+    format:         str   = Query("json", description="json, csv o parquet"),
+    tenant:         Tenant = Depends(current_tenant)
+):
+    from inventory import inventory_plan
+    models = _get_models(tenant)
+    ds = require_dataset(tenant)
+    try:
+        plan = inventory_plan(
+            models, ds, service_level, lead_time_days, ordering_cost, holding_rate,
+            holding_cost, horizon_months, month_key(start)
+        )
+    except ValueError as e:
+        raise HTTPException(422, str(e))
+    headers = {"X-Model-Version": models.version}
+    if format == "csv":
+        headers["Content-Disposition"] = 'attachment; filename="inventory_plan.csv"'
+        return Response(plan.to_csv(index=False), media_type="text/csv", headers=headers)
+    if format == "parquet":
+        try:
+            data = plan.to_parquet(index=False)
+        except ImportError:
+            raise HTTPException(422, "Exportar a Parquet requiere pyarrow o fastparquet")
+        headers["Content-Disposition"] = 'attachment; filename="inventory_plan.parquet"'
+        return Response(data, media_type="application/vnd.apache.parquet", headers=headers)
+    if format != "json":
+        raise HTTPException(422, f"Formato desconocido '{format}'")
+    return {
+        "model_version": models.version,
+        "plan": plan.astype(object).where(plan.notna(), None).to_dict("records"),
+    }
+
+
+# -------------------------------------------------------
+# ENDPOINT: /metrics_xgb
+# -------------------------------------------------------
+_backtests = LRUCache(8)
+
+
+def _table_json(table: pd.DataFrame) -> list:
+    return table.astype(object).where(table.notna(), None).to_dict("records")
+
+
+@router.get("/metrics_xgb")
+def metrics_xgb_endpoint(
+    request: Request,
+    table:   str = Query(None, description="folds, regions o products (por defecto todas)"),
+    tenant:  Tenant = Depends(current_tenant)
+):
+    """Métricas del backtest de origen móvil guardado con la versión activa."""
+    from backtesting import TABLES, load_backtest
+    if table is not None and table not in TABLES:
+        raise HTTPException(422, f"Tabla desconocida '{table}'. Válidas: {list(TABLES)}")
+    models = _get_models(tenant)
+    stored = _backtests.get_or_build(models.version, lambda: load_backtest(models.path))
+    if stored is None:
+        raise HTTPException(404, "La versión activa no tiene backtest. Usa /train_xgb?backtest=true.")
+    payload = {"model_version": models.version, "metrics": stored["summary"]}
+    for name in ([table] if table else TABLES):
+        payload[name] = _table_json(stored[name])
+    return cached_json(request, payload, f'"{models.version}-backtest-{table or "all"}"')
@@ -0,0 +1,136 @@
+# backend/scatter.py
+
+import numpy as np
+import pandas as pd
+
+from lru import LRUCache
+
+KINDS = ("hexbin", "hist", "sample")
+MAX_POINTS = 10_000
+MAX_GRIDSIZE = 200
+
+
+def _extent(v: np.ndarray) -> tuple:
+    lo, hi = float(v.min()), float(v.max())
+    return (lo - 0.5, hi + 0.5) if lo == hi else (lo, hi)
+
+
+def hexbin_cells(x: np.ndarray, y: np.ndarray, gridsize: int = 30) -> pd.DataFrame:
+    """
+    Conteos en celdas hexagonales (mismo esquema que matplotlib.hexbin):
+    dos retículas rectangulares desplazadas media celda; cada punto va al
+    centro más cercano de las dos. Todo vectorizado, sin bucles por punto.
+    Devuelve los centros (x, y) de las celdas no vacías y su `count`.
+    """
+    (xmin, xmax), (ymin, ymax) = _extent(x), _extent(y)
+    nx = gridsize
+    ny = max(int(nx / np.sqrt(3)), 1)
+    sx, sy = (xmax - xmin) / nx, (ymax - ymin) / ny
+    ix, iy = (x - xmin) / sx, (y - ymin) / sy
+    ix1, iy1 = np.round(ix), np.round(iy)
+    ix2, iy2 = np.floor(ix), np.floor(iy)
+    d1 = (ix - ix1) ** 2 + 3.0 * (iy - iy1) ** 2
+    d2 = (ix - ix2 - 0.5) ** 2 + 3.0 * (iy - iy2 - 0.5) ** 2
+    first = d1 < d2
+    # Celdas de la retícula 1: (nx + 1) × (ny + 1); las de la 2 van detrás: nx × ny
+    n1 = (nx + 1) * (ny + 1)
+    code = np.where(
+        first,
+        ix1.clip(0, nx) * (ny + 1) + iy1.clip(0, ny),
+        n1 + ix2.clip(0, nx - 1) * ny + iy2.clip(0, ny - 1),
+    ).astype(np.int64)
+    counts = np.bincount(code, minlength=n1 + nx * ny)
+    cells = np.flatnonzero(counts)
+    second = cells >= n1
+    local = np.where(second, cells - n1, cells)
+    cx = np.where(second, local // ny + 0.5, local // (ny + 1))
+    cy = np.where(second, local % ny + 0.5, local % (ny + 1))
+    return pd.DataFrame({"x": xmin + cx * sx, "y": ymin + cy * sy, "count": counts[cells]})
+
+
+def histogram_cells(x: np.ndarray, y: np.ndarray, gridsize: int = 30) -> pd.DataFrame:
+    """Conteos en una rejilla rectangular gridsize × gridsize (centros de celda no vacíos)."""
+    counts, xe, ye = np.histogram2d(x, y, bins=gridsize, range=[_extent(x), _extent(y)])
+    i, j = np.nonzero(counts)
+    return pd.DataFrame({"x": (xe[i] + xe[i + 1]) / 2, "y": (ye[j] + ye[j + 1]) / 2,
+                         "count": counts[i, j].astype(np.int64)})
+
+
+def stratified_sample(strata: np.ndarray, max_points: int, seed: int = 0) -> np.ndarray:
+    """
+    Posiciones de una muestra de como mucho `max_points` filas con cuota
+    por estrato proporcional a su tamaño (al menos 1 por estrato mientras
+    quepa). Es un muestreo de reservorio "bottom-k": cada fila recibe una
+    clave aleatoria fija y cada estrato se queda con sus claves menores,
+    así el resultado es estable y no depende del orden de las filas.
+    """
+    n = len(strata)
+    if n <= max_points:
+        return np.arange(n)
+    codes, uniques = pd.factorize(strata, use_na_sentinel=False)
+    sizes = np.bincount(codes)
+    quota = np.floor(sizes * (max_points / n)).astype(np.int64)
+    # El resto del cupo va a los estratos con mayor parte fraccionaria (y a los vacíos)
+    spare = max_points - quota.sum()
+    if spare > 0:
+        frac = sizes * (max_points / n) - quota + (quota == 0)
+        quota[np.argsort(-frac, kind="stable")[:spare]] += 1
+    keys = np.random.default_rng(seed).random(n)
+    order = np.lexsort((keys, codes))
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    rank = np.arange(n) - starts[codes[order]]
+    return np.sort(order[rank < quota[codes[order]]])
+
+
+def scatter_summary(df: pd.DataFrame, x: str, y: str, kind: str = "hexbin", gridsize: int = 30,
+                    max_points: int = 2000, stratify: str | None = None) -> dict:
+    """
+    Resumen de la relación entre dos columnas numéricas de `df` acotado en
+    tamaño: celdas hexbin / rejilla con conteos, o una muestra estratificada
+    de como mucho `max_points` puntos. Incluye n y la correlación de
+    Pearson calculadas sobre todas las filas, no sobre la muestra.
+    """
+    xv = pd.to_numeric(df[x], errors="coerce").to_numpy(dtype=float)
+    yv = pd.to_numeric(df[y], errors="coerce").to_numpy(dtype=float)
+    ok = np.isfinite(xv) & np.isfinite(yv)
+    xv, yv = xv[ok], yv[ok]
+    result = {"kind": kind, "x": x, "y": y, "n": int(len(xv))}
+    if not len(xv):
+        result.update({"extent": None, "pearson": None, "cells" if kind != "sample" else "points": []})
+        return result
+    result["extent"] = {"x": list(_extent(xv)), "y": list(_extent(yv))}
+    result["pearson"] = float(np.corrcoef(xv, yv)[0, 1]) if len(xv) > 1 and xv.std() and yv.std() else None
+    if kind == "hexbin":
+        result["cells"] = hexbin_cells(xv, yv, gridsize).to_dict("records")
+    elif kind == "hist":
+        result["cells"] = histogram_cells(xv, yv, gridsize).to_dict("records")
+    else:
+        strata = df[stratify].astype(object).fillna("").to_numpy()[ok] if stratify else np.zeros(len(xv))
+        picked = stratified_sample(strata, max_points)
+        points = pd.DataFrame({"x": xv[picked], "y": yv[picked]})
+        if stratify:
+            points["group"] = strata[picked]
+        result["points"] = points.to_dict("records")
+    return result
+
+
+# Resúmenes por revisión de las filas filtradas y parámetros
+_summaries = LRUCache(64)
+
+
+def cached_scatter(ds, month: str | None, filters: dict, x: str, y: str, kind: str,
+                   gridsize: int, max_points: int, stratify: str | None) -> dict:
+    """
+    scatter_summary de las filas que devuelven los índices de mes / cliente
+    / producto. Se cachea por la revisión de esos filtros: una ingesta que
+    no toca el mes, cliente o producto filtrado no invalida el resumen.
+    """
+    if ds.aggregates is not None:
+        revision = (ds.lineage,) + ds.aggregates.filter_key(month, filters)
+    else:
+        revision = (ds.version,)
+    key = (revision, month, tuple(sorted(filters.items())), x, y, kind, gridsize, max_points, stratify)
+    return _summaries.get_or_build(
+        key, lambda: scatter_summary(ds.df.iloc[ds.select(month, filters)], x, y, kind,
+                                     gridsize, max_points, stratify)
+    )
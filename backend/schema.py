@@ -0,0 +1,136 @@
+# backend/schema.py
+
+import io
+
+import numpy as np
+import pandas as pd
+
+from features import month_numbers
+from ml_utils import normalize_columns
+
+# Renombrado "fácil" previo a normalize_columns
+COLUMN_RENAMES = {
+    "Order Date":   "date",
+    "Region":       "region",
+    "Product Name": "product",
+    "Quantity":     "quantity",
+    "Profit":       "profit",
+}
+
+# Esquema tipado (nombres ya normalizados): formato fijo de cada fecha
+DATE_FORMATS = {
+    "date":      "%Y-%m-%d",
+    "Ship Date": "%m/%d/%Y",
+}
+NUMERIC_COLUMNS = ["Sales", "quantity", "Discount", "profit"]
+# Una fila sin alguno de estos valores se rechaza
+REQUIRED_COLUMNS = ["date", "quantity", "profit"]
+
+# Columnas derivadas de `date` que reutilizan índices, agregados y features
+DATE_PARTS = ["year", "month", "day", "year_month"]
+
+# Rechazos que se detallan en las respuestas de la API
+MAX_REPORTED = 20
+
+
+def normalize_frame(raw: pd.DataFrame) -> pd.DataFrame:
+    return normalize_columns(raw.rename(columns=COLUMN_RENAMES, errors="ignore"))
+
+
+def apply_schema(df: pd.DataFrame, date_formats: dict = DATE_FORMATS) -> tuple:
+    """
+    Tipa las columnas del esquema presentes en `df` (fechas con su formato
+    fijo, numéricas) y separa las filas inválidas: un valor que no cumple
+    su tipo o un obligatorio vacío. Devuelve (filas válidas con índice
+    0..n-1, rechazos), con un rechazo por fila y columna: `row` es la
+    línea del CSV (la cabecera es la 1).
+    """
+    df = df.copy()
+    bad = np.zeros(len(df), dtype=bool)
+    problems = []
+
+    def check(col, parsed):
+        raw = df[col]
+        invalid = (parsed.isna() & raw.notna()).to_numpy()
+        missing = raw.isna().to_numpy() if col in REQUIRED_COLUMNS else np.zeros(len(df), dtype=bool)
+        for reason, rows in (("formato", invalid), ("vacío", missing)):
+            if rows.any():
+                problems.append(pd.DataFrame({
+                    "row":    np.flatnonzero(rows) + 2,
+                    "column": col,
+                    "value":  raw[rows].astype(str).to_numpy(),
+                    "reason": reason,
+                }))
+        bad[invalid | missing] = True
+        df[col] = parsed
+
+    for col, fmt in date_formats.items():
+        if col in df.columns:
+            check(col, pd.to_datetime(df[col], format=fmt, errors="coerce"))
+    for col in NUMERIC_COLUMNS:
+        if col in df.columns:
+            check(col, pd.to_numeric(df[col], errors="coerce"))
+
+    if problems:
+        rejected = pd.concat(problems, ignore_index=True).sort_values(["row", "column"], kind="stable")
+    else:
+        rejected = pd.DataFrame(columns=["row", "column", "value", "reason"])
+    return df[~bad].reset_index(drop=True), rejected.reset_index(drop=True)
+
+
+def add_date_parts(df: pd.DataFrame) -> pd.DataFrame:
+    """Añade year, month, day (enteros) y year_month ("YYYY-MM", category) de `date`."""
+    dates = df["date"]
+    df["year"] = dates.dt.year.astype(np.int16)
+    df["month"] = dates.dt.month.astype(np.int8)
+    df["day"] = dates.dt.day.astype(np.int8)
+    keys, codes = np.unique(month_numbers(df).to_numpy(), return_inverse=True)
+    labels = [f"{k // 12:04d}-{k % 12 + 1:02d}" for k in keys]
+    df["year_month"] = pd.Categorical.from_codes(codes.reshape(-1), labels)
+    return df
+
+
+def read_orders(data: bytes, date_formats: dict = DATE_FORMATS) -> tuple:
+    """
+    Ingesta de un CSV de pedidos: lectura, normalización de columnas,
+    tipado con el esquema y columnas derivadas de la fecha. Las fechas se
+    parsean una sola vez aquí. Devuelve (DataFrame, rechazos).
+    Lanza ValueError si no queda ninguna fila válida.
+    """
+    df = normalize_frame(pd.read_csv(io.BytesIO(data), encoding="latin1"))
+    return typed_orders(df, date_formats)
+
+
+def iter_orders(path, chunk_rows: int, date_formats: dict = DATE_FORMATS):
+    """
+    Lee el CSV de `path` por bloques de `chunk_rows` filas con el mismo
+    tipado que read_orders; las columnas se normalizan una vez, con la
+    cabecera. Genera (filas válidas, nº de filas rechazadas) por bloque.
+    """
+    columns = None
+    for raw in pd.read_csv(path, encoding="latin1", chunksize=chunk_rows):
+        if columns is None:
+            columns = normalize_frame(raw.head(0)).columns
+            if "date" not in columns:
+                raise ValueError("El CSV no tiene columna de fecha de pedido")
+        df, rejected = apply_schema(raw.set_axis(columns, axis=1), date_formats)
+        yield add_date_parts(df), int(rejected["row"].nunique())
+
+
+def typed_orders(df: pd.DataFrame, date_formats: dict = DATE_FORMATS) -> tuple:
+    """apply_schema + add_date_parts sobre un DataFrame ya normalizado."""
+    if "date" not in df.columns:
+        raise ValueError("El CSV no tiene columna de fecha de pedido")
+    df, rejected = apply_schema(df, date_formats)
+    if not len(df) and len(rejected):
+        raise ValueError(f"Ninguna fila cumple el esquema: {rejection_report(rejected)}")
+    return add_date_parts(df), rejected
+
+
+def rejection_report(rejected: pd.DataFrame) -> dict:
+    """Resumen JSON de los rechazos: filas, conteo por columna y los primeros casos."""
+    return {
+        "rows":      int(rejected["row"].nunique()),
+        "by_column": {str(k): int(v) for k, v in rejected["column"].value_counts().items()},
+        "sample":    rejected.head(MAX_REPORTED).to_dict(orient="records"),
+    }
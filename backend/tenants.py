@@ -0,0 +1,70 @@
+# backend/tenants.py
+
+import re
+import threading
+from pathlib import Path
+
+from dataset_store import Dataset, get_dataset, memory_budget
+from model_registry import ModelRegistry, ModelSet
+
+TENANT_HEADER = "X-Tenant"
+DEFAULT_TENANT = "default"
+_TENANT_ID = re.compile(r"[A-Za-z0-9][A-Za-z0-9_-]{0,63}")
+
+# Layout de cada tenant:
+#   <root>/<id>/orders.csv   pedidos (CSV subido + ingesta incremental)
+#   <root>/<id>/models/      ModelRegistry propio (versions/ + CURRENT)
+# El tenant por defecto conserva las rutas de siempre (CSV y models/ del proyecto).
+ORDERS_FILE = "orders.csv"
+MODELS_SUBDIR = "models"
+
+
+class Tenant:
+    """
+    Datos y modelos de un cliente. El Dataset y el ModelSet activos se
+    registran en memory_budget en cada uso: si el presupuesto se llena se
+    liberan los de los tenants más fríos y se recargan en su próxima
+    petición (el dataset de su snapshot columnar, los modelos de disco).
+    Las cachés derivadas (jerarquías, pronósticos, backtests) van por
+    versión de dataset / modelo, así que nunca se mezclan entre tenants.
+    """
+
+    def __init__(self, tenant_id: str, csv_path: Path, models_dir: Path):
+        self.id = tenant_id
+        self.csv_path = Path(csv_path)
+        self.registry = ModelRegistry(models_dir)
+
+    def dataset(self) -> Dataset | None:
+        if not self.csv_path.exists():
+            return None
+        return get_dataset(self.csv_path)
+
+    def models(self) -> ModelSet | None:
+        models = self.registry.current()
+        if models is not None:
+            memory_budget.touch(("models", self.id), models.nbytes, self.registry.unload)
+        return models
+
+
+class TenantRegistry:
+    """Tenants por id, creados al primer uso con su propio directorio bajo `root`."""
+
+    def __init__(self, root, default: Tenant):
+        self.root = Path(root)
+        self.default = default
+        self._tenants = {DEFAULT_TENANT: default}
+        self._lock = threading.Lock()
+
+    def get(self, tenant_id: str | None) -> Tenant:
+        """Tenant de `tenant_id` (el por defecto si viene vacío); ValueError si el id no es válido."""
+        if not tenant_id:
+            return self.default
+        if not _TENANT_ID.fullmatch(tenant_id):
+            raise ValueError(f"Id de tenant inválido: {tenant_id!r}")
+        with self._lock:
+            tenant = self._tenants.get(tenant_id)
+            if tenant is None:
+                folder = self.root / tenant_id
+                tenant = Tenant(tenant_id, folder / ORDERS_FILE, folder / MODELS_SUBDIR)
+                self._tenants[tenant_id] = tenant
+            return tenant
@@ -0,0 +1,7 @@
+# backend/tests/conftest.py
+
+import sys
+from pathlib import Path
+
+# Los módulos del backend se importan por nombre (se ejecuta desde backend/)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,62 @@
+# backend/tests/test_fast_inference.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from fast_inference import PARITY_ATOL, CompiledForecaster
+from features import FEATURE_COLS
+from ml_utils import build_xgb_pipeline
+
+PARAMS = {"n_estimators": 20, "max_depth": 3, "learning_rate": 0.3, "n_jobs": 1}
+
+
+def _orders(n: int = 300, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "date":    pd.to_datetime("2022-01-01") + pd.to_timedelta(rng.integers(0, 730, n), unit="D"),
+        "region":  rng.choice(["East", "West", "South"], n),
+        "product": rng.choice(["Chair A", "Table B", "Lamp C", "Desk D"], n),
+    })
+    for col in FEATURE_COLS:
+        df[col] = rng.uniform(0, 5, n)
+        df.loc[rng.random(n) < 0.2, col] = np.nan   # missing como en los lags reales
+    df["quantity"] = rng.poisson(3, n) + (df["region"] == "West") * 2
+    df["profit"] = rng.normal(10, 4, n) + df["date"].dt.month
+    return df
+
+
+def _rows(df: pd.DataFrame) -> pd.DataFrame:
+    # Filas vistas más categorías y fechas que no estaban en el entrenamiento
+    unseen = df.head(4).assign(region=["North", "East", "North", "West"],
+                               product=["Sofa Z", "Sofa Z", "Chair A", "Lamp C"],
+                               date=pd.to_datetime(["2030-06-01", "2022-03-15", "2023-12-31", "2031-01-01"]))
+    return pd.concat([df.sample(40, random_state=1), unseen], ignore_index=True)
+
+
+def _fit(df: pd.DataFrame, params: dict, lag_features: bool):
+    X = df.drop(columns=["quantity", "profit"])
+    return (build_xgb_pipeline(params, lag_features).fit(X, df["quantity"]),
+            build_xgb_pipeline(params, lag_features).fit(X, df["profit"]))
+
+
+def _close(expected, got):
+    np.testing.assert_allclose(got, expected, rtol=0,
+                               atol=PARITY_ATOL * max(1.0, float(np.max(np.abs(expected)))))
+
+
+@pytest.mark.parametrize("lag_features", [False, True])
+def test_compiled_matches_pipeline(lag_features):
+    df = _orders()
+    pipe_q, pipe_p = _fit(df, PARAMS, lag_features)
+    qparams = {**PARAMS, "objective": "reg:quantileerror", "quantile_alpha": np.array([0.1, 0.5, 0.9])}
+    quantile_pipes = _fit(df, qparams, lag_features)
+    fast = CompiledForecaster.from_pipelines(pipe_q, pipe_p, quantile_pipes)
+    rows = _rows(df)
+    X = rows.drop(columns=["quantity", "profit"])
+    q, p, qq, pq = fast.predict_frame(X)
+    _close(pipe_q.predict(X), q)
+    _close(pipe_p.predict(X), p)
+    _close(quantile_pipes[0].predict(X), qq)
+    _close(quantile_pipes[1].predict(X), pq)
+    assert fast.quantiles == [0.1, 0.5, 0.9]
@@ -0,0 +1,74 @@
+# backend/tests/test_forecasting.py
+
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from forecasting import build_periods, combine_quantiles, forecast_series
+from hierarchy import hierarchical_forecast
+
+
+class _ConstantForecaster:
+    """Predicción fija por fila: media 1, cuantiles (0.5, 1, 2) para quantity."""
+
+    quantiles = [0.1, 0.5, 0.9]
+    quantile_boosters = ()
+    encoder = SimpleNamespace(n_numeric=0)
+
+    def predict_with_quantiles(self, year, month, region, product, numeric=None):
+        n = len(year)
+        q = np.ones(n)
+        qq = np.tile([0.5, 1.0, 2.0], (n, 1))
+        return q, 10 * q, qq, 10 * qq
+
+
+def _models():
+    return SimpleNamespace(fast=_ConstantForecaster(), version="test", monthly=True)
+
+
+def test_single_month_keeps_model_quantiles():
+    periods = build_periods("2024-01-01", "2024-01-31", "month")
+    fc = forecast_series(_models(), ["East"], ["Chair"], periods)
+    np.testing.assert_allclose(fc["quantity_quantiles"][0, 0], [0.5, 1.0, 2.0])
+
+
+def test_period_quantiles_add_independent_months():
+    periods = build_periods("2024-01-01", "2024-03-31", "quarter")
+    fc = forecast_series(_models(), ["East"], ["Chair"], periods)
+    assert fc["quantity"][0, 0] == 3
+    # No es la suma de cuantiles (1.5, 3, 6): las desviaciones suman en cuadratura
+    np.testing.assert_allclose(fc["quantity_quantiles"][0, 0],
+                               [3 - np.sqrt(3 * 0.25), 3, 3 + np.sqrt(3)])
+
+
+def test_hierarchy_total_combines_series_spread():
+    bottom = pd.DataFrame({"region": ["East", "East", "West", "West"],
+                           "product": ["Chair", "Desk", "Chair", "Lamp"],
+                           "Category": "Furniture", "Sub-Category": "Chairs"})
+    ds = SimpleNamespace(df=bottom, version="hierarchy-test", aggregates=None)
+    periods = build_periods("2024-01-01", "2024-02-29", "month")
+    levels = hierarchical_forecast(_models(), ds, periods, ["total", "region", "region_product"])
+    total, leaves = levels["total"], levels["region_product"]
+    np.testing.assert_allclose(total["quantity"][0], leaves["quantity"].sum(axis=0))
+    expected = combine_quantiles(leaves["quantity"].sum(axis=0), leaves["quantity_spread"].sum(axis=0))
+    np.testing.assert_allclose(total["quantity_quantiles"][0], expected)
+    np.testing.assert_allclose(total["quantity_quantiles"][0, 0], [4 - np.sqrt(4 * 0.25), 4, 4 + 2])
+
+
+def test_hierarchy_line_model_scales_to_monthly_demand():
+    # Modelo por línea: 1 unidad por línea; East/Chair 4 líneas en 3 meses, West/Lamp 1 en 1
+    orders = pd.DataFrame({
+        "date":    pd.to_datetime(["2023-10-05", "2023-11-20", "2023-12-01", "2023-12-09", "2023-12-15"]),
+        "region":  ["East", "East", "East", "East", "West"],
+        "product": ["Chair", "Chair", "Chair", "Chair", "Lamp"],
+        "quantity": [1, 2, 1, 3, 4],
+        "Category": "Furniture", "Sub-Category": "Chairs",
+    })
+    ds = SimpleNamespace(df=orders, version="line-test", aggregates=None)
+    models = SimpleNamespace(fast=_ConstantForecaster(), version="line", monthly=False)
+    periods = build_periods("2024-01-01", "2024-02-29", "month")
+    levels = hierarchical_forecast(models, ds, periods, ["total", "region_product"])
+    np.testing.assert_allclose(levels["region_product"]["quantity"], [[4 / 3, 4 / 3], [1, 1]])
+    np.testing.assert_allclose(levels["total"]["profit"], [[70 / 3, 70 / 3]])
+    assert levels["total"]["quantiles"] is None and "quantity_quantiles" not in levels["total"]
@@ -0,0 +1,48 @@
+# backend/tests/test_hierarchy.py
+
+import json
+
+import numpy as np
+import pandas as pd
+
+from hierarchy import LEVELS, Hierarchy
+
+
+def _orders() -> pd.DataFrame:
+    return pd.DataFrame({
+        "region":       ["East", "East", "West", "West", "South", "East"],
+        "product":      ["Chair A", "Table B", "Chair A", "Lamp C", "Table B", "Chair A"],
+        "Category":     ["Furniture", "Furniture", "Furniture", "Office", "Furniture", "Furniture"],
+        "Sub-Category": ["Chairs", "Tables", "Chairs", "Lamps", "Tables", "Chairs"],
+    })
+
+
+def test_keys_serialize_with_level_columns():
+    h = Hierarchy.from_frame(_orders())
+    for level, cols in LEVELS.items():
+        keys, _ = h.summing_matrix(level)
+        records = json.loads(json.dumps(keys.to_dict("records")))
+        expected = cols or ["level"]
+        assert records, level
+        assert all(sorted(r) == sorted(expected) for r in records), (level, records)
+    total, _ = h.summing_matrix("total")
+    assert total.to_dict("records") == [{"level": "total"}]
+    region, _ = h.summing_matrix("region")
+    assert sorted(r["region"] for r in region.to_dict("records")) == ["East", "South", "West"]
+
+
+def test_rollups_sum_bottom_series():
+    h = Hierarchy.from_frame(_orders())
+    rng = np.random.default_rng(0)
+    bottom = rng.uniform(0, 10, size=(len(h.bottom), 3))  # series × periodos
+    _, total = h.rollup(bottom, "total")
+    np.testing.assert_allclose(total, bottom.sum(axis=0, keepdims=True))
+    for level in LEVELS:
+        keys, rolled = h.rollup(bottom, level)
+        assert rolled.shape == (len(keys), 3)
+        np.testing.assert_allclose(rolled.sum(axis=0), total[0])
+    # Cada nodo es la suma de sus series inferiores
+    keys, rolled = h.rollup(bottom, "region")
+    for key, values in zip(keys.to_dict("records"), rolled):
+        members = (h.bottom["region"] == key["region"]).to_numpy()
+        np.testing.assert_allclose(values, bottom[members].sum(axis=0))
@@ -0,0 +1,28 @@
+# backend/tests/test_model_registry.py
+
+import os
+import time
+
+from model_registry import PUBLISHED_MARK, ModelRegistry
+
+
+def _publish(registry: ModelRegistry, age: float) -> str:
+    """Publica una versión vacía como si se hubiera publicado hace `age` segundos."""
+    version, path = registry.stage()
+    registry.publish(version)
+    stamp = time.time() - age
+    os.utime(path / PUBLISHED_MARK, (stamp, stamp))
+    return version
+
+
+def test_prune_keeps_recent_and_staged_versions(tmp_path):
+    registry = ModelRegistry(tmp_path, keep=2, grace=60)
+    staged, _ = registry.stage()   # /train_xgb largo aún escribiendo
+    old = [_publish(registry, age) for age in (600, 500, 400)]
+    recent = _publish(registry, 30)
+    _publish(registry, 0)
+    left = {p.name for p in registry.versions_dir.iterdir()}
+    # old[0] y old[1] se sustituyeron hace más de `grace`; old[2] hace 30 s
+    assert staged in left
+    assert old[0] not in left and old[1] not in left
+    assert old[2] in left and recent in left
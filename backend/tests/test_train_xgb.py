@@ -0,0 +1,44 @@
+# backend/tests/test_train_xgb.py
+
+import numpy as np
+import pandas as pd
+
+from train_xgb import fill_month_grid, monthly_cells, monthly_training_table
+
+
+def _orders() -> pd.DataFrame:
+    return pd.DataFrame({
+        "date":     pd.to_datetime(["2024-01-10", "2024-01-20", "2024-04-05", "2024-03-02", "2024-04-30"]),
+        "region":   ["East", "East", "East", "West", "East"],
+        "product":  ["Chair", "Chair", "Chair", "Desk", "Lamp"],
+        "quantity": [2, 1, 4, 3, 5],
+        "profit":   [1.0, 0.5, 2.0, 1.5, 2.5],
+    })
+
+
+def test_grid_starts_at_each_series_first_order():
+    df = _orders()
+    grid = monthly_training_table(df)
+    # East/Chair: ene–abr (4), West/Desk: mar–abr (2), East/Lamp: abr (1)
+    assert len(grid) == 7
+    assert (grid["lines"] == 0).sum() == 3
+    first = grid.groupby(["region", "product"])["date"].min()
+    assert first[("West", "Desk")] == pd.Timestamp("2024-03-01")
+    assert first[("East", "Lamp")] == pd.Timestamp("2024-04-01")
+    assert grid["quantity"].sum() == df["quantity"].sum()
+    assert grid["lines"].sum() == len(df)
+    chair = grid[grid["product"] == "Chair"].sort_values("date")
+    np.testing.assert_array_equal(chair["quantity"], [3, 0, 0, 4])
+
+
+def test_known_series_fill_new_months():
+    # Modo incremental: las series ya entrenadas entran desde `first` sin celdas
+    new = monthly_cells(pd.DataFrame({
+        "date": pd.to_datetime(["2024-06-03"]), "region": ["North"], "product": ["Sofa"],
+        "quantity": [1], "profit": [0.2],
+    }))
+    known = pd.MultiIndex.from_tuples([("East", "Chair"), ("West", "Desk")])
+    grid = fill_month_grid(new, known, first=24292, last=24293)   # 2024-05 .. 2024-06
+    assert len(grid) == 2 + 2 + 1
+    assert grid.loc[grid["product"] == "Sofa", "date"].tolist() == [pd.Timestamp("2024-06-01")]
+    assert (grid["lines"] == 0).sum() == 4
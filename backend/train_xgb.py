@@ -1,60 +1,516 @@
 # backend/train_xgb.py
 
+import hashlib
+import shutil
+import tempfile
+import numpy as np
 import pandas as pd
 import joblib
+import xgboost as xgb
 from pathlib import Path
-from ml_utils import normalize_columns, build_xgb_pipeline
+from sklearn.pipeline import Pipeline
+from ml_utils import build_xgb_pipeline
+from features import LagFeatures, frame_features, month_numbers
+from schema import iter_orders, read_orders
+from fast_inference import compile_pipelines
+from artifacts import save_compact
+from model_registry import QUANTILE_FILES, STATE_FILE
 
-def train_and_save(data_path: str, out_dir: str, model_params: dict = None):
+COMPACT_DIR = "compact"
+# Celdas mensuales de quantity (region, product, mes) de las que salen las
+# features de demanda; el modo incremental les suma las filas nuevas
+HISTORY_FILE = "lag_history.pkl"
+HISTORY_COLS = ["date", "region", "product", "quantity"]
+
+# Parámetros por defecto
+DEFAULT_PARAMS = {
+    "n_estimators": 300,
+    "learning_rate": 0.05,
+    "max_depth": 8,
+    "random_state": 42,
+    "n_jobs": -1
+}
+
+# Cuantiles de los modelos de intervalo (un booster multi-cuantil por target)
+DEFAULT_QUANTILES = (0.1, 0.5, 0.9)
+
+# Política del modo incremental: si se supera algún umbral se reentrena completo
+INCREMENTAL_POLICY = {
+    "max_unknown_ratio":     0.2,   # filas nuevas con región/producto/año no vistos
+    "max_incremental_ratio": 0.5,   # filas acumuladas en modo incremental / filas base
+    "max_extra_trees":       300,   # árboles añadidos desde el último entrenamiento completo
+}
+
+
+def _load_training_frame(data: bytes) -> pd.DataFrame:
+    """Pedidos tipados con el esquema de ingesta; las filas rechazadas no entrenan."""
+    return read_orders(data)[0]
+
+
+def _file_sha1(path, n_bytes: int | None = None):
+    """sha1 (objeto, para seguir actualizándolo) de los primeros `n_bytes` del fichero, por bloques."""
+    sha1, left = hashlib.sha1(), n_bytes
+    with open(path, "rb") as f:
+        while left is None or left > 0:
+            block = f.read(1 << 20 if left is None else min(1 << 20, left))
+            if not block:
+                break
+            sha1.update(block)
+            if left is not None:
+                left -= len(block)
+    return sha1
+
+
+def _month_starts(month: np.ndarray) -> pd.Series:
+    """Primer día de cada mes (año * 12 + mes - 1), la fecha que consulta /predict."""
+    return pd.to_datetime(pd.DataFrame({"year": month // 12, "month": month % 12 + 1, "day": 1}))
+
+
+def monthly_cells(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Colapsa las líneas de pedido a una fila por (region, product, año-mes)
+    con pedidos, con quantity y profit sumados y `lines` = nº de líneas de
+    la celda. Agrupa sobre códigos enteros (factorize + bincount), sin
+    groupby de strings. Las celdas de bloques distintos se suman con un
+    groupby (scan_orders).
+    """
+    df = df[df["date"].notna() & df["region"].notna() & df["product"].notna()]
+    r_codes, regions = pd.factorize(df["region"])
+    p_codes, products = pd.factorize(df["product"])
+    month = month_numbers(df).to_numpy(dtype=np.int64)
+    first = month.min() if len(month) else 0
+    n_months = month.max() - first + 1 if len(month) else 1
+    key = (r_codes.astype(np.int64) * len(products) + p_codes) * n_months + (month - first)
+    cells, inverse = np.unique(key, return_inverse=True)
+    series = cells // n_months
+    return pd.DataFrame({
+        "date":     _month_starts(cells % n_months + first),
+        "region":   regions[series // len(products)],
+        "product":  products[series % len(products)],
+        "quantity": np.bincount(inverse, weights=df["quantity"].to_numpy(dtype=float)),
+        "profit":   np.bincount(inverse, weights=df["profit"].to_numpy(dtype=float)),
+        "lines":    np.bincount(inverse),
+    })
+
+
+def fill_month_grid(cells: pd.DataFrame, series: pd.MultiIndex | None = None,
+                    first: int | None = None, last: int | None = None) -> pd.DataFrame:
+    """
+    Completa `cells` con los meses sin pedidos de cada serie (quantity,
+    profit y lines a 0), desde su primer pedido hasta `last` (año * 12 +
+    mes - 1; por defecto el último mes de `cells`). Los meses anteriores
+    al primer pedido de una serie no son demanda cero: no se añaden, igual
+    que en features.order_line_rate. `series` son pares (region, product)
+    ya existentes antes de `first` (el modo incremental): entran desde
+    `first` aunque no tengan celdas.
+    """
+    pairs = pd.MultiIndex.from_arrays([cells["region"], cells["product"]])
+    known = pairs.unique()
+    if series is not None:
+        known = series.append(known.difference(series)) if len(known) else series
+    month = month_numbers(cells).to_numpy(dtype=np.int64)
+    if first is None:
+        first = int(month.min()) if len(month) else 0
+    if last is None:
+        last = int(month.max()) if len(month) else first - 1
+    if len(month) and (month.min() < first or month.max() > last):
+        raise ValueError("Hay celdas fuera del rango de meses del grid")
+    code = known.get_indexer(pairs)
+    start = np.full(len(known), last + 1, dtype=np.int64)
+    if series is not None:
+        start[:len(series)] = first
+    np.minimum.at(start, code, month)
+    lengths = np.maximum(last - start + 1, 0)
+    offset = np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(np.int64)
+    size = int(lengths.sum())
+    row_series = np.repeat(np.arange(len(known)), lengths)
+    row_month = np.arange(size) - np.repeat(offset, lengths) + np.repeat(start, lengths)
+    cell = offset[code] + (month - start[code])
+    return pd.DataFrame({
+        "date":     _month_starts(row_month) if size else pd.Series([], dtype="datetime64[ns]"),
+        "region":   known.get_level_values(0).to_numpy(dtype=object)[row_series],
+        "product":  known.get_level_values(1).to_numpy(dtype=object)[row_series],
+        **{col: np.bincount(cell, weights=cells[col].to_numpy(dtype=float), minlength=size)
+           for col in ("quantity", "profit")},
+        "lines":    np.bincount(cell, weights=cells["lines"].to_numpy(dtype=float), minlength=size).astype(np.int64),
+    })
+
+
+def monthly_training_table(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Tabla de entrenamiento del modelo mensual: una fila por serie (region,
+    product) y mes desde su primer pedido hasta el final del histórico,
+    con ceros en los meses sin pedidos. Así el modelo aprende la demanda
+    mensual de la serie (no la cantidad de un mes con pedidos), que es lo
+    que agregan forecasting e inventario.
+    """
+    return fill_month_grid(monthly_cells(df))
+
+
+def _model_frame(df: pd.DataFrame, lag_features: bool) -> pd.DataFrame:
+    """Columnas de entrada del pipeline: date, region, product (+ lags y ventanas)."""
+    X = df[["date", "region", "product"]]
+    return X.join(frame_features(df)) if lag_features else X
+
+
+def quantile_params(params: dict, quantiles) -> dict:
+    """Parámetros de un XGBRegressor multi-cuantil a partir de los de media."""
+    return {**params, "objective": "reg:quantileerror", "quantile_alpha": np.asarray(quantiles, dtype=float)}
+
+
+def _save_compiled(pipe_q, pipe_p, X: pd.DataFrame, out: Path, quantile_pipes: tuple = None):
+    """Artefacto de inferencia compilado; se descarta si no pasa la paridad."""
+    path = out / COMPACT_DIR
+    shutil.rmtree(path, ignore_errors=True)
+    try:
+        sample = X.sample(min(len(X), 2000), random_state=0)
+        save_compact(compile_pipelines(pipe_q, pipe_p, sample, quantile_pipes), path)
+    except ValueError as e:
+        shutil.rmtree(path, ignore_errors=True)
+        print(f"⚠️ Artefacto compilado descartado: {e}")
+
+
+def train_and_save(data_path: str, out_dir: str, model_params: dict = None, quantiles=None,
+                   lag_features: bool = False, monthly: bool = False, chunk_rows: int = None):
+    """
+    Entrena los pipelines de media de quantity y profit y, si se pasan
+    `quantiles` (p. ej. DEFAULT_QUANTILES), un pipeline multi-cuantil por
+    target con el mismo preproceso. Con `lag_features` el modelo ve además
+    la demanda reciente de cada serie (features.py). Con `monthly` se
+    entrena sobre monthly_training_table (con los meses sin pedidos a 0):
+    el modelo predice el total mensual de la serie, que es lo que agregan
+    forecasting e inventario.
+    Con `chunk_rows` el CSV no se carga entero: se lee por bloques de ese
+    tamaño y se entrena con la memoria externa de XGBoost (fit_out_of_core).
+    """
     out = Path(out_dir)
     out.mkdir(exist_ok=True, parents=True)
+    params = model_params or DEFAULT_PARAMS
+
+    if chunk_rows:
+        scan = scan_orders(data_path, chunk_rows)
+        stats = scan["stats"]
+        if not monthly:
+            pipe_q, pipe_p, quantile_pipes, X = fit_out_of_core(
+                data_path, out, scan["cells"], params, quantiles, lag_features, chunk_rows)
+        # La tabla mensual ya es pequeña: se entrena en memoria sobre ella
+        rows = fill_month_grid(scan["cells"]) if monthly else scan["cells"]
+        cells = scan["cells"]
+    else:
+        data = Path(data_path).read_bytes()
+        df = _load_training_frame(data)
+        stats = {"last_month": int(month_numbers(df).max()), "bytes": len(data),
+                 "sha1": hashlib.sha1(data).hexdigest(), "base_rows": len(df)}
+        cells = monthly_cells(df)
+        rows = fill_month_grid(cells) if monthly else df
+
+    if monthly or not chunk_rows:
+        # 4) Extraer X y y
+        X = _model_frame(rows, lag_features)
+        y_q = rows["quantity"]
+        y_p = rows["profit"]
+
+        # 5) Construir y entrenar pipelines
+        pipe_q = build_xgb_pipeline(params, lag_features)
+        pipe_p = build_xgb_pipeline(params, lag_features)
+        pipe_q.fit(X, y_q)
+        pipe_p.fit(X, y_p)
+        quantile_pipes = None
+        if quantiles:
+            qparams = quantile_params(params, quantiles)
+            quantile_pipes = (build_xgb_pipeline(qparams, lag_features).fit(X, y_q),
+                              build_xgb_pipeline(qparams, lag_features).fit(X, y_p))
+
+    # 6) Serializar pipelines y estado (para continuar en modo incremental)
+    joblib.dump(pipe_q, out / "pipeline_quantity.pkl")
+    joblib.dump(pipe_p, out / "pipeline_profit.pkl")
+    for name in QUANTILE_FILES:
+        (out / name).unlink(missing_ok=True)
+    if quantile_pipes is not None:
+        for pipe, name in zip(quantile_pipes, QUANTILE_FILES):
+            joblib.dump(pipe, out / name)
+    _save_compiled(pipe_q, pipe_p, X, out, quantile_pipes)
+    if lag_features:
+        joblib.dump(cells[HISTORY_COLS], out / HISTORY_FILE)
+    else:
+        (out / HISTORY_FILE).unlink(missing_ok=True)
+    joblib.dump({
+        "params":           params,
+        "quantiles":        list(quantiles) if quantiles else None,
+        "lag_features":     lag_features,
+        "monthly":          monthly,
+        # Series del grid mensual: el modo incremental las rellena en los meses nuevos
+        "series":           list(rows[["region", "product"]].drop_duplicates().itertuples(index=False, name=None))
+                            if monthly else None,
+        "chunk_rows":       chunk_rows,
+        **stats,
+        "incremental_rows": 0,
+        "extra_trees":      0,
+    }, out / STATE_FILE)
 
-    # 1) Leer CSV parseando la fecha correcta
-    df = pd.read_csv(
-        data_path,
-        encoding="latin1",
-        parse_dates=["Order Date"],
-        dayfirst=False  # o True si tus fechas son DD/MM/YYYY
+    print(f"✅ Pipelines entrenados y guardados en {out}")
+
+
+# -------------------------------------------------------
+# Entrenamiento fuera de memoria: CSV por bloques → memoria externa de XGBoost
+# -------------------------------------------------------
+def scan_orders(data_path: str, chunk_rows: int) -> dict:
+    """
+    Primera pasada por bloques. Devuelve `cells`, las celdas con pedidos
+    (region, product, mes) con quantity / profit / lines sumados de todo
+    el CSV, y `stats` (filas, último mes, tamaño y sha1 del fichero) para
+    el estado de entrenamiento. La tabla tiene una fila por celda, no por
+    pedido: da el vocabulario de los encoders y la historia de las
+    features de demanda sin cargar los pedidos.
+    """
+    cells, n_rows, last_month = None, 0, 0
+    for chunk, _ in iter_orders(data_path, chunk_rows):
+        n_rows += len(chunk)
+        if not len(chunk):
+            continue
+        last_month = max(last_month, int(month_numbers(chunk).max()))
+        part = monthly_cells(chunk)
+        if cells is not None:
+            part = pd.concat([cells, part]).groupby(["date", "region", "product"], sort=False).sum().reset_index()
+        cells = part
+    if cells is None:
+        raise ValueError("El CSV no tiene filas válidas")
+    stats = {"last_month": last_month, "bytes": Path(data_path).stat().st_size,
+             "sha1": _file_sha1(data_path).hexdigest(), "base_rows": n_rows}
+    return {"cells": cells, "stats": stats}
+
+
+class OrderChunks(xgb.DataIter):
+    """
+    Pedidos del CSV por bloques para ExtMemQuantileDMatrix: cada bloque se
+    tipa, se le añaden las features de demanda (de `history`) y pasa por el
+    preproceso ya ajustado. XGBoost recorre el iterador varias veces
+    (sketch de cuantiles y páginas) y guarda las páginas cuantizadas en
+    `cache_prefix`; en memoria sólo hay un bloque a la vez. Las etiquetas
+    de profit se recogen en la primera pasada para cambiar de target sin
+    volver a construir la matriz.
+    """
+
+    def __init__(self, data_path: str, chunk_rows: int, prep, history: LagFeatures | None,
+                 cache_prefix: str):
+        super().__init__(cache_prefix=cache_prefix)
+        self.data_path = data_path
+        self.chunk_rows = chunk_rows
+        self.prep = prep
+        self.history = history
+        self.profit = None
+        self._profit_parts = []
+        self._chunks = None
+
+    def frames(self):
+        """(entrada del pipeline, filas) de cada bloque con región y producto."""
+        for chunk, _ in iter_orders(self.data_path, self.chunk_rows):
+            chunk = chunk[chunk["region"].notna() & chunk["product"].notna()]
+            if not len(chunk):
+                continue
+            X = chunk[["date", "region", "product"]]
+            if self.history is not None:
+                X = X.join(frame_features(chunk, history=self.history))
+            yield X, chunk
+
+    def next(self, input_data) -> bool:
+        if self._chunks is None:
+            self._chunks = self.frames()
+        item = next(self._chunks, None)
+        if item is None:
+            if self.profit is None:
+                self.profit = np.concatenate(self._profit_parts)
+                self._profit_parts = []
+            return False
+        X, rows = item
+        if self.profit is None:
+            self._profit_parts.append(rows["profit"].to_numpy(dtype=np.float32))
+        input_data(data=np.asarray(self.prep.transform(X), dtype=np.float32),
+                   label=rows["quantity"].to_numpy(dtype=np.float32))
+        return True
+
+    def reset(self):
+        self._chunks = None
+
+
+def _train_booster(params: dict, dtrain: xgb.DMatrix) -> xgb.XGBRegressor:
+    """xgb.train sobre la matriz externa, devuelto como el XGBRegressor de los pipelines."""
+    model = xgb.XGBRegressor(**params)
+    booster = xgb.train(model.get_xgb_params(), dtrain, num_boost_round=model.n_estimators or 100)
+    model.load_model(booster.save_raw("ubj"))
+    return model
+
+
+def fit_out_of_core(data_path: str, out: Path, cells: pd.DataFrame, params: dict, quantiles=None,
+                    lag_features: bool = False, chunk_rows: int = 50_000) -> tuple:
+    """
+    Pipelines equivalentes a los de train_and_save sin cargar el CSV: los
+    encoders se ajustan sobre `cells` (scan_orders: mismo vocabulario que
+    los pedidos), el escalado con partial_fit bloque a bloque y los
+    boosters sobre un ExtMemQuantileDMatrix con caché en `out`. El pico de
+    memoria lo marca `chunk_rows`, más un float por fila para las etiquetas.
+    Devuelve (pipe_q, pipe_p, quantile_pipes, muestra de X para compilar).
+    """
+    history = LagFeatures.from_frame(cells) if lag_features else None
+    prep = build_xgb_pipeline(params, lag_features)[:-1]
+    vocab = cells[["date", "region", "product"]]
+    if lag_features:
+        vocab = vocab.join(frame_features(cells, history=history))
+    prep.named_steps["preproc"].fit(vocab)
+
+    with tempfile.TemporaryDirectory(prefix="xgb-cache-", dir=out) as cache:
+        chunks = OrderChunks(data_path, chunk_rows, prep, history, str(Path(cache) / "pages"))
+        scale, sample = prep.named_steps["scale"], None
+        for X, _ in chunks.frames():
+            scale.partial_fit(prep.named_steps["preproc"].transform(X))
+            if sample is None:
+                sample = X.head(2000)
+        dtrain = xgb.ExtMemQuantileDMatrix(chunks, max_bin=params.get("max_bin"),
+                                           nthread=params.get("n_jobs"))
+
+        def pipeline(model):
+            return Pipeline(prep.steps + [("model", model)])
+
+        qparams = quantile_params(params, quantiles) if quantiles else None
+        pipe_q = pipeline(_train_booster(params, dtrain))
+        quantile_q = pipeline(_train_booster(qparams, dtrain)) if quantiles else None
+        dtrain.set_label(chunks.profit)
+        pipe_p = pipeline(_train_booster(params, dtrain))
+        quantile_p = pipeline(_train_booster(qparams, dtrain)) if quantiles else None
+        del dtrain
+    quantile_pipes = (quantile_q, quantile_p) if quantiles else None
+    return pipe_q, pipe_p, quantile_pipes, sample
+
+
+def _unknown_ratio(pipe, X: pd.DataFrame) -> float:
+    """Fracción de filas con región, producto o año fuera del vocabulario."""
+    pre = pipe.named_steps["preproc"]
+    years = pre.named_transformers_["date"].named_steps["ohe"].categories_[0]
+    regions = pre.named_transformers_["region"].named_steps["ohe"].categories_[0]
+    products = pre.named_transformers_["product"].named_steps["ohe"].categories_[0]
+    known = (
+        np.isin(X["date"].dt.year, years)
+        & np.isin(X["region"], regions)
+        & np.isin(X["product"], products)
     )
+    return float(1.0 - known.mean()) if len(X) else 0.0
 
-    # 2) Renombrar columnas “fáciles” antes de normalizar
-    df = df.rename(columns={
-        "Order Date":   "date",
-        "Region":       "region",
-        "Product Name": "product",
-        "Quantity":     "quantity",
-        "Profit":       "profit"
-    }, errors="ignore")
 
-    # 3) Ahora normalizamos cualquier variante
-    df = normalize_columns(df)
+def _continue_boosting(pipe, X: pd.DataFrame, y: pd.Series, n_trees: int):
+    """Añade `n_trees` árboles al booster guardado, con el preproceso congelado."""
+    Xt = pipe[:-1].transform(X)
+    base = pipe.named_steps["model"]
+    params = {**base.get_params(), "n_estimators": n_trees}
+    model = xgb.XGBRegressor(**params)
+    model.fit(Xt, y, xgb_model=base.get_booster())
+    pipe.set_params(model=model)
+    return pipe
 
-    # 4) Asegurarnos que 'date' es datetime
-    df["date"] = pd.to_datetime(df["date"], errors="coerce")
 
-    # 5) Extraer X y y
-    X = df[["date", "region", "product"]]
-    y_q = df["quantity"]
-    y_p = df["profit"]
-
-    # 6) Parámetros por defecto
-    default = {
-        "n_estimators": 300,
-        "learning_rate": 0.05,
-        "max_depth": 8,
-        "random_state": 42,
-        "n_jobs": -1
-    }
-    params = model_params or default
-
-    # 7) Construir y entrenar pipelines
-    pipe_q = build_xgb_pipeline(params)
-    pipe_p = build_xgb_pipeline(params)
-    pipe_q.fit(X, y_q)
-    pipe_p.fit(X, y_p)
-
-    # 8) Serializar
+def retrain_incremental(data_path: str, out_dir: str, n_trees: int = 50,
+                        policy: dict = None) -> dict:
+    """
+    Continúa el boosting de los pipelines guardados usando sólo las filas
+    añadidas al CSV desde el último entrenamiento. El vocabulario de los
+    encoders queda congelado; si la política lo indica (CSV reemplazado,
+    demasiadas categorías nuevas o demasiado crecimiento acumulado) se hace
+    un reentrenamiento completo. El CSV no se carga entero: el prefijo
+    entrenado se comprueba por bloques y sólo se leen los bytes nuevos; la
+    historia de las features de demanda son las celdas mensuales guardadas
+    con la versión (HISTORY_FILE) más las de las filas nuevas. Devuelve un
+    resumen con el modo aplicado.
+    """
+    out = Path(out_dir)
+    policy = {**INCREMENTAL_POLICY, **(policy or {})}
+    path = Path(data_path)
+
+    def full(reason: str) -> dict:
+        state = joblib.load(out / STATE_FILE) if (out / STATE_FILE).exists() else {}
+        train_and_save(data_path, out_dir, state.get("params"), state.get("quantiles"),
+                       state.get("lag_features", False), state.get("monthly", False),
+                       state.get("chunk_rows"))
+        return {"mode": "full", "reason": reason}
+
+    if not (out / STATE_FILE).exists():
+        return full("sin estado de entrenamiento previo")
+    state = joblib.load(out / STATE_FILE)
+
+    # Las filas nuevas son las añadidas al final del CSV entrenado
+    if path.stat().st_size < state["bytes"]:
+        return full("el CSV fue reemplazado")
+    sha1 = _file_sha1(path, state["bytes"])
+    if sha1.hexdigest() != state["sha1"]:
+        return full("el CSV fue reemplazado")
+    with open(path, "rb") as f:
+        header = f.readline()
+        f.seek(state["bytes"])
+        appended = f.read()
+    if not appended:
+        return {"mode": "none", "reason": "sin filas nuevas", "new_rows": 0}
+    sha1.update(appended)
+
+    df = _load_training_frame(header + appended)
+    rows = df
+    if state.get("monthly"):
+        # Las celdas de meses ya entrenados cambiarían: sólo se añaden meses nuevos
+        month = month_numbers(df)
+        if month.min() <= state["last_month"]:
+            return full("hay filas nuevas en meses ya agregados")
+        if not state.get("series"):
+            return full("el estado no tiene las series del grid mensual")
+        # Grid de todas las series en los meses nuevos, con los meses sin pedidos a 0
+        rows = fill_month_grid(monthly_cells(df), pd.MultiIndex.from_tuples(state["series"]),
+                               state["last_month"] + 1, int(month.max()))
+    X = rows[["date", "region", "product"]]
+    history = None
+    if state.get("lag_features"):
+        # Las features de las filas nuevas dependen de los meses anteriores
+        if not (out / HISTORY_FILE).exists():
+            return full("la versión no tiene la historia de demanda")
+        history = (
+            pd.concat([joblib.load(out / HISTORY_FILE), monthly_cells(df)[HISTORY_COLS]])
+              .groupby(["date", "region", "product"], sort=False, as_index=False)["quantity"].sum()
+        )
+        X = X.join(frame_features(rows, history=history))
+
+    pipe_q = joblib.load(out / "pipeline_quantity.pkl")
+    pipe_p = joblib.load(out / "pipeline_profit.pkl")
+    quantile_pipes = None
+    if state.get("quantiles"):
+        quantile_pipes = tuple(joblib.load(out / name) for name in QUANTILE_FILES)
+
+    unknown = _unknown_ratio(pipe_q, X)
+    if unknown > policy["max_unknown_ratio"]:
+        return full(f"{unknown:.0%} de filas con categorías nuevas")
+    if (state["incremental_rows"] + len(df)) / state["base_rows"] > policy["max_incremental_ratio"]:
+        return full("demasiadas filas acumuladas en modo incremental")
+    if state["extra_trees"] + n_trees > policy["max_extra_trees"]:
+        return full("demasiados árboles añadidos")
+
+    _continue_boosting(pipe_q, X, rows["quantity"], n_trees)
+    _continue_boosting(pipe_p, X, rows["profit"], n_trees)
+    if quantile_pipes is not None:
+        _continue_boosting(quantile_pipes[0], X, rows["quantity"], n_trees)
+        _continue_boosting(quantile_pipes[1], X, rows["profit"], n_trees)
+
     joblib.dump(pipe_q, out / "pipeline_quantity.pkl")
     joblib.dump(pipe_p, out / "pipeline_profit.pkl")
+    if quantile_pipes is not None:
+        for pipe, name in zip(quantile_pipes, QUANTILE_FILES):
+            joblib.dump(pipe, out / name)
+    _save_compiled(pipe_q, pipe_p, X, out, quantile_pipes)
+    if history is not None:
+        joblib.dump(history, out / HISTORY_FILE)
+    state.update({
+        "bytes":            state["bytes"] + len(appended),
+        "sha1":             sha1.hexdigest(),
+        "incremental_rows": state["incremental_rows"] + len(df),
+        "extra_trees":      state["extra_trees"] + n_trees,
+        "last_month":       int(max(state.get("last_month", 0), month_numbers(df).max())),
+    })
+    if state.get("monthly"):
+        state["series"] = list(rows[["region", "product"]].drop_duplicates().itertuples(index=False, name=None))
+    joblib.dump(state, out / STATE_FILE)
 
-    print(f"✅ Pipelines entrenados y guardados en {out}")
+    print(f"✅ Pipelines actualizados con {len(df)} filas nuevas (+{n_trees} árboles)")
+    return {"mode": "incremental", "new_rows": len(df), "unknown_ratio": unknown}
@@ -0,0 +1,174 @@
+# backend/tuning.py
+
+import argparse
+import math
+import multiprocessing as mp
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from ml_utils import get_preprocessor
+from train_xgb import DEFAULT_PARAMS, _load_training_frame, _model_frame, monthly_training_table, train_and_save
+
+TARGETS = ["quantity", "profit"]
+
+
+def time_split(df: pd.DataFrame, valid_fraction: float = 0.2):
+    """Split temporal: la validación es el último `valid_fraction` del historial."""
+    df = df[df["date"].notna()].sort_values("date")
+    cutoff = df["date"].quantile(1 - valid_fraction)
+    return df[df["date"] < cutoff], df[df["date"] >= cutoff]
+
+
+def sample_params(rng: np.random.Generator) -> dict:
+    """Candidato aleatorio del espacio de búsqueda (nombres del API sklearn)."""
+    return {
+        "max_depth":        int(rng.integers(3, 11)),
+        "learning_rate":    float(math.exp(rng.uniform(math.log(0.01), math.log(0.3)))),
+        "subsample":        float(rng.uniform(0.6, 1.0)),
+        "colsample_bytree": float(rng.uniform(0.5, 1.0)),
+        "min_child_weight": float(math.exp(rng.uniform(0.0, math.log(20)))),
+        "reg_lambda":       float(math.exp(rng.uniform(math.log(0.1), math.log(10)))),
+    }
+
+
+# -------------------------------------------------------
+# Workers: las matrices preprocesadas se cargan una vez por proceso
+# -------------------------------------------------------
+_DATA = {}
+
+
+def _init_worker(cache_path: str, nthread: int):
+    arrays = joblib.load(cache_path, mmap_mode="r")
+    _DATA["nthread"] = nthread
+    for target in TARGETS:
+        dtrain = xgb.QuantileDMatrix(arrays["X_train"], arrays[f"y_train_{target}"])
+        dvalid = xgb.QuantileDMatrix(arrays["X_valid"], arrays[f"y_valid_{target}"], ref=dtrain)
+        _DATA[target] = (dtrain, dvalid, float(np.std(arrays[f"y_valid_{target}"])) or 1.0)
+
+
+def _run_trial(trial: tuple) -> dict:
+    """Entrena ambos objetivos con early stopping; puntúa con el RMSE normalizado medio."""
+    trial_id, params, rounds = trial
+    native = {**params, "tree_method": "hist", "nthread": _DATA["nthread"], "seed": 42}
+    scores, iterations = [], []
+    for target in TARGETS:
+        dtrain, dvalid, scale = _DATA[target]
+        bst = xgb.train(
+            native, dtrain,
+            num_boost_round=rounds,
+            evals=[(dvalid, "valid")],
+            early_stopping_rounds=max(10, rounds // 10),
+            verbose_eval=False,
+        )
+        scores.append(bst.best_score / scale)
+        iterations.append(bst.best_iteration + 1)
+    return {
+        "trial": trial_id, "rounds": rounds, "score": float(np.mean(scores)),
+        "best_iteration": int(np.mean(iterations)),
+        **{f"rmse_{t}": s for t, s in zip(TARGETS, scores)}, **params,
+    }
+
+
+def successive_halving(candidates: list, run, max_rounds: int, eta: int = 3) -> list:
+    """
+    Successive halving: todos los candidatos con un presupuesto pequeño de
+    rondas; en cada peldaño sobrevive el mejor 1/eta y el presupuesto se
+    multiplica por eta. Devuelve el log de todos los trials.
+    """
+    rungs = int(math.log(len(candidates), eta)) if len(candidates) > 1 else 0
+    rounds = max(1, max_rounds // eta ** rungs)
+    alive = list(enumerate(candidates))
+    log = []
+    while True:
+        results = run([(i, p, rounds) for i, p in alive])
+        log.extend(results)
+        if len(alive) <= 1 or rounds >= max_rounds:
+            return log
+        best = sorted(results, key=lambda r: r["score"])[:max(1, len(alive) // eta)]
+        survivors = {r["trial"] for r in best}
+        alive = [(i, p) for i, p in alive if i in survivors]
+        rounds = min(rounds * eta, max_rounds)
+
+
+def tune_and_save(data_path: str, out_dir: str, n_candidates: int = 27,
+                  max_rounds: int = 900, eta: int = 3, valid_fraction: float = 0.2,
+                  n_workers: int = None, seed: int = 42, quantiles=None,
+                  lag_features: bool = False, monthly: bool = False) -> dict:
+    """
+    Búsqueda de hiperparámetros con split temporal y early stopping,
+    repartida en un pool de procesos (spawn). Tarda minutos: /train_xgb
+    la lanza como trabajo en segundo plano. Guarda `best_params.pkl` y
+    `tuning_trials.csv` junto a los modelos y reentrena con los mejores
+    parámetros sobre todo el historial (con modelos de cuantiles si se
+    pasan `quantiles`).
+    """
+    out = Path(out_dir)
+    out.mkdir(exist_ok=True, parents=True)
+    df = _load_training_frame(Path(data_path).read_bytes())
+    if monthly:
+        df = monthly_training_table(df)
+    train, valid = time_split(df, valid_fraction)
+
+    # Preproceso ajustado sólo con train, calculado una vez para todos los trials
+    prep = Pipeline([("preproc", get_preprocessor(lag_features)), ("scale", StandardScaler(with_mean=False))])
+    X = _model_frame(df, lag_features)
+    arrays = {
+        "X_train": np.asarray(prep.fit_transform(X.loc[train.index]), dtype=np.float32),
+        "X_valid": np.asarray(prep.transform(X.loc[valid.index]), dtype=np.float32),
+    }
+    for target in TARGETS:
+        arrays[f"y_train_{target}"] = train[target].to_numpy(dtype=np.float32)
+        arrays[f"y_valid_{target}"] = valid[target].to_numpy(dtype=np.float32)
+
+    rng = np.random.default_rng(seed)
+    candidates = [sample_params(rng) for _ in range(n_candidates)]
+    n_workers = n_workers or max(1, (os.cpu_count() or 2) // 2)
+    nthread = max(1, (os.cpu_count() or 1) // n_workers)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = str(Path(tmp) / "matrices.joblib")
+        joblib.dump(arrays, cache_path)
+        if n_workers == 1:
+            _init_worker(cache_path, nthread)
+            log = successive_halving(candidates, lambda ts: [_run_trial(t) for t in ts], max_rounds, eta)
+        else:
+            # spawn: el proceso padre (worker del API) ya tiene hilos y OpenMP cargado
+            with ProcessPoolExecutor(n_workers, mp_context=mp.get_context("spawn"),
+                                     initializer=_init_worker, initargs=(cache_path, nthread)) as pool:
+                log = successive_halving(candidates, lambda ts: list(pool.map(_run_trial, ts)),
+                                         max_rounds, eta)
+
+    trials = pd.DataFrame(log)
+    best = trials.sort_values(["rounds", "score"], ascending=[False, True]).iloc[0]
+    params = {
+        **{k: DEFAULT_PARAMS[k] for k in ("random_state", "n_jobs")},
+        **candidates[int(best["trial"])],
+        "n_estimators": int(best["best_iteration"]),
+        "tree_method":  "hist",
+    }
+    trials.to_csv(out / "tuning_trials.csv", index=False)
+    joblib.dump(params, out / "best_params.pkl")
+    train_and_save(data_path, out_dir, params, quantiles, lag_features, monthly)
+    return {"params": params, "score": float(best["score"]), "trials": len(trials)}
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser("Búsqueda de hiperparámetros XGBoost")
+    p.add_argument("-i", "--input", required=True, help="CSV de entrenamiento")
+    p.add_argument("-o", "--output", required=True, help="Directorio de modelos")
+    p.add_argument("-n", "--candidates", type=int, default=27)
+    p.add_argument("--max-rounds", type=int, default=900)
+    p.add_argument("--workers", type=int, default=None)
+    args = p.parse_args()
+    result = tune_and_save(args.input, args.output, args.candidates, args.max_rounds,
+                           n_workers=args.workers)
+    print(f"✅ Mejores parámetros: {result['params']} (score={result['score']:.4f})")
@@ -10,9 +10,23 @@ from sklearn.impute import (
 from faker import Faker
 import random
 import argparse
+import json
+
+# Esquema de pedidos (Superstore) que genera synthesize_orders
+ORDER_DATE, SHIP_DATE = 'Order Date', 'Ship Date'
+DATE_FORMATS = {ORDER_DATE: '%Y-%m-%d', SHIP_DATE: '%m/%d/%Y'}
+MEASURE_COLUMNS = ['Sales', 'Quantity', 'Discount', 'Profit']
+# Columnas que van juntas: cada entidad es una fila de su catálogo
+CUSTOMER_COLUMNS = ['Customer ID', 'Customer Name', 'Segment']
+LOCATION_COLUMNS = ['Country', 'City', 'State', 'Postal Code', 'Region']
+PRODUCT_COLUMNS  = ['Product ID', 'Category', 'Sub-Category', 'Product Name']
+
+# Mezcla por defecto de las trazas de carga
+TRACE_MIX = {'dashboard': 0.8, 'predict': 0.15, 'upload': 0.05}
+GROUP_FIELDS = ['Category', 'Sub-Category', 'Region', 'Segment']
 
 class DataSimulator:
-    def __init__(self, df_or_path, encoding='utf-8'):
+    def __init__(self, df_or_path, encoding='utf-8', seed=None):
         if isinstance(df_or_path, str):
             print(f"[INFO] Cargando dataset desde: {df_or_path} con encoding={encoding}")
             try:
@@ -24,6 +38,11 @@ class DataSimulator:
         else:
             self.df = df_or_path.copy()
         self.fake = Faker()
+        # Con semilla, pedidos y trazas generados son reproducibles
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        if seed is not None:
+            self.fake.seed_instance(seed)
         self._infer_types()
         self.logs = []
         self.default_strategy = {
@@ -115,14 +134,290 @@ class DataSimulator:
             self.fill_missing(c, random_weights=random_weights, **kwargs)
         return self.df
 
+    # ---------------------------------------------------
+    # Generador de carga: pedidos sintéticos y trazas de peticiones
+    # ---------------------------------------------------
+    def _catalog(self, cols, n, skew, make, key=None):
+        """
+        Catálogo de `n` entidades (filas únicas de `cols` del dataset, por
+        frecuencia, una por `key`; si faltan se crean con `make(k, fila
+        base)`) y su peso de popularidad tipo Zipf, en orden aleatorio.
+        """
+        cols = [c for c in cols if c in self.df.columns]
+        base = (self.df[cols].dropna().value_counts().reset_index()[cols]
+                if cols else pd.DataFrame(index=range(1)))
+        if key in cols:
+            # El dataset imputado repite ids con otros atributos: la combinación más frecuente
+            base = base.drop_duplicates(key).reset_index(drop=True)
+        if n is None:
+            n = len(base)
+        if n <= len(base):
+            catalog = base.head(n).reset_index(drop=True)
+        else:
+            extra = [make(k, base.iloc[k % len(base)]) for k in range(n - len(base))]
+            catalog = pd.concat([base, pd.DataFrame(extra, columns=cols)], ignore_index=True)
+        weights = 1.0 / np.arange(1, n + 1) ** skew
+        return catalog, self.rng.permutation(weights / weights.sum())
+
+    def _draw(self, weights, size):
+        """
+        `size` índices según `weights`; los primeros cubren cada entidad una
+        vez (si caben), así la cardinalidad pedida se cumple.
+        """
+        idx = self.rng.choice(len(weights), size=size, p=weights)
+        cover = min(len(weights), size)
+        idx[self.rng.choice(size, cover, replace=False)] = self.rng.permutation(len(weights))[:cover]
+        return idx
+
+    def _new_customer(self, k, row):
+        # Faker repite nombres (y puede dar uno del dataset): sufijo numérico si ya existe
+        name = self.fake.name()
+        if name in self._customer_names:
+            name = f"{name} {k + 2}"
+        self._customer_names.add(name)
+        initials = ''.join(w[0] for w in name.split()[:2]).upper()
+        return {**row.to_dict(), 'Customer ID': f"{initials}-S{k:05d}", 'Customer Name': name}
+
+    def _new_product(self, k, row):
+        return {**row.to_dict(), 'Product ID': f"{row['Product ID']}-S{k}",
+                'Product Name': f"{row['Product Name']} #{k + 2}"}
+
+    def _month_profile(self, seasonality):
+        """Peso de cada mes del año: estacionalidad del dataset mezclada con plana."""
+        dates = pd.to_datetime(self.df.get(ORDER_DATE), errors='coerce') if ORDER_DATE in self.df else None
+        share = np.full(12, 1 / 12)
+        if dates is not None and dates.notna().any():
+            counts = np.bincount(dates.dropna().dt.month - 1, minlength=12)
+            share = counts / counts.sum()
+        return (1 - seasonality) + seasonality * 12 * share
+
+    def synthesize_orders(self, n_rows, n_customers=None, n_products=None, n_regions=None,
+                          start=None, end=None, seasonality=1.0, growth=0.1, skew=1.0):
+        """
+        Tabla de pedidos sintética con el esquema del dataset (columnas,
+        orden y formatos de fecha de la ingesta) de `n_rows` líneas:
+          - clientes, productos y regiones con la cardinalidad pedida (por
+            defecto la del dataset) y popularidad sesgada (Zipf, `skew`);
+          - fechas en [start, end] con la estacionalidad mensual del dataset
+            (`seasonality` 0 = plana) y crecimiento anual `growth`;
+          - líneas por pedido, cantidades, descuentos y margen muestreados
+            del dataset; el precio unitario es el de cada producto.
+        Es determinista para una misma semilla.
+        """
+        missing = [c for c in [ORDER_DATE] + MEASURE_COLUMNS if c not in self.df.columns]
+        if missing:
+            raise ValueError(f"El dataset base no tiene las columnas {missing}")
+        rng = self.rng
+        src = self.df.dropna(subset=MEASURE_COLUMNS)
+        dates = pd.to_datetime(self.df[ORDER_DATE], errors='coerce')
+        start = pd.Timestamp(start) if start else dates.min()
+        end = pd.Timestamp(end) if end else dates.max()
+
+        self._customer_names = set(self.df['Customer Name'].dropna()) if 'Customer Name' in self.df else set()
+        customers, w_customer = self._catalog(CUSTOMER_COLUMNS, n_customers, skew, self._new_customer, 'Customer ID')
+        products, w_product = self._catalog(PRODUCT_COLUMNS, n_products, skew, self._new_product, 'Product ID')
+        locations, w_location = self._catalog(LOCATION_COLUMNS, None, 0.5, None)
+        if n_regions is not None and 'Region' in locations:
+            keep = locations['Region'].isin(locations['Region'].value_counts().index[:n_regions]).to_numpy()
+            locations, w_location = locations[keep].reset_index(drop=True), w_location[keep] / w_location[keep].sum()
+
+        # Pedidos: fecha, cliente, ubicación y envío; líneas por pedido geométricas
+        lines_mean = len(self.df) / self.df['Order ID'].nunique() if 'Order ID' in self.df else 1.0
+        sizes = rng.geometric(1 / lines_mean, size=int(n_rows / lines_mean) + 16)
+        while sizes.sum() < n_rows:
+            sizes = np.append(sizes, rng.geometric(1 / lines_mean, size=16))
+        sizes = sizes[:np.searchsorted(np.cumsum(sizes), n_rows) + 1]
+        sizes[-1] -= sizes.sum() - n_rows
+        n_orders = len(sizes)
+        days = pd.date_range(start, end, freq='D')
+        w_day = (self._month_profile(seasonality)[days.month - 1]
+                 * (1 + growth) ** ((days - days[0]).days.to_numpy() / 365.25))
+        order_day = np.sort(rng.choice(len(days), size=n_orders, p=w_day / w_day.sum()))
+        order_date = days[order_day]
+        order_customer = self._draw(w_customer, n_orders)
+        order_location = self._draw(w_location, n_orders)
+        line_order = np.repeat(np.arange(n_orders), sizes)
+
+        out = pd.DataFrame(index=range(n_rows))
+        # Columnas fuera de los bloques: valores del dataset por muestreo
+        blocks = set(CUSTOMER_COLUMNS + LOCATION_COLUMNS + PRODUCT_COLUMNS + MEASURE_COLUMNS)
+        for col in self.df.columns:
+            if col not in blocks:
+                out[col] = self.df[col].dropna().to_numpy()[rng.integers(0, self.df[col].notna().sum(), n_rows)]
+        for col in customers.columns:
+            out[col] = customers[col].to_numpy()[order_customer][line_order]
+        for col in locations.columns:
+            out[col] = locations[col].to_numpy()[order_location][line_order]
+        line_product = self._draw(w_product, n_rows)
+        for col in products.columns:
+            out[col] = products[col].to_numpy()[line_product]
+
+        out[ORDER_DATE] = order_date[line_order].strftime(DATE_FORMATS[ORDER_DATE])
+        if SHIP_DATE in out:
+            ship = order_date[line_order] + pd.to_timedelta(rng.integers(0, 8, n_rows), unit='D')
+            out[SHIP_DATE] = ship.strftime(DATE_FORMATS[SHIP_DATE])
+        if 'Order ID' in out:
+            numbers = rng.choice(900_000, size=n_orders, replace=False) + 100_000
+            ids = np.array([f"CA-{d.year}-{k}" for d, k in zip(order_date, numbers)])
+            out['Order ID'] = ids[line_order]
+        if 'Ship Mode' in out:
+            modes = self.df['Ship Mode'].dropna().to_numpy()
+            out['Ship Mode'] = modes[rng.integers(0, len(modes), n_orders)][line_order]
+        if 'Row ID' in out:
+            out['Row ID'] = np.arange(1, n_rows + 1).astype(float)
+
+        # Medidas: precio unitario por producto; cantidad, descuento y margen
+        # juntos, de una línea del dataset de la misma subcategoría
+        unit = src['Sales'] / (src['Quantity'] * (1 - src['Discount'])).where(lambda v: v > 0)
+        product_price = np.full(len(products), unit.median())
+        if 'Product ID' in products:
+            # Los productos creados heredan el precio de su base con ±25 %
+            base_id = products['Product ID'].str.replace(r'-S\d+$', '', regex=True)
+            known = base_id.map(unit.groupby(src['Product ID']).median()).to_numpy()
+            product_price = np.where(np.isnan(known), product_price, known)
+            clone = (base_id != products['Product ID']).to_numpy()
+            product_price[clone] *= rng.uniform(0.8, 1.25, clone.sum())
+        donor = rng.integers(0, len(src), n_rows)
+        if 'Sub-Category' in products:
+            line_sub = products['Sub-Category'].to_numpy()[line_product]
+            for sub, rows in pd.Series(np.arange(len(src))).groupby(src['Sub-Category'].to_numpy()):
+                lines = np.flatnonzero(line_sub == sub)
+                donor[lines] = rows.to_numpy()[rng.integers(0, len(rows), len(lines))]
+        quantity = src['Quantity'].to_numpy()[donor]
+        discount = src['Discount'].to_numpy()[donor]
+        margin = (src['Profit'] / src['Sales'].where(src['Sales'] != 0)).fillna(0.0).to_numpy()[donor]
+        sales = product_price[line_product] * quantity * (1 - discount)
+        out['Sales'] = sales.round(4)
+        out['Quantity'] = quantity
+        out['Discount'] = discount
+        out['Profit'] = (sales * margin).round(4)
+        return out[list(self.df.columns)]
+
+    def request_trace(self, orders, n_requests, mix=None, rate=20.0, sessions=20,
+                      batch_size=10, upload_rows=50):
+        """
+        Traza determinista de peticiones contra la API sobre la tabla
+        `orders` (la que se sube antes de reproducirla). Llegadas de Poisson
+        a `rate` peticiones/s, con el tipo según `mix` (TRACE_MIX):
+          - dashboard: una de `sessions` sesiones cambia un filtro (mes,
+            cliente, producto, agrupación) y pide lo que repinta el
+            dashboard; la primera vez de cada sesión, la carga inicial;
+          - predict: /predict de una serie o /forecast de un lote de
+            `batch_size` regiones × productos;
+          - upload: /append_orders con `upload_rows` pedidos nuevos,
+            posteriores a los existentes.
+        Cada entrada: t (s desde el inicio), kind, method, path y params,
+        json o csv según la petición.
+        """
+        rng = self.rng
+        mix = mix or TRACE_MIX
+        kinds, p_kind = list(mix), np.array(list(mix.values()), dtype=float)
+        dates = pd.to_datetime(orders[ORDER_DATE], format=DATE_FORMATS[ORDER_DATE])
+        months = sorted(dates.dt.strftime('%Y-%m').unique())
+        vendors = orders['Customer Name'].value_counts().index.to_numpy()
+        products = orders['Product Name'].value_counts().index.to_numpy()
+        regions = orders['Region'].unique()
+        last = dates.max()
+        state = {}
+
+        def pick(values, skewed=True):
+            # Los filtros se concentran en los valores más frecuentes
+            k = int(min(rng.zipf(1.5), len(values))) - 1 if skewed else int(rng.integers(len(values)))
+            return str(values[k])
+
+        def dashboard(t):
+            s = rng.integers(sessions)
+            f = state.get(s)
+            if f is None:
+                f = state[s] = {'month': None, 'vendor': 'Todos', 'product': 'Todos', 'field': 'Category'}
+                boot = [('/metadata/regions', {}), ('/metadata/products', {}), ('/metadata/vendors', {})]
+            else:
+                change = rng.choice(['month', 'vendor', 'product', 'field', 'reset'], p=[.4, .2, .2, .1, .1])
+                if change == 'reset':
+                    f.update(month=None, vendor='Todos', product='Todos')
+                elif change == 'month':
+                    f['month'] = pick(months, skewed=False)
+                elif change == 'vendor':
+                    f['vendor'] = pick(vendors)
+                elif change == 'product':
+                    f['product'] = pick(products)
+                else:
+                    f['field'] = str(rng.choice(GROUP_FIELDS))
+                boot = []
+            filters = {k: v for k, v in f.items() if k != 'field' and v is not None}
+            year = int(f['month'][:4]) if f['month'] else int(last.year)
+            calls = boot + [
+                ('/kpis', filters),
+                ('/sales_trend', {'year': year, **{k: v for k, v in filters.items() if k != 'product'}}),
+                ('/grouped', {'field': f['field'], **filters}),
+                ('/scatter', filters),
+            ]
+            return [{'t': t, 'kind': 'dashboard', 'method': 'GET', 'path': path, 'params': params}
+                    for path, params in calls]
+
+        def predict(t):
+            when = last + pd.DateOffset(months=int(rng.integers(1, 13)))
+            if rng.random() < 0.5:
+                body = {'region': pick(regions, skewed=False), 'product': pick(products),
+                        'date': when.strftime('%Y-%m-%d')}
+                return [{'t': t, 'kind': 'predict', 'method': 'POST', 'path': '/predict', 'json': body}]
+            body = {'regions': sorted({pick(regions, skewed=False) for _ in range(batch_size)}),
+                    'products': sorted({pick(products) for _ in range(batch_size)}),
+                    'freq': 'month', 'start': (last + pd.Timedelta(days=1)).strftime('%Y-%m-%d'),
+                    'end': when.strftime('%Y-%m-%d')}
+            return [{'t': t, 'kind': 'predict', 'method': 'POST', 'path': '/forecast', 'json': body}]
+
+        def upload(t):
+            nonlocal last
+            start = last + pd.Timedelta(days=1)
+            batch = self.synthesize_orders(upload_rows, start=start, end=start + pd.Timedelta(days=6))
+            last = start + pd.Timedelta(days=6)
+            return [{'t': t, 'kind': 'upload', 'method': 'POST', 'path': '/append_orders',
+                     'csv': batch.to_csv(index=False)}]
+
+        build = {'dashboard': dashboard, 'predict': predict, 'upload': upload}
+        trace, t = [], 0.0
+        while len(trace) < n_requests:
+            t += rng.exponential(1 / rate)
+            trace.extend(build[kinds[rng.choice(len(kinds), p=p_kind / p_kind.sum())]](round(t, 4)))
+        return trace[:n_requests]
+
+
+def save_trace(trace, path):
+    """Guarda una traza como JSON Lines (una petición por línea)."""
+    with open(path, 'w', encoding='utf-8') as f:
+        for entry in trace:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
 if __name__=='__main__':
     p = argparse.ArgumentParser("DataSimulator imputación y generación")
     p.add_argument('-i','--input', required=True, help='CSV de entrada')
     p.add_argument('-o','--output', required=True, help='CSV de salida')
     p.add_argument('-d','--date-column', help='Columna de fecha para extender')
     p.add_argument('--end-date', help='Fecha límite (YYYY-MM-DD)')
+    g = p.add_argument_group('generador de carga')
+    g.add_argument('--rows', type=int, help='Generar una tabla sintética de N líneas de pedido')
+    g.add_argument('--customers', type=int, help='Nº de clientes distintos')
+    g.add_argument('--products', type=int, help='Nº de productos distintos')
+    g.add_argument('--regions', type=int, help='Nº de regiones distintas')
+    g.add_argument('--start-date', help='Primera fecha de pedido (YYYY-MM-DD)')
+    g.add_argument('--seed', type=int, default=0, help='Semilla (misma semilla, mismos datos)')
+    g.add_argument('--trace', help='Guardar también una traza de peticiones (JSON Lines)')
+    g.add_argument('--requests', type=int, default=1000, help='Nº de peticiones de la traza')
+    g.add_argument('--rate', type=float, default=20.0, help='Peticiones por segundo de la traza')
     args = p.parse_args()
 
+    if args.rows:
+        sim = DataSimulator(args.input, encoding='latin1', seed=args.seed)
+        orders = sim.synthesize_orders(args.rows, args.customers, args.products, args.regions,
+                                       start=args.start_date, end=args.end_date)
+        orders.to_csv(args.output, index=False)
+        print(f"[INFO] {len(orders)} pedidos sintéticos guardados en: {args.output}")
+        if args.trace:
+            save_trace(sim.request_trace(orders, args.requests, rate=args.rate), args.trace)
+            print(f"[INFO] Traza de {args.requests} peticiones guardada en: {args.trace}")
+        raise SystemExit(0)
+
     # Inicializar simulador
     sim = DataSimulator(args.input)
     # Si se indica columna fecha, convertirla y actualizar tipo
@@ -8,6 +8,12 @@ let barChartInstance     = null;
 let lineChartInstance    = null;
 let scatterChartInstance = null;
 
+// Estado inicial precalculado que el servidor incrusta en index.html (si lo hay)
+const bootSnapshot = (() => {
+  const el = document.getElementById("dashboard-snapshot");
+  try { return el ? JSON.parse(el.textContent) : {}; } catch { return {}; }
+})();
+
 
 /** populateDropdowns(): rellena selects de Región, Cliente y Producto */
 async function populateDropdowns() {
@@ -83,13 +89,62 @@ async function submitPrediction() {
   }
 }
 
+/** drawScatterChart(): Ventas vs. Ganancia como celdas hexbin calculadas en /scatter */
+async function drawScatterChart(filters = { month: null, vendor: "Todos", product: "Todos" }) {
+  const canvas = document.getElementById("scatter-chart");
+  if (!canvas) return;
+
+  // El servidor agrega en celdas: la respuesta no crece con el número de pedidos
+  const params = new URLSearchParams({ x: "Sales", y: "profit", kind: "hexbin", gridsize: 30 });
+  if (filters.month) params.set("month", filters.month);
+  if (filters.vendor && filters.vendor !== "Todos") params.set("vendor", filters.vendor);
+  if (filters.product && filters.product !== "Todos") params.set("product", filters.product);
+
+  try {
+    const resp = await fetch(`/scatter?${params.toString()}`);
+    if (!resp.ok) throw new Error(`Status ${resp.status}`);
+    const body = await resp.json();
+
+    const maxCount = Math.max(1, ...body.cells.map(c => c.count));
+    const data = body.cells.map(c => ({
+      x: c.x, y: c.y, count: c.count,
+      r: 2 + 10 * Math.sqrt(c.count / maxCount)
+    }));
+    const pearson = body.pearson === null ? "–" : body.pearson.toFixed(2);
+
+    if (scatterChartInstance) scatterChartInstance.destroy();
+    scatterChartInstance = new Chart(canvas.getContext("2d"), {
+      type: "bubble",
+      data: { datasets: [{ label: `Pedidos: ${body.n} (r = ${pearson})`, data }] },
+      options: {
+        animation: false,
+        scales: {
+          x: { title: { display: true, text: "Ventas" } },
+          y: { title: { display: true, text: "Ganancia" } }
+        },
+        plugins: {
+          tooltip: {
+            callbacks: {
+              label: ctx => `${ctx.raw.count} pedidos ≈ (${ctx.raw.x.toFixed(0)}, ${ctx.raw.y.toFixed(0)})`
+            }
+          }
+        }
+      }
+    });
+  } catch (err) {
+    console.error("drawScatterChart():", err);
+  }
+}
+
 /** initDashboard(): arranca todo tras subir+entrenar */
 async function initDashboard() {
   await populateDropdowns();
     // 2) … ahora el resto:
-  updateKpisDisplay(await fetchKpis({ month: null, vendor: "Todos", product: "Todos" }));
+  updateKpisDisplay(bootSnapshot["kpis"]
+    ?? await fetchKpis({ month: null, vendor: "Todos", product: "Todos" }));
   await initLineChart("Todos", null);
-  drawBarChart(await fetchGrouped("Category", { month: null, vendor: "Todos", product: "Todos" }));
+  drawBarChart(bootSnapshot["grouped?field=Category"]?.data
+    ?? await fetchGrouped("Category", { month: null, vendor: "Todos", product: "Todos" }));
   await drawScatterChart();
   await populatePredictionDropdowns();
 
@@ -0,0 +1,121 @@
+import argparse
+import json
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+import numpy as np
+
+PERCENTILES = [50, 95, 99]
+
+
+def load_trace(path):
+    """Traza JSON Lines de DataSimulator.request_trace."""
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _request(base_url, entry, tenant=None):
+    url = base_url.rstrip('/') + entry['path']
+    headers, data = {}, None
+    if tenant:
+        headers['X-Tenant'] = tenant
+    if entry.get('params'):
+        url += '?' + urlencode(entry['params'])
+    if 'json' in entry:
+        data = json.dumps(entry['json']).encode()
+        headers['Content-Type'] = 'application/json'
+    elif 'csv' in entry:
+        # multipart/form-data con un único fichero "file"
+        boundary = uuid.uuid4().hex
+        data = (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="orders.csv"\r\n'
+                f'Content-Type: text/csv\r\n\r\n').encode() + entry['csv'].encode('latin1', 'replace') \
+               + f'\r\n--{boundary}--\r\n'.encode()
+        headers['Content-Type'] = f'multipart/form-data; boundary={boundary}'
+    return Request(url, data=data, headers=headers, method=entry['method'])
+
+
+def replay(base_url, trace, concurrency=8, paced=False, speed=1.0, timeout=60, tenant=None):
+    """
+    Reproduce `trace` contra la API de `base_url` con `concurrency` hilos.
+    Con `paced` cada petición sale en su instante de la traza (dividido
+    por `speed`, carga abierta); si no, una tras otra tan rápido como
+    respondan (carga cerrada). Devuelve (resultados, segundos totales);
+    cada resultado: kind, path, status (0 si no hubo respuesta) y latencia.
+    """
+    results = []
+    lock = threading.Lock()
+    t0 = time.perf_counter()
+
+    def run(entry):
+        if paced:
+            delay = entry['t'] / speed - (time.perf_counter() - t0)
+            if delay > 0:
+                time.sleep(delay)
+        start = time.perf_counter()
+        try:
+            with urlopen(_request(base_url, entry, tenant), timeout=timeout) as resp:
+                resp.read()
+                status = resp.status
+        except HTTPError as e:
+            status = e.code
+        except (URLError, OSError):
+            status = 0
+        with lock:
+            results.append({'kind': entry['kind'], 'path': entry['path'], 'status': status,
+                            'latency': time.perf_counter() - start})
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(run, trace))
+    return results, time.perf_counter() - t0
+
+
+def summarize(results, elapsed):
+    """Peticiones/s y latencias (ms, percentiles PERCENTILES y máxima) por endpoint y en total."""
+    groups = defaultdict(list)
+    for r in results:
+        groups[r['path']].append(r)
+        groups['*'].append(r)
+    report = {}
+    for path, rows in sorted(groups.items()):
+        latency = np.array([r['latency'] for r in rows]) * 1000
+        stats = {'requests': len(rows), 'errors': sum(not 200 <= r['status'] < 400 for r in rows),
+                 'rps': len(rows) / elapsed if elapsed else 0.0}
+        stats.update({f'p{q}_ms': float(np.percentile(latency, q)) for q in PERCENTILES})
+        stats['max_ms'] = float(latency.max())
+        report[path] = stats
+    return report
+
+
+def print_report(report):
+    cols = ['requests', 'errors', 'rps'] + [f'p{q}_ms' for q in PERCENTILES] + ['max_ms']
+    print(f"{'endpoint':<22}" + ''.join(f'{c:>10}' for c in cols))
+    for path, stats in report.items():
+        print(f'{path:<22}' + ''.join(
+            f'{stats[c]:>10d}' if isinstance(stats[c], int) else f'{stats[c]:>10.1f}' for c in cols))
+
+
+if __name__ == '__main__':
+    p = argparse.ArgumentParser('Reproduce una traza de DataSimulator contra la API')
+    p.add_argument('trace', help='Traza JSON Lines (data_simulator.py --trace)')
+    p.add_argument('--url', default='http://localhost:8000', help='URL base de la API')
+    p.add_argument('-c', '--concurrency', type=int, default=8, help='Peticiones simultáneas')
+    p.add_argument('--paced', action='store_true', help='Respetar los instantes de la traza (carga abierta)')
+    p.add_argument('--speed', type=float, default=1.0, help='Factor de aceleración con --paced')
+    p.add_argument('--tenant', help='Cabecera X-Tenant (las subidas modifican sus datos)')
+    p.add_argument('--json', help='Guardar el informe en este fichero')
+    args = p.parse_args()
+
+    trace = load_trace(args.trace)
+    results, elapsed = replay(args.url, trace, args.concurrency, args.paced, args.speed, tenant=args.tenant)
+    report = summarize(results, elapsed)
+    print(f"[INFO] {len(results)} peticiones en {elapsed:.1f} s ({len(results) / elapsed:.1f} req/s)")
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)